@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_remove_user_users_replit__fd5f2c_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organization",
+            name="stripe_subscription_item_id",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
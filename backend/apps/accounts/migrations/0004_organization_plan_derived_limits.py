@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:18
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_organization_stripe_subscription_item_id"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="organization",
+            name="campaigns_limit",
+        ),
+        migrations.RemoveField(
+            model_name="organization",
+            name="contacts_limit",
+        ),
+        migrations.RemoveField(
+            model_name="organization",
+            name="stripe_price_id",
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTED_MODELS = {
+    "cached_contacts_count": ("contacts", "Contact"),
+    "cached_campaigns_count": ("campaigns", "Campaign"),
+    "cached_templates_count": ("templates", "EmailTemplate"),
+    "cached_domains_count": ("domains", "Domain"),
+}
+
+
+def backfill_counters(apps, schema_editor):
+    Organization = apps.get_model("accounts", "Organization")
+    for counter_field, (app_label, model_name) in COUNTED_MODELS.items():
+        model = apps.get_model(app_label, model_name)
+        counts = (
+            model.objects.filter(organization=OuterRef("pk"))
+            .order_by()
+            .values("organization")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        Organization.objects.update(**{counter_field: Coalesce(Subquery(counts), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_organization_plan_derived_limits"),
+        ("campaigns", "0001_initial"),
+        ("contacts", "0001_initial"),
+        ("domains", "0001_initial"),
+        ("templates", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organization",
+            name="cached_campaigns_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="organization",
+            name="cached_contacts_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="organization",
+            name="cached_domains_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="organization",
+            name="cached_templates_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
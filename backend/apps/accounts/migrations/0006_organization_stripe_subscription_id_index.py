@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:25
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # The organizations table is read on every request; build without locking it
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0005_organization_resource_counters"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="organization",
+            index=models.Index(
+                fields=["stripe_subscription_id"], name="organizatio_stripe__efc161_idx"
+            ),
+        ),
+    ]
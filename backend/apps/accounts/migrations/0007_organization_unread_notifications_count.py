@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_notifications(apps, schema_editor):
+    Organization = apps.get_model("accounts", "Organization")
+    SubscriptionNotification = apps.get_model(
+        "notifications", "SubscriptionNotification"
+    )
+    unread = (
+        SubscriptionNotification.objects.filter(
+            organization=OuterRef("pk"), is_read=False
+        )
+        .order_by()
+        .values("organization")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Organization.objects.update(
+        unread_notifications_count=Coalesce(Subquery(unread), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0006_organization_stripe_subscription_id_index"),
+        ("notifications", "0002_notification_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organization",
+            name="unread_notifications_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_notifications, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
 import uuid
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.core.validators import EmailValidator
 from apps.common.utils import generate_invitation_token
+from apps.subscriptions.plans import PLAN_CONFIG
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from apps.common.constants import (UserRole, MembershipStatus, SubscriptionPlan, SubscriptionStatus, BillingCycle, InvitationStatus)
 
@@ -35,16 +39,21 @@ class Organization(models.Model):
     cancel_at_period_end = models.BooleanField(default=False)
     stripe_customer_id = models.CharField(max_length=255, null=True, blank=True)
     stripe_subscription_id = models.CharField(max_length=255, null=True, blank=True)
-    stripe_price_id = models.CharField(max_length=255, null=True, blank=True)
+    stripe_subscription_item_id = models.CharField(max_length=255, null=True, blank=True)
     stripe_payment_method_id = models.CharField(max_length=255, null=True, blank=True)
-    contacts_limit = models.IntegerField(default=1000)
-    campaigns_limit = models.IntegerField(default=10)
     emails_per_month_limit = models.IntegerField(default=10000)
     is_subscription_active = models.BooleanField(default=True)
     industry = models.CharField(max_length=100, null=True, blank=True)
     employees_range = models.CharField(max_length=50, null=True, blank=True)
     contacts_range = models.CharField(max_length=50, null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
+    # Resource totals kept in step by apps.subscriptions.signals and
+    # reconciled weekly, so limit checks don't COUNT(*) on every request
+    cached_contacts_count = models.IntegerField(default=0)
+    cached_campaigns_count = models.IntegerField(default=0)
+    cached_templates_count = models.IntegerField(default=0)
+    cached_domains_count = models.IntegerField(default=0)
+    unread_notifications_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -54,6 +63,7 @@ class Organization(models.Model):
             models.Index(fields=['subscription_plan']),
             models.Index(fields=['subscription_status']),
             models.Index(fields=['stripe_customer_id']),
+            models.Index(fields=['stripe_subscription_id']),
             models.Index(fields=['trial_ends_at']),
             models.Index(fields=['subscription_ends_at']),
             models.Index(fields=['-created_at']),
@@ -62,6 +72,47 @@ class Organization(models.Model):
     def __str__(self):
         return self.name
 
+    # Limits and price follow the plan, so they are read from PLAN_CONFIG
+    # rather than stored in columns that have to be kept in sync
+    @property
+    def plan_config(self):
+        return PLAN_CONFIG.get(self.subscription_plan, PLAN_CONFIG[SubscriptionPlan.FREE_TRIAL])
+
+    @property
+    def contacts_limit(self):
+        return self.plan_config.contacts_limit
+
+    @property
+    def campaigns_limit(self):
+        return self.plan_config.campaigns_limit
+
+    @property
+    def stripe_price_id(self):
+        return self.plan_config.stripe_price_id
+
+    @cached_property
+    def subscription_effective_state(self):
+        """
+        Expiry and effective activity of the subscription. The trial end date
+        applies to the free trial, the subscription end date to paid plans.
+        Evaluated once per instance, which the middleware and views share
+        through request.user.organization.
+        """
+        if self.subscription_plan == SubscriptionPlan.FREE_TRIAL:
+            ends_at = self.trial_ends_at
+        else:
+            ends_at = self.subscription_ends_at
+        is_expired = bool(ends_at and timezone.now() > ends_at)
+        return {
+            'is_expired': is_expired,
+            'is_active': self.is_subscription_active and not is_expired,
+        }
+
+    @classmethod
+    def adjust_counter(cls, organization_id, counter_field, delta):
+        """Atomically add delta to one of an organization's denormalized counters"""
+        cls.objects.filter(id=organization_id).update(**{counter_field: F(counter_field) + delta})
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     id = models.CharField(max_length=36, primary_key=True, default=uuid.uuid4, editable=False)
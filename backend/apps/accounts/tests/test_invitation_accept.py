@@ -0,0 +1,64 @@
+from datetime import timedelta
+from unittest import mock
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from apps.accounts.models import Invitation, Organization, User
+from apps.common.constants import NotificationChannel, NotificationType
+from apps.notifications.models import SubscriptionNotification
+
+
+@mock.patch('apps.notifications.notifications.send_invitation_accepted_notification', return_value=True)
+class InvitationAcceptTests(APITestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Acme')
+        self.own_org = Organization.objects.create(name='Jane Co')
+        inviter = User.objects.create_user(email='owner@example.com', organization=self.org)
+        self.user = User.objects.create_user(email='jane@example.com', organization=self.own_org)
+        self.invitation = Invitation.objects.create(
+            organization=self.org,
+            email=self.user.email,
+            invited_by=inviter,
+            expires_at=timezone.now() + timedelta(days=7)
+        )
+
+    def notify(self, organization, is_read=False):
+        return SubscriptionNotification.objects.create(
+            organization=organization,
+            user=self.user,
+            notification_type=NotificationType.TEAM_INVITATION_RECEIVED,
+            channel=NotificationChannel.IN_APP,
+            metadata={'invitation_id': str(self.invitation.id)},
+            is_read=is_read
+        )
+
+    def accept(self):
+        return self.client.post(reverse('invitation-accept', args=[self.invitation.token]), format='json')
+
+    def unread_count(self, organization):
+        return Organization.objects.get(id=organization.id).unread_notifications_count
+
+    def test_accept_settles_unread_counter_per_organization(self, _):
+        self.notify(self.org)
+        self.notify(self.org)
+        self.notify(self.own_org)
+        self.notify(self.own_org, is_read=True)
+
+        response = self.accept()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(SubscriptionNotification.objects.filter(is_read=False).exists())
+        self.assertEqual(self.unread_count(self.org), 0)
+        self.assertEqual(self.unread_count(self.own_org), 0)
+
+    def test_counter_failure_rolls_back_the_read_marks(self, _):
+        self.notify(self.org)
+
+        with mock.patch.object(Organization, 'adjust_counter', side_effect=RuntimeError('db down')), \
+                self.assertLogs('apps.common.exceptions', level='ERROR'):
+            response = self.accept()
+
+        self.assertEqual(response.status_code, 500)
+
+        self.assertTrue(SubscriptionNotification.objects.filter(is_read=False).exists())
+        self.assertEqual(self.unread_count(self.org), 1)
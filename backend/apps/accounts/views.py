@@ -405,14 +405,25 @@ class InvitationViewSet(viewsets.ModelViewSet):
             # Mark any related "invitation received" notifications as read for the accepting user
             # This ensures their notification dropdown is cleaned up
             if user:
-                from apps.accounts.models import SubscriptionNotification, NotificationType
+                from django.db import transaction
+                from django.db.models.functions import Now
+                from apps.common.constants import NotificationType
+                from apps.notifications.models import SubscriptionNotification
                 related_notifications = SubscriptionNotification.objects.filter(
                     user=user,
                     notification_type=NotificationType.TEAM_INVITATION_RECEIVED,
                     metadata__icontains=str(invitation.id),
                     is_read=False
                 )
-                related_notifications.update(is_read=True)
+                organization_ids = set(related_notifications.values_list('organization_id', flat=True))
+                # Settle each organization's unread counter by the rows its
+                # update actually changed, in the same transaction
+                with transaction.atomic():
+                    for organization_id in organization_ids:
+                        count = related_notifications.filter(organization_id=organization_id).update(
+                            is_read=True, read_at=Now(), updated_at=Now()
+                        )
+                        Organization.adjust_counter(organization_id, 'unread_notifications_count', -count)
             
             # Return user data for frontend
             user_serializer = UserSerializer(user)
@@ -4,3 +4,6 @@ class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.authentication'
     label = 'authentication'
+
+    def ready(self):
+        from apps.authentication import signals  # noqa: F401
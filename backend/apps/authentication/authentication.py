@@ -59,7 +59,7 @@ class SignedHeaderAuthentication(BaseAuthentication):
             
             # Get or create user using external Replit ID
             try:
-                user = User.objects.get(replit_id=user_id)
+                user = User.objects.select_related('organization').get(replit_id=user_id)
             except User.DoesNotExist:
                 # Validate organization exists before creating user
                 organization = None
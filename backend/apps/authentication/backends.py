@@ -0,0 +1,18 @@
+"""
+Authentication backend that loads the user's organization together with the
+user. Nearly every API view reads request.user.organization, so joining it
+into the session user lookup saves a query per request.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class OrganizationModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('organization').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
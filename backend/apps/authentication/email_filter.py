@@ -0,0 +1,118 @@
+"""
+Bloom filter of registered emails, used to answer signup availability checks
+without a database round-trip.
+
+Implemented on plain Redis bitmaps (SETBIT/GETBIT) so it works on stock Redis
+without the RedisBloom module. Sized for 10M emails at a 0.1% false positive
+rate (~18MB). A "maybe registered" answer always falls back to the database,
+and so does any case where the filter can't be trusted (no Redis configured,
+Redis unreachable, or the key missing/evicted).
+
+The filter is kept in the non-evicting buffer Redis when one is configured,
+otherwise in the cache, where an eviction only disables it until the next
+rebuild.
+
+The filter only counts as built once rebuild_email_filter has filled it from
+the user table and set the built bit, which lives in the same key so that
+eviction drops both together. Until then add_email leaves the key alone, so
+a signup can't create a filter that only knows about new users. Deploys run
+the build_email_filter command; the daily rebuild_email_filter_task keeps it
+current afterwards.
+"""
+import hashlib
+import logging
+from apps.common.redis import BUFFER_REDIS_ALIAS, get_redis
+
+logger = logging.getLogger(__name__)
+
+EMAIL_FILTER_KEY = 'users:emails:bloom'
+EMAIL_FILTER_BITS = 143_775_876  # m = -n*ln(p) / ln(2)^2 for n=10M, p=0.001
+EMAIL_FILTER_HASHES = 10  # k = (m/n) * ln(2)
+EMAIL_FILTER_BUILT_BIT = EMAIL_FILTER_BITS  # One past the filter bits
+REBUILD_BATCH_SIZE = 5000
+
+
+def get_filter_redis():
+    """Filter's Redis client: the buffer store if configured, else the cache"""
+    return get_redis(BUFFER_REDIS_ALIAS, 'default')
+
+
+def _bit_offsets(email):
+    """Bit positions for an email using Kirsch-Mitzenmacher double hashing"""
+    digest = hashlib.blake2b(email.encode('utf-8'), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    return [(h1 + i * h2) % EMAIL_FILTER_BITS for i in range(EMAIL_FILTER_HASHES)]
+
+
+def _set_bits(pipe, key, email):
+    for offset in _bit_offsets(email):
+        pipe.setbit(key, offset, 1)
+
+
+def add_email(email):
+    """Record a registered email in the filter (no-op without Redis or before the first build)"""
+    client = get_filter_redis()
+    if client is None:
+        return
+
+    try:
+        if not client.getbit(EMAIL_FILTER_KEY, EMAIL_FILTER_BUILT_BIT):
+            # The next rebuild reads the email from the user table
+            return
+        pipe = client.pipeline(transaction=False)
+        _set_bits(pipe, EMAIL_FILTER_KEY, email.lower())
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Could not add email to signup filter: %s", e)
+
+
+def email_maybe_registered(email):
+    """
+    Return False only when the email is definitely not registered.
+    True means "check the database".
+    """
+    client = get_filter_redis()
+    if client is None:
+        return True
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.getbit(EMAIL_FILTER_KEY, EMAIL_FILTER_BUILT_BIT)
+        for offset in _bit_offsets(email.lower()):
+            pipe.getbit(EMAIL_FILTER_KEY, offset)
+        is_built, *bits = pipe.execute()
+    except Exception as e:
+        logger.warning("Signup filter unavailable, falling back to database: %s", e)
+        return True
+
+    # The built bit is unset when the filter was never built or was evicted
+    return not is_built or all(bits)
+
+
+def rebuild_email_filter(emails):
+    """Rebuild the filter from an iterable of emails and swap it in atomically"""
+    client = get_filter_redis()
+    if client is None:
+        return 0
+
+    staging_key = f"{EMAIL_FILTER_KEY}:rebuild"
+    client.delete(staging_key)
+
+    count = 0
+    pipe = client.pipeline(transaction=False)
+    for email in emails:
+        _set_bits(pipe, staging_key, email.lower())
+        count += 1
+        if count % REBUILD_BATCH_SIZE == 0:
+            pipe.execute()
+    # Marks the filter as complete; also allocates the full bitmap, so an
+    # empty user table still yields a key
+    pipe.setbit(staging_key, EMAIL_FILTER_BUILT_BIT, 1)
+    pipe.execute()
+
+    # Emails registered while the rebuild ran can be dropped by the swap until
+    # the next run; basic_info re-checks the database, so that only costs a
+    # later 409 rather than a duplicate account
+    client.rename(staging_key, EMAIL_FILTER_KEY)
+    return count
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UsernameCounter",
+            fields=[
+                (
+                    "base",
+                    models.CharField(max_length=150, primary_key=True, serialize=False),
+                ),
+                ("last_suffix", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "username_counters",
+            },
+        ),
+    ]
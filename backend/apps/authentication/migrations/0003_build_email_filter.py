@@ -0,0 +1,13 @@
+from django.db import migrations
+
+
+# Used to build the signup email filter during migrate, which made deploys
+# depend on Redis; the build_email_filter management command does it now
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0002_username_counter"),
+        ("accounts", "0007_organization_unread_notifications_count"),
+    ]
+
+    operations = []
@@ -29,6 +29,18 @@ class EmailOTP(models.Model):
     def is_max_attempts_reached(self):
         return self.attempts >= self.max_attempts
 
+class UsernameCounter(models.Model):
+    """Last numeric suffix handed out for each username base (e.g. 'john' -> john1, john2, ...)"""
+    base = models.CharField(max_length=150, primary_key=True)
+    last_suffix = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'username_counters'
+
+    def __str__(self):
+        return f"{self.base} ({self.last_suffix})"
+
 class Session(models.Model):
     sid = models.CharField(max_length=40, primary_key=True)
     sess = models.JSONField()
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.dispatch import receiver
+from apps.accounts.models import User
+from django.db.models.signals import post_save
+from apps.authentication.email_filter import add_email
+
+
+@receiver(post_save, sender=User)
+def add_registered_email_to_filter(sender, instance, created, **kwargs):
+    """Keep the signup email filter in sync with every user creation path"""
+    if created and instance.email:
+        email = instance.email
+        transaction.on_commit(lambda: add_email(email))
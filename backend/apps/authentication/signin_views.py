@@ -134,7 +134,7 @@ def authenticate_credentials(request):
             user.login_attempts = 0
             user.locked_until = None
             user.last_login_at = timezone.now()
-            user.save()
+            user.save(update_fields=['login_attempts', 'locked_until', 'last_login_at', 'updated_at'])
             
             # Check if MFA/OTP/SSO is required
             if user.mfa_enabled or user.sso_enabled:
@@ -149,7 +149,7 @@ def authenticate_credentials(request):
                 })
             else:
                 # Login user directly if no additional verification needed
-                login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+                login(request, user, backend='apps.authentication.backends.OrganizationModelBackend')
                 
                 # Get membership information for the response
                 membership = OrganizationMembership.objects.get(id=signin_membership_id)
@@ -179,7 +179,7 @@ def authenticate_credentials(request):
             user.login_attempts += 1
             if user.login_attempts >= 5:
                 user.locked_until = timezone.now() + timedelta(minutes=30)
-            user.save()
+            user.save(update_fields=['login_attempts', 'locked_until', 'updated_at'])
             
             return Response({
                 'error': 'Invalid credentials',
@@ -227,7 +227,7 @@ def verify_mfa_otp_sso(request):
         # Simple verification - accept any 6-digit code for demo
         if verification_code.isdigit() and len(verification_code) == 6:
             # Login user after successful verification
-            login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+            login(request, user, backend='apps.authentication.backends.OrganizationModelBackend')
             
             # Get membership information for the response
             membership = OrganizationMembership.objects.get(id=signin_membership_id)
@@ -1,4 +1,6 @@
+import re
 import random
+import logging
 from datetime import timedelta
 from django.conf import settings
 from django.utils import timezone
@@ -7,13 +9,33 @@ from rest_framework import status
 from django.core.mail import send_mail
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from apps.authentication.models import EmailOTP
+from apps.authentication.models import EmailOTP, UsernameCounter
+from apps.authentication.email_filter import email_maybe_registered
+from apps.common.tasks import send_welcome_email_task
 from apps.accounts.models import User, Organization
 from django.contrib.auth.hashers import make_password
 from apps.common.constants import UserRole, SubscriptionPlan
 from rest_framework.decorators import api_view, permission_classes
 from apps.accounts.serializers import UserSerializer, OrganizationSerializer
 
+logger = logging.getLogger(__name__)
+
+# Characters stripped from first names when building usernames
+USERNAME_STRIP_RE = re.compile(r'[^a-z0-9]')
+
+# Email settings don't change at runtime - resolve dev mode once at import.
+# send_otp hands out the fixed code when SMTP isn't configured, resend_otp
+# when SendGrid isn't, as they always have.
+SMTP_DEV_MODE = not (settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD)
+SENDGRID_DEV_MODE = not settings.SENDGRID_API_KEY
+DEV_OTP_CODE = '123456'
+DEV_OTP_RESPONSE = {
+    'message': f'Development mode: Use OTP code {DEV_OTP_CODE}',
+    'expires_in_minutes': 20,
+    'dev_mode': True,
+    'dev_otp': DEV_OTP_CODE
+}
+
 
 def generate_otp():
     """Generate a 6-digit OTP"""
@@ -21,30 +43,43 @@ def generate_otp():
 
 
 def generate_unique_username(first_name):
-    """Generate a unique username based on first name with numeric suffix starting from 1"""
+    """
+    Generate a unique username based on first name with numeric suffix starting from 1.
+    Must be called inside transaction.atomic() - the per-base counter row is locked
+    until the surrounding transaction commits, so concurrent signups never collide.
+    """
     base_username = first_name.lower().strip()
-    # Remove any non-alphanumeric characters
-    import re
-    base_username = re.sub(r'[^a-z0-9]', '', base_username)
+    # Remove any non-alphanumeric characters, and trailing digits so one base's
+    # numbered names never overlap another's ("john1" + 1 would be "john" + 11)
+    base_username = USERNAME_STRIP_RE.sub('', base_username).rstrip('0123456789')
     
     if not base_username:
         base_username = "user"
     
-    # Always start with numeric suffix from 1 as per requirements
-    counter = 1
-    while True:
-        username_candidate = f"{base_username}{counter}"
-        if not User.objects.filter(username=username_candidate).exists():
-            return username_candidate
-        counter += 1
-        # Safety check to avoid infinite loop
-        if counter > 9999:
-            # Fallback to uuid if we can't find a unique username
-            import uuid
-            return f"{base_username}{str(uuid.uuid4())[:8]}"
+    def highest_existing_suffix():
+        # Seed a new counter past any usernames issued before counters existed
+        suffixes = [
+            int(username[len(base_username):])
+            for username in User.objects.filter(
+                username__regex=rf'^{base_username}[0-9]+$'
+            ).values_list('username', flat=True)
+        ]
+        return max(suffixes, default=0)
+    
+    counter, _ = UsernameCounter.objects.select_for_update().get_or_create(
+        base=base_username,
+        defaults={'last_suffix': highest_existing_suffix}
+    )
+    counter.last_suffix += 1
+    # Step over any name taken outside the counter (e.g. set by an admin)
+    while User.objects.filter(username=f"{base_username}{counter.last_suffix}").exists():
+        counter.last_suffix += 1
+    counter.save(update_fields=['last_suffix', 'updated_at'])
+    
+    return f"{base_username}{counter.last_suffix}"
 
 
-def send_welcome_email(email, first_name, username, organization):
+def send_welcome_email(email, first_name, username, organization_id):
     """Send welcome email using Django SMTP"""
     try:
         html_message = f"""
@@ -57,7 +92,7 @@ def send_welcome_email(email, first_name, username, organization):
                 <h3 style="color: #333; margin-top: 0;">Your Account Details:</h3>
                 <p style="margin: 5px 0;"><strong>Username:</strong> {username}</p>
                 <p style="margin: 5px 0;"><strong>Email:</strong> {email}</p>
-                <p style="margin: 5px 0;"><strong>Organization ID:</strong> {organization.id}</p>
+                <p style="margin: 5px 0;"><strong>Organization ID:</strong> {organization_id}</p>
             </div>
             <p style="color: #666;">
                 You can now log in to your account and start creating powerful email campaigns. 
@@ -83,7 +118,7 @@ def send_welcome_email(email, first_name, username, organization):
         Your Account Details:
         Username: {username}
         Email: {email}
-        Organization ID: {organization.id}
+        Organization ID: {organization_id}
         
         You can now log in to your account and start creating powerful email campaigns. 
         We've set up a 14-day free trial for you to explore all features.
@@ -103,8 +138,6 @@ def send_welcome_email(email, first_name, username, organization):
         return sent == 1
         
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
         logger.warning(f"Failed to send welcome email to {email}: {str(e)}")
         return False
 
@@ -155,7 +188,7 @@ def send_otp_email(email, otp_code):
         return sent == 1
         
     except Exception as e:
-        print(f"Error sending OTP email: {e}")
+        logger.error("Error sending OTP email: %s", e)
         return False
 
 
@@ -172,8 +205,9 @@ def check_email(request):
             'error': 'Email is required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Check if email already exists
-    if User.objects.filter(email=email).exists():
+    # Check if email already exists - the bloom filter answers the common
+    # "not registered" case without touching the database
+    if email_maybe_registered(email) and User.objects.filter(email=email).exists():
         return Response({
             'error': 'This email is already registered',
             'exists': True
@@ -292,12 +326,7 @@ def send_otp(request):
             'error': 'Email not found in session'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Clean up expired OTPs
-    EmailOTP.objects.filter(
-        email=email,
-        expires_at__lt=timezone.now()
-    ).delete()
-    
+    # Expired OTPs are swept by the purge_stale_otps periodic task
     # Check for recent valid OTP
     existing_otp = EmailOTP.objects.filter(
         email=email,
@@ -306,24 +335,16 @@ def send_otp(request):
     ).first()
     
     if existing_otp:
-        # Check if email service is configured (Django SMTP)
-        email_configured = bool(settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD)
-        
-        if not email_configured:
+        if SMTP_DEV_MODE:
             # Update existing OTP to use dev code
-            if existing_otp.otp_code != "123456":
-                existing_otp.otp_code = "123456"
+            if existing_otp.otp_code != DEV_OTP_CODE:
+                existing_otp.otp_code = DEV_OTP_CODE
                 existing_otp.save()
             
-            return Response({
-                'message': 'Development mode: Use OTP code 123456',
-                'expires_in_minutes': 20,
-                'dev_mode': True,
-                'dev_otp': '123456'
-            })
+            return Response(DEV_OTP_RESPONSE)
         
         # Resend existing OTP
-        print(f"DEBUG: Resending OTP {existing_otp.otp_code} to {email}")
+        logger.debug("Resending OTP to %s", email)
         if send_otp_email(email, existing_otp.otp_code):
             return Response({
                 'message': 'Verification code sent to your email',
@@ -334,12 +355,9 @@ def send_otp(request):
                 'error': 'Failed to send verification email'
             }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
-    # Check if email service is configured (Django SMTP)
-    email_configured = bool(settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD)
-    
     # Generate new OTP - use fixed OTP in dev mode
-    if not email_configured:
-        otp_code = "123456"  # Fixed OTP for development
+    if SMTP_DEV_MODE:
+        otp_code = DEV_OTP_CODE  # Fixed OTP for development
     else:
         otp_code = generate_otp()
         
@@ -353,16 +371,11 @@ def send_otp(request):
     )
     
     # For development: if email service not configured, return dev OTP
-    if not email_configured:
-        return Response({
-            'message': 'Development mode: Use OTP code 123456',
-            'expires_in_minutes': 20,
-            'dev_mode': True,
-            'dev_otp': '123456'
-        })
+    if SMTP_DEV_MODE:
+        return Response(DEV_OTP_RESPONSE)
     
     # Send OTP email
-    print(f"DEBUG: Sending new OTP {otp_code} to {email}")
+    logger.debug("Sending new OTP to %s", email)
     if send_otp_email(email, otp_code):
         return Response({
             'message': 'Verification code sent to your email',
@@ -407,17 +420,13 @@ def resend_otp(request):
         }, status=status.HTTP_404_NOT_FOUND)
     
     # For development: if email service not configured, ensure dev OTP
-    if not settings.SENDGRID_API_KEY:
+    if SENDGRID_DEV_MODE:
         # Update existing OTP to use dev code for consistency
-        if existing_otp.otp_code != "123456":
-            existing_otp.otp_code = "123456"
+        if existing_otp.otp_code != DEV_OTP_CODE:
+            existing_otp.otp_code = DEV_OTP_CODE
             existing_otp.save()
             
-        return Response({
-            'message': 'Development mode: Use OTP code 123456',
-            'dev_mode': True,
-            'dev_otp': '123456'
-        })
+        return Response(DEV_OTP_RESPONSE)
     
     # Send OTP email
     if send_otp_email(email, existing_otp.otp_code):
@@ -456,14 +465,14 @@ def verify_otp(request):
             'error': 'Email not found in session'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Find OTP record
-    try:
-        email_otp = EmailOTP.objects.get(
-            email=email,
-            otp_code=otp_code,
-            is_verified=False
-        )
-    except EmailOTP.DoesNotExist:
+    # Find OTP record (expired duplicates may linger until the periodic sweep)
+    email_otp = EmailOTP.objects.filter(
+        email=email,
+        otp_code=otp_code,
+        is_verified=False
+    ).order_by('-created_at').first()
+    
+    if not email_otp:
         return Response({
             'error': 'Invalid verification code'
         }, status=status.HTTP_400_BAD_REQUEST)
@@ -541,82 +550,62 @@ def create_account(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        print(f"DEBUG: Starting account creation for {email}")
-        print(f"DEBUG: Session data: {signup_data}")
-        
-        # Initialize variables
-        user = None
-        organization = None
-        generated_username = None
+        logger.debug("Starting account creation for %s", email)
         
-        # Handle username generation with race condition protection
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                with transaction.atomic():
-                    # Create organization first
-                    print(f"DEBUG: Creating organization with data: industry={industry}, employees={employees_range}, contacts={contacts_range}")
-                    organization = Organization.objects.create(
-                        name=f"{first_name} {last_name}'s Organization",
-                        subscription_plan=SubscriptionPlan.FREE_TRIAL,
-                        trial_ends_at=timezone.now() + timedelta(days=14),  # 14-day trial
-                        industry=industry,
-                        employees_range=employees_range,
-                        contacts_range=contacts_range
-                    )
-                    
-                    # Generate unique username based on first name
-                    generated_username = generate_unique_username(first_name)
-                    
-                    # Create user as ORGANIZER (organization owner)
-                    user = User.objects.create(
-                        email=email,
-                        username=generated_username,
-                        first_name=first_name,
-                        last_name=last_name,
-                        phone=phone,
-                        password=make_password(password),
-                        organization=organization,
-                        role=UserRole.ORGANIZER,  # First user becomes organization owner
-                        is_active=True
-                    )
-                    
-                    break  # Success, exit retry loop
-                    
-            except Exception as e:
-                from django.db import IntegrityError
-                if isinstance(e, IntegrityError) and 'username' in str(e) and attempt < max_retries - 1:
-                    # Username collision, retry with next available username
-                    print(f"DEBUG: Username collision on attempt {attempt + 1}, retrying...")
-                    continue
-                else:
-                    # Not a username collision or max retries reached, re-raise
-                    raise
-        
-        # Send welcome email
-        welcome_email_sent = send_welcome_email(email, first_name, generated_username, organization)
+        with transaction.atomic():
+            # Create organization first
+            logger.debug(
+                "Creating organization with data: industry=%s, employees=%s, contacts=%s",
+                industry, employees_range, contacts_range
+            )
+            organization = Organization.objects.create(
+                name=f"{first_name} {last_name}'s Organization",
+                subscription_plan=SubscriptionPlan.FREE_TRIAL,
+                trial_ends_at=timezone.now() + timedelta(days=14),  # 14-day trial
+                industry=industry,
+                employees_range=employees_range,
+                contacts_range=contacts_range
+            )
+            
+            # Generate unique username based on first name (counter row is
+            # locked, so no collision retry is needed)
+            generated_username = generate_unique_username(first_name)
+            
+            # Create user as ORGANIZER (organization owner)
+            user = User.objects.create(
+                email=email,
+                username=generated_username,
+                first_name=first_name,
+                last_name=last_name,
+                phone=phone,
+                password=make_password(password),
+                organization=organization,
+                role=UserRole.ORGANIZER,  # First user becomes organization owner
+                is_active=True
+            )
+            
+            # Send welcome email from a worker once the rows are committed
+            transaction.on_commit(
+                lambda: send_welcome_email_task.delay(email, first_name, generated_username, organization.id)
+            )
         
         # Clean up session data
         if 'signup_data' in request.session:
             del request.session['signup_data']
         
-        # Clean up verified OTP
-        EmailOTP.objects.filter(email=email, is_verified=True).delete()
-        
         return Response({
             'message': f'Welcome to EngageX, {first_name}! Your account has been successfully created.',
             'username': generated_username,
-            'welcome_email_sent': welcome_email_sent,
+            # The email is sent by a worker now, so this reports that it was
+            # queued; kept so existing clients see the same response shape
+            'welcome_email_sent': True,
             'user': UserSerializer(user).data,
             'organization': OrganizationSerializer(organization).data,
             'trial_ends_at': organization.trial_ends_at.isoformat()
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
-        print(f"DEBUG: Account creation failed with error: {str(e)}")
-        print(f"DEBUG: Error type: {type(e)}")
-        import traceback
-        print(f"DEBUG: Traceback: {traceback.format_exc()}")
+        logger.exception("Account creation failed for %s", email)
         return Response({
             'error': f'Failed to create account: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
@@ -0,0 +1,52 @@
+from unittest import mock
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from apps.accounts.models import User
+from apps.accounts.serializers import UserSerializer, OrganizationSerializer
+
+SIGNUP_DATA = {
+    'email': 'jane@example.com',
+    'email_verified': True,
+    'first_name': 'Jane',
+    'last_name': 'Doe',
+    'phone': '+15550100',
+    'contacts_range': '0-500',
+    'employees_range': '1-10',
+    'industry': 'retail',
+}
+
+
+@mock.patch('apps.authentication.signup_views.send_welcome_email_task')
+class CreateAccountTests(APITestCase):
+    def setUp(self):
+        session = self.client.session
+        session['signup_data'] = SIGNUP_DATA
+        session.save()
+
+    def create_account(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('signup_create_account'),
+                {'password': 'correct-horse', 'confirm_password': 'correct-horse'},
+                format='json'
+            )
+
+    def test_response_keeps_serialized_user_and_organization(self, send_welcome_email_task):
+        response = self.create_account()
+
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.select_related('organization').get(email='jane@example.com')
+        self.assertEqual(response.data['username'], 'jane1')
+        self.assertTrue(response.data['welcome_email_sent'])
+        self.assertEqual(response.data['user'], UserSerializer(user).data)
+        self.assertEqual(response.data['organization'], OrganizationSerializer(user.organization).data)
+        self.assertEqual(response.data['trial_ends_at'], user.organization.trial_ends_at.isoformat())
+
+    def test_welcome_email_is_queued_after_commit(self, send_welcome_email_task):
+        self.create_account()
+
+        user = User.objects.get(email='jane@example.com')
+        send_welcome_email_task.delay.assert_called_once()
+        email, first_name, username, organization_id = send_welcome_email_task.delay.call_args.args
+        self.assertEqual((email, first_name, username), ('jane@example.com', 'Jane', 'jane1'))
+        self.assertEqual(str(organization_id), user.organization_id)
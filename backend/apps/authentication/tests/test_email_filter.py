@@ -0,0 +1,51 @@
+from unittest import mock
+from django.test import SimpleTestCase
+from apps.authentication import email_filter
+from apps.common.tests.fake_redis import FakeRedis
+
+
+class EmailFilterTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(email_filter, 'get_filter_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unbuilt_filter_always_defers_to_database(self):
+        self.assertTrue(email_filter.email_maybe_registered('existing@example.com'))
+        self.assertTrue(email_filter.email_maybe_registered('new@example.com'))
+
+    def test_signup_before_first_build_does_not_create_filter(self):
+        email_filter.add_email('new@example.com')
+
+        self.assertFalse(self.redis.exists(email_filter.EMAIL_FILTER_KEY))
+        # An existing user must not read as "definitely not registered"
+        self.assertTrue(email_filter.email_maybe_registered('existing@example.com'))
+
+    def test_built_filter_answers_not_registered(self):
+        count = email_filter.rebuild_email_filter(['Existing@Example.com'])
+
+        self.assertEqual(count, 1)
+        self.assertTrue(email_filter.email_maybe_registered('existing@example.com'))
+        self.assertFalse(email_filter.email_maybe_registered('new@example.com'))
+
+    def test_signup_after_build_is_added(self):
+        email_filter.rebuild_email_filter(['existing@example.com'])
+
+        email_filter.add_email('new@example.com')
+
+        self.assertTrue(email_filter.email_maybe_registered('new@example.com'))
+
+    def test_empty_user_table_still_builds_filter(self):
+        email_filter.rebuild_email_filter([])
+
+        self.assertFalse(email_filter.email_maybe_registered('new@example.com'))
+
+    def test_evicted_filter_is_not_recreated_by_signup(self):
+        email_filter.rebuild_email_filter(['existing@example.com'])
+        self.redis.delete(email_filter.EMAIL_FILTER_KEY)
+
+        email_filter.add_email('new@example.com')
+
+        self.assertFalse(self.redis.exists(email_filter.EMAIL_FILTER_KEY))
+        self.assertTrue(email_filter.email_maybe_registered('existing@example.com'))
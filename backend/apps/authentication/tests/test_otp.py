@@ -0,0 +1,66 @@
+import io
+from contextlib import redirect_stdout
+from datetime import timedelta
+from unittest import mock
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from apps.authentication import signup_views
+from apps.authentication.models import EmailOTP
+
+EMAIL = 'jane@example.com'
+
+
+@mock.patch.object(signup_views, 'send_otp_email', return_value=True)
+class OtpTests(APITestCase):
+    def setUp(self):
+        session = self.client.session
+        session['signup_data'] = {'email': EMAIL, 'step': 3}
+        session.save()
+
+    def post(self, url_name):
+        return self.client.post(reverse(url_name), format='json')
+
+    def active_otp(self, otp_code='654321'):
+        return EmailOTP.objects.create(
+            email=EMAIL, otp_code=otp_code, expires_at=timezone.now() + timedelta(minutes=20)
+        )
+
+    @mock.patch.object(signup_views, 'SMTP_DEV_MODE', True)
+    @mock.patch.object(signup_views, 'SENDGRID_DEV_MODE', False)
+    def test_resend_with_sendgrid_emails_the_code(self, send_otp_email):
+        self.active_otp()
+
+        response = self.post('signup_resend_otp')
+
+        self.assertNotIn('dev_otp', response.data)
+        send_otp_email.assert_called_once_with(EMAIL, '654321')
+
+    @mock.patch.object(signup_views, 'SMTP_DEV_MODE', False)
+    @mock.patch.object(signup_views, 'SENDGRID_DEV_MODE', True)
+    def test_resend_without_sendgrid_uses_dev_code(self, send_otp_email):
+        self.active_otp()
+
+        response = self.post('signup_resend_otp')
+
+        self.assertEqual(response.data['dev_otp'], signup_views.DEV_OTP_CODE)
+        send_otp_email.assert_not_called()
+
+    @mock.patch.object(signup_views, 'SMTP_DEV_MODE', False)
+    @mock.patch.object(signup_views, 'SENDGRID_DEV_MODE', True)
+    def test_send_follows_smtp_configuration(self, send_otp_email):
+        response = self.post('signup_send_otp')
+
+        self.assertNotIn('dev_otp', response.data)
+        send_otp_email.assert_called_once()
+
+    @mock.patch.object(signup_views, 'SMTP_DEV_MODE', False)
+    def test_otp_code_is_not_printed_or_logged(self, send_otp_email):
+        self.active_otp('654321')
+        stdout = io.StringIO()
+
+        with redirect_stdout(stdout), self.assertLogs(signup_views.logger, level='DEBUG') as logs:
+            self.post('signup_send_otp')
+
+        self.assertNotIn('654321', stdout.getvalue())
+        self.assertNotIn('654321', '\n'.join(logs.output))
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.test import TestCase
+from apps.accounts.models import User
+from apps.authentication.models import UsernameCounter
+from apps.authentication.signup_views import generate_unique_username
+
+
+class GenerateUniqueUsernameTests(TestCase):
+    def generate(self, first_name):
+        with transaction.atomic():
+            username = generate_unique_username(first_name)
+            User.objects.create_user(email=f"{username}@example.com", username=username)
+        return username
+
+    def test_suffixes_count_up_per_base(self):
+        self.assertEqual(self.generate('John'), 'john1')
+        self.assertEqual(self.generate('john'), 'john2')
+
+    def test_name_ending_in_digits_shares_the_base(self):
+        # "john1" as its own base would hand out john11, which the "john"
+        # counter also reaches
+        names = [self.generate('john') for _ in range(10)] + [self.generate('John1')]
+        names.append(self.generate('john'))
+
+        self.assertEqual(len(set(names)), len(names))
+        self.assertEqual(names[-2:], ['john11', 'john12'])
+
+    def test_new_counter_starts_past_existing_usernames(self):
+        User.objects.create_user(email='old@example.com', username='mary7')
+
+        self.assertEqual(self.generate('Mary'), 'mary8')
+        self.assertEqual(UsernameCounter.objects.get(base='mary').last_suffix, 8)
+
+    def test_name_taken_outside_counter_is_skipped(self):
+        self.generate('anna')
+        User.objects.create_user(email='admin-made@example.com', username='anna2')
+
+        self.assertEqual(self.generate('anna'), 'anna3')
+
+    def test_name_without_letters_falls_back_to_user(self):
+        self.assertEqual(self.generate('123 !'), 'user1')
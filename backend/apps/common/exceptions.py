@@ -0,0 +1,26 @@
+"""
+Exception handling for EngageX API endpoints.
+"""
+import logging
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import exception_handler, set_rollback
+
+logger = logging.getLogger(__name__)
+
+
+def api_exception_handler(exc, context):
+    """
+    DRF's handler, plus a generic JSON 500 for unexpected errors so views don't
+    need a catch-all that echoes internal exception messages to the client.
+    """
+    response = exception_handler(exc, context)
+    if response is not None:
+        return response
+
+    request = context.get('request')
+    logger.exception("Unhandled error in %s", request.path if request else 'API view')
+    set_rollback()
+    return Response({
+        'error': 'Internal server error'
+    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
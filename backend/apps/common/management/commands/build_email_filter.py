@@ -0,0 +1,18 @@
+"""
+Management command to build the signup email filter from the user table
+"""
+from django.core.management.base import BaseCommand
+from apps.authentication import email_filter
+from apps.common.tasks import rebuild_email_filter_task
+
+
+class Command(BaseCommand):
+    help = 'Build the signup email bloom filter; run on deploy, safe to run repeatedly'
+
+    def handle(self, *args, **kwargs):
+        if email_filter.get_filter_redis() is None:
+            # Availability checks go to the database until a Redis is configured
+            self.stdout.write(self.style.WARNING('No Redis configured; the signup email filter stays unused'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(rebuild_email_filter_task()))
@@ -206,7 +206,9 @@ class Command(BaseCommand):
                 # Mark as inactive and send notification
                 org.subscription_status = SubscriptionStatus.EXPIRED
                 org.is_subscription_active = False
-                org.save()
+                org.save(update_fields=[
+                    'subscription_status', 'is_subscription_active', 'updated_at'
+                ])
                 
                 from apps.notifications.notifications import send_subscription_expired_notification
                 send_subscription_expired_notification(org)
@@ -0,0 +1,53 @@
+"""
+Management command to provision one Stripe Product and recurring Price per paid plan
+"""
+import stripe
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.common.constants import SubscriptionPlan
+from apps.subscriptions.plans import PLAN_CONFIG, stripe_price_lookup_key
+from apps.subscriptions.subscription_views import PLAN_BILLING_INTERVAL
+
+
+class Command(BaseCommand):
+    help = 'Create the Stripe prices for the paid plans; safe to run repeatedly'
+
+    def handle(self, *args, **kwargs):
+        if not settings.STRIPE_SECRET_KEY:
+            raise CommandError('STRIPE_SECRET_KEY is not configured')
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+
+        for plan_key, plan_config in PLAN_CONFIG.items():
+            if plan_key == SubscriptionPlan.FREE_TRIAL:
+                continue
+
+            lookup_key = stripe_price_lookup_key(plan_key)
+            prices = stripe.Price.list(lookup_keys=[lookup_key], active=True, limit=1)
+
+            if prices.data:
+                price = prices.data[0]
+                if price.unit_amount != plan_config.unit_amount_cents:
+                    self.stdout.write(self.style.WARNING(
+                        f'{plan_key}: existing price {price.id} is {price.unit_amount} cents, '
+                        f'plan is {plan_config.unit_amount_cents}'
+                    ))
+            else:
+                # Idempotency keys make a rerun after a partial failure reuse
+                # the objects Stripe already created
+                product = stripe.Product.create(
+                    name=plan_config.name,
+                    description=', '.join(plan_config.features[:3]),
+                    idempotency_key=f"product-{lookup_key}"
+                )
+                price = stripe.Price.create(
+                    product=product.id,
+                    currency='usd',
+                    unit_amount=plan_config.unit_amount_cents,
+                    recurring={'interval': PLAN_BILLING_INTERVAL[plan_key]},
+                    lookup_key=lookup_key,
+                    idempotency_key=f"price-{lookup_key}-{plan_config.unit_amount_cents}"
+                )
+                self.stdout.write(self.style.SUCCESS(f'{plan_key}: created price {price.id}'))
+
+            # Pinning the id in settings saves the lookup at checkout
+            self.stdout.write(f'STRIPE_PRICE_{plan_key.upper()}={price.id}')
@@ -11,6 +11,9 @@ from django.http import JsonResponse
 from apps.accounts.models import User
 from django.contrib.auth.models import AnonymousUser
 from django.utils.deprecation import MiddlewareMixin
+from apps.subscriptions.plans import BASIC_PLANS
+from apps.subscriptions.features import get_plan_features
+from apps.subscriptions.usage_buffer import get_buffered_usage
 from apps.subscriptions.models import SubscriptionPlan, PlanFeatures, UsageTracking, SubscriptionStatus
 
 logger = logging.getLogger(__name__)
@@ -224,23 +227,20 @@ class SubscriptionAccessMiddleware(MiddlewareMixin):
         now = timezone.now()
         
         # Check if trial or subscription expired
-        is_expired = False
+        state = organization.subscription_effective_state
+        is_expired = state['is_expired']
         days_remaining = None
         
         if organization.subscription_plan == SubscriptionPlan.FREE_TRIAL:
-            if organization.trial_ends_at:
-                is_expired = now > organization.trial_ends_at
-                if not is_expired:
-                    days_remaining = (organization.trial_ends_at - now).days
+            ends_at = organization.trial_ends_at
         else:
-            if organization.subscription_ends_at:
-                is_expired = now > organization.subscription_ends_at
-                if not is_expired:
-                    days_remaining = (organization.subscription_ends_at - now).days
+            ends_at = organization.subscription_ends_at
+        if ends_at and not is_expired:
+            days_remaining = (ends_at - now).days
         
         # Get plan features
-        try:
-            plan_features = PlanFeatures.objects.get(plan=organization.subscription_plan)
+        plan_features = get_plan_features(organization.subscription_plan)
+        if plan_features:
             features = {
                 'contacts_limit': plan_features.contacts_limit,
                 'campaigns_limit': plan_features.campaigns_limit,
@@ -252,7 +252,7 @@ class SubscriptionAccessMiddleware(MiddlewareMixin):
                 'has_white_labeling': plan_features.has_white_labeling,
                 'has_custom_templates': plan_features.has_custom_templates,
             }
-        except PlanFeatures.DoesNotExist:
+        else:
             # Use organization's default limits
             features = {
                 'contacts_limit': organization.contacts_limit,
@@ -270,7 +270,7 @@ class SubscriptionAccessMiddleware(MiddlewareMixin):
             'plan': organization.subscription_plan,
             'status': organization.subscription_status,
             'is_expired': is_expired,
-            'is_active': organization.is_subscription_active and not is_expired,
+            'is_active': state['is_active'],
             'is_trial': organization.subscription_plan == SubscriptionPlan.FREE_TRIAL,
             'days_remaining': days_remaining,
             'trial_ends_at': organization.trial_ends_at,
@@ -297,35 +297,36 @@ class SubscriptionAccessMiddleware(MiddlewareMixin):
                 'ab_tests_created': 0,
             }
         )
+        # Increments still waiting in the Redis buffer
+        pending = get_buffered_usage(organization.id, month_start)
         
-        # Also get current counts from database
+        # Current totals from the organization's denormalized counters
         current_counts = {
-            'total_contacts': organization.contacts.count(),
-            'total_campaigns': organization.campaigns.count(),
-            'total_templates': organization.email_templates.count(),
-            'total_domains': organization.domains.count(),
+            'total_contacts': organization.cached_contacts_count,
+            'total_campaigns': organization.cached_campaigns_count,
+            'total_templates': organization.cached_templates_count,
+            'total_domains': organization.cached_domains_count,
         }
         
         return {
             'month': month_start.isoformat(),
-            'emails_sent': usage.emails_sent,
-            'campaigns_created': usage.campaigns_created,
-            'contacts_imported': usage.contacts_imported,
-            'templates_created': usage.templates_created,
-            'domains_verified': usage.domains_verified,
-            'api_calls': usage.api_calls,
-            'ab_tests_created': usage.ab_tests_created,
+            'emails_sent': usage.emails_sent + pending.get('emails_sent', 0),
+            'campaigns_created': usage.campaigns_created + pending.get('campaigns_created', 0),
+            'contacts_imported': usage.contacts_imported + pending.get('contacts_imported', 0),
+            'templates_created': usage.templates_created + pending.get('templates_created', 0),
+            'domains_verified': usage.domains_verified + pending.get('domains_verified', 0),
+            'api_calls': usage.api_calls + pending.get('api_calls', 0),
+            'ab_tests_created': usage.ab_tests_created + pending.get('ab_tests_created', 0),
             **current_counts
         }
     
     def _check_feature_available(self, organization, feature):
         """Check if a specific feature is available for the organization's plan"""
-        try:
-            plan_features = PlanFeatures.objects.get(plan=organization.subscription_plan)
-            return getattr(plan_features, feature, False)
-        except PlanFeatures.DoesNotExist:
+        plan_features = get_plan_features(organization.subscription_plan)
+        if plan_features is None:
             # Default to basic features only
             return feature in ['has_email_campaigns', 'has_basic_analytics']
+        return getattr(plan_features, feature, False)
     
     def _get_plans_with_feature(self, feature):
         """Get list of plans that have a specific feature"""
@@ -383,7 +384,7 @@ class SubscriptionAccessMiddleware(MiddlewareMixin):
         elif '/api/templates/' in path and request.method == 'POST':
             if not features.get('has_custom_templates', False):
                 # Basic plans have limited templates (e.g., 10)
-                template_limit = 10 if 'basic' in organization.subscription_plan.lower() else 50
+                template_limit = 10 if organization.subscription_plan in BASIC_PLANS else 50
                 if usage['total_templates'] >= template_limit:
                     return JsonResponse({
                         'error': f'Template limit reached. You have {usage["total_templates"]} of {template_limit} templates.',
@@ -460,16 +461,9 @@ def requires_active_subscription(view_func):
             }, status=403)
         
         org = request.user.organization
-        now = timezone.now()
         
         # Check if subscription is active
-        is_expired = False
-        if org.subscription_plan == SubscriptionPlan.FREE_TRIAL:
-            is_expired = org.trial_ends_at and now > org.trial_ends_at
-        else:
-            is_expired = org.subscription_ends_at and now > org.subscription_ends_at
-        
-        if is_expired or not org.is_subscription_active:
+        if not org.subscription_effective_state['is_active']:
             return JsonResponse({
                 'error': 'Active subscription required',
                 'code': 'SUBSCRIPTION_REQUIRED',
@@ -500,11 +494,8 @@ def requires_plan_feature(feature_name):
             org = request.user.organization
             
             # Check if feature is available
-            try:
-                plan_features = PlanFeatures.objects.get(plan=org.subscription_plan)
-                has_feature = getattr(plan_features, feature_name, False)
-            except PlanFeatures.DoesNotExist:
-                has_feature = False
+            plan_features = get_plan_features(org.subscription_plan)
+            has_feature = getattr(plan_features, feature_name, False) if plan_features else False
             
             if not has_feature:
                 return JsonResponse({
@@ -0,0 +1,24 @@
+"""
+Raw Redis clients behind the django-redis cache aliases.
+"""
+
+# Non-evicting Redis (BUFFER_REDIS_URL) for data that can't be recomputed
+# from the cache being flushed; only configured in production
+BUFFER_REDIS_ALIAS = 'buffers'
+
+
+def get_redis(*aliases):
+    """
+    Return the Redis client of the first configured alias (default: the
+    cache), or None when none of them is backed by Redis
+    """
+    from django_redis import get_redis_connection
+
+    for alias in aliases or ('default',):
+        try:
+            return get_redis_connection(alias)
+        except Exception:
+            # Alias not configured, or a dummy/local cache backend
+            # (development) without a Redis client
+            continue
+    return None
@@ -1,17 +1,21 @@
+import stripe
 import logging
 import dns.resolver
 from celery import shared_task
+from decimal import Decimal
 from datetime import timedelta
 from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import F, Q
 from apps.domains.models import Domain
 from apps.contacts.models import Contact
 from django.core.mail import EmailMessage
 from apps.analytics.models import AnalyticsEvent
 from apps.accounts.models import Organization, User
+from apps.authentication.models import EmailOTP
 from apps.campaigns.models import Campaign, CampaignRecipient
-from apps.common.constants import SubscriptionPlan, SubscriptionStatus
+from apps.common.constants import SubscriptionPlan, SubscriptionStatus, SubscriptionEventType
 
 logger = logging.getLogger(__name__)
 
@@ -42,20 +46,20 @@ def verify_domain_dns(domain_id):
                         domain.status = 'verified'
                         domain.verified_at = timezone.now()
                         domain.save()
-                        logger.info(f"Domain {domain.domain} verified successfully")
+                        logger.info("Domain %s verified successfully", domain.domain)
                         return f"Domain {domain.domain} verified"
             except dns.resolver.NXDOMAIN:
-                logger.warning(f"Domain {domain.domain} not found in DNS")
+                logger.warning("Domain %s not found in DNS", domain.domain)
             except dns.resolver.NoAnswer:
-                logger.warning(f"No TXT records found for {domain.domain}")
+                logger.warning("No TXT records found for %s", domain.domain)
             except Exception as e:
-                logger.error(f"DNS verification failed for {domain.domain}: {str(e)}")
+                logger.error("DNS verification failed for %s: %s", domain.domain, e)
                 
         # If verification fails, update timestamp but keep pending status
         domain.save()
         
     except Domain.DoesNotExist:
-        logger.error(f"Domain with id {domain_id} not found")
+        logger.error("Domain with id %s not found", domain_id)
     
     return f"Domain verification completed for {domain_id}"
 
@@ -93,7 +97,7 @@ def send_campaign_emails(campaign_id):
         return f"Started sending {len(recipients_list)} emails for campaign {campaign.name}"
         
     except Campaign.DoesNotExist:
-        logger.error(f"Campaign with id {campaign_id} not found")
+        logger.error("Campaign with id %s not found", campaign_id)
         return f"Campaign {campaign_id} not found"
 
 
@@ -164,7 +168,7 @@ def send_email_batch(campaign_id, recipient_ids):
                 recipient.save()
                 
             except Exception as e:
-                logger.error(f"Failed to send email to {recipient.contact.email}: {str(e)}")
+                logger.error("Failed to send email to %s: %s", recipient.contact.email, e)
                 recipient.status = 'failed'
                 recipient.save()
                 error_count += 1
@@ -177,7 +181,7 @@ def send_email_batch(campaign_id, recipient_ids):
         return f"Batch completed: {success_count} sent, {error_count} failed"
         
     except Campaign.DoesNotExist:
-        logger.error(f"Campaign with id {campaign_id} not found")
+        logger.error("Campaign with id %s not found", campaign_id)
         return f"Campaign {campaign_id} not found"
 
 
@@ -315,7 +319,7 @@ def import_contacts_from_csv(organization_id, csv_data, user_id):
                     updated_count += 1
                     
             except Exception as e:
-                logger.error(f"Error importing contact row {row}: {str(e)}")
+                logger.error("Error importing contact row %s: %s", row, e)
                 error_count += 1
         
         return {
@@ -326,7 +330,7 @@ def import_contacts_from_csv(organization_id, csv_data, user_id):
         }
         
     except (Organization.DoesNotExist, User.DoesNotExist) as e:
-        logger.error(f"Import failed: {str(e)}")
+        logger.error("Import failed: %s", e)
         return {'error': str(e)}
 
 
@@ -350,9 +354,9 @@ def check_trial_expirations():
         for org in orgs_7_days:
             try:
                 send_trial_expiry_reminder(org, 7)
-                logger.info(f"Sent 7-day trial expiry reminder to org {org.id}")
+                logger.info("Sent 7-day trial expiry reminder to org %s", org.id)
             except Exception as e:
-                logger.error(f"Failed to send 7-day reminder to org {org.id}: {str(e)}")
+                logger.error("Failed to send 7-day reminder to org %s: %s", org.id, e)
         
         # Check for trials expiring tomorrow
         tomorrow = now + timedelta(days=1)
@@ -365,9 +369,9 @@ def check_trial_expirations():
         for org in orgs_1_day:
             try:
                 send_trial_expiry_reminder(org, 1)
-                logger.info(f"Sent 1-day trial expiry reminder to org {org.id}")
+                logger.info("Sent 1-day trial expiry reminder to org %s", org.id)
             except Exception as e:
-                logger.error(f"Failed to send 1-day reminder to org {org.id}: {str(e)}")
+                logger.error("Failed to send 1-day reminder to org %s: %s", org.id, e)
         
         # Check for expired trials
         expired_orgs = Organization.objects.filter(
@@ -381,14 +385,16 @@ def check_trial_expirations():
                 # Mark subscription as inactive
                 org.is_subscription_active = False
                 org.subscription_status = SubscriptionStatus.CANCELED
-                org.save()
+                org.save(update_fields=[
+                    'is_subscription_active', 'subscription_status', 'updated_at'
+                ])
                 
                 # Send trial ended notification
                 from apps.notifications.notifications import send_cancellation_notification
                 send_cancellation_notification(org)
-                logger.info(f"Marked trial as expired for org {org.id}")
+                logger.info("Marked trial as expired for org %s", org.id)
             except Exception as e:
-                logger.error(f"Failed to process expired trial for org {org.id}: {str(e)}")
+                logger.error("Failed to process expired trial for org %s: %s", org.id, e)
         
         return {
             '7_days_reminders': orgs_7_days.count(),
@@ -397,7 +403,7 @@ def check_trial_expirations():
         }
         
     except Exception as e:
-        logger.error(f"Error in check_trial_expirations: {str(e)}")
+        logger.error("Error in check_trial_expirations: %s", e)
         return {'error': str(e)}
 
 
@@ -420,9 +426,9 @@ def check_subscription_expirations():
         for org in orgs_3_days:
             try:
                 send_subscription_expiry_reminder(org, 3)
-                logger.info(f"Sent 3-day subscription expiry reminder to org {org.id}")
+                logger.info("Sent 3-day subscription expiry reminder to org %s", org.id)
             except Exception as e:
-                logger.error(f"Failed to send 3-day reminder to org {org.id}: {str(e)}")
+                logger.error("Failed to send 3-day reminder to org %s: %s", org.id, e)
         
         # Check for subscriptions expiring tomorrow
         tomorrow = now + timedelta(days=1)
@@ -435,9 +441,9 @@ def check_subscription_expirations():
         for org in orgs_1_day:
             try:
                 send_subscription_expiry_reminder(org, 1)
-                logger.info(f"Sent 1-day subscription expiry reminder to org {org.id}")
+                logger.info("Sent 1-day subscription expiry reminder to org %s", org.id)
             except Exception as e:
-                logger.error(f"Failed to send 1-day reminder to org {org.id}: {str(e)}")
+                logger.error("Failed to send 1-day reminder to org %s: %s", org.id, e)
         
         # Check for expired subscriptions
         expired_orgs = Organization.objects.filter(
@@ -450,10 +456,12 @@ def check_subscription_expirations():
                 # Mark subscription as inactive
                 org.is_subscription_active = False
                 org.subscription_status = SubscriptionStatus.CANCELED
-                org.save()
-                logger.info(f"Marked subscription as expired for org {org.id}")
+                org.save(update_fields=[
+                    'is_subscription_active', 'subscription_status', 'updated_at'
+                ])
+                logger.info("Marked subscription as expired for org %s", org.id)
             except Exception as e:
-                logger.error(f"Failed to process expired subscription for org {org.id}: {str(e)}")
+                logger.error("Failed to process expired subscription for org %s: %s", org.id, e)
         
         return {
             '3_days_reminders': orgs_3_days.count(),
@@ -462,7 +470,7 @@ def check_subscription_expirations():
         }
         
     except Exception as e:
-        logger.error(f"Error in check_subscription_expirations: {str(e)}")
+        logger.error("Error in check_subscription_expirations: %s", e)
         return {'error': str(e)}
 
 
@@ -503,7 +511,7 @@ def send_usage_limit_warnings():
                             }
                         )
                         warnings_sent += 1
-                        logger.info(f"Sent contact limit warning to org {org.id}")
+                        logger.info("Sent contact limit warning to org %s", org.id)
                 
                 # Check campaigns limit
                 campaign_count = org.campaigns.count()
@@ -526,13 +534,402 @@ def send_usage_limit_warnings():
                             }
                         )
                         warnings_sent += 1
-                        logger.info(f"Sent campaign limit warning to org {org.id}")
+                        logger.info("Sent campaign limit warning to org %s", org.id)
                         
             except Exception as e:
-                logger.error(f"Failed to check limits for org {org.id}: {str(e)}")
+                logger.error("Failed to check limits for org %s: %s", org.id, e)
         
         return {'warnings_sent': warnings_sent}
         
     except Exception as e:
-        logger.error(f"Error in send_usage_limit_warnings: {str(e)}")
-        return {'error': str(e)}
\ No newline at end of file
+        logger.error("Error in send_usage_limit_warnings: %s", e)
+        return {'error': str(e)}
+
+
+@shared_task
+def purge_stale_otps():
+    """Periodic sweep of expired OTPs and verified OTPs older than an hour"""
+    now = timezone.now()
+    deleted, _ = EmailOTP.objects.filter(
+        Q(expires_at__lt=now) | Q(is_verified=True, created_at__lt=now - timedelta(hours=1))
+    ).delete()
+    
+    return f"Purged {deleted} stale OTPs"
+
+
+@shared_task
+def purge_processed_webhook_events():
+    """Periodic sweep of processed webhook event records past the retention window"""
+    from apps.subscriptions.models import ProcessedWebhookEvent, WebhookEventStatus
+    
+    cutoff = timezone.now() - timedelta(days=settings.WEBHOOK_EVENT_RETENTION_DAYS)
+    deleted, _ = ProcessedWebhookEvent.objects.filter(
+        status=WebhookEventStatus.PROCESSED,
+        processed_at__lt=cutoff
+    ).delete()
+    
+    return f"Purged {deleted} processed webhook events"
+
+
+@shared_task
+def requeue_stale_webhook_events():
+    """
+    Re-enqueue webhook events that were never applied: PENDING or FAILED ones
+    whose message was lost or whose retries ran out, and PROCESSING ones whose
+    worker died. Stripe already got its 200, so nothing else retries them.
+    """
+    from apps.subscriptions.models import ProcessedWebhookEvent, WebhookEventStatus
+    
+    cutoff = timezone.now() - timedelta(minutes=settings.WEBHOOK_EVENT_STALE_MINUTES)
+    
+    # No handler runs this long, so the claiming worker is gone
+    ProcessedWebhookEvent.objects.filter(
+        status=WebhookEventStatus.PROCESSING,
+        attempted_at__lt=cutoff
+    ).update(status=WebhookEventStatus.FAILED, error_message='Worker stopped while processing')
+    
+    stale_events = ProcessedWebhookEvent.objects.filter(
+        Q(attempted_at__lt=cutoff) | Q(attempted_at__isnull=True, processed_at__lt=cutoff),
+        status__in=[WebhookEventStatus.PENDING, WebhookEventStatus.FAILED],
+        attempts__lt=settings.WEBHOOK_EVENT_MAX_ATTEMPTS
+    ).values_list('event_id', flat=True)
+    
+    requeued = 0
+    for event_id in stale_events.iterator():
+        process_stripe_event.delay(event_id)
+        requeued += 1
+    
+    exhausted = ProcessedWebhookEvent.objects.filter(
+        status=WebhookEventStatus.FAILED,
+        attempts__gte=settings.WEBHOOK_EVENT_MAX_ATTEMPTS
+    ).count()
+    if exhausted:
+        logger.error("%s webhook events failed %s times and need attention", exhausted, settings.WEBHOOK_EVENT_MAX_ATTEMPTS)
+    
+    return f"Requeued {requeued} stale webhook events"
+
+
+@shared_task
+def reconcile_organization_counters():
+    """
+    Recompute the organizations' denormalized resource and unread
+    notification counters. The signals keep them current, but queryset
+    updates, bulk creates and raw SQL bypass them.
+    """
+    from django.db.models import Count, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
+    from apps.notifications.models import SubscriptionNotification
+    from apps.subscriptions.signals import ORGANIZATION_COUNTER_MODELS
+    
+    for counter_field, model in ORGANIZATION_COUNTER_MODELS.items():
+        counts = model.objects.filter(
+            organization=OuterRef('pk')
+        ).order_by().values('organization').annotate(total=Count('id')).values('total')
+        Organization.objects.update(**{counter_field: Coalesce(Subquery(counts), 0)})
+    
+    unread = SubscriptionNotification.objects.filter(
+        organization=OuterRef('pk'), is_read=False
+    ).order_by().values('organization').annotate(total=Count('id')).values('total')
+    Organization.objects.update(unread_notifications_count=Coalesce(Subquery(unread), 0))
+    
+    return f"Reconciled resource counters for {len(ORGANIZATION_COUNTER_MODELS)} resources"
+
+
+@shared_task
+def flush_usage_buffer():
+    """Write usage increments buffered in Redis to UsageTracking"""
+    from apps.subscriptions.subscription_views import write_usage_counts
+    from apps.subscriptions.usage_buffer import flush_usage_counts
+    
+    flushed = flush_usage_counts(write_usage_counts)
+    return f"Flushed usage for {flushed} organization months"
+
+
+@shared_task
+def flush_subscription_history_task():
+    """Bulk insert the subscription history rows queued in Redis by earlier releases"""
+    from apps.subscriptions.history_buffer import flush_subscription_history
+    
+    written = flush_subscription_history()
+    return f"Flushed {written} subscription history entries"
+
+
+@shared_task
+def send_welcome_email_task(email, first_name, username, organization_id):
+    """Send the signup welcome email outside the request cycle"""
+    from apps.authentication.signup_views import send_welcome_email
+    
+    if send_welcome_email(email, first_name, username, organization_id):
+        return f"Welcome email sent to {email}"
+    return f"Welcome email to {email} failed"
+
+
+@shared_task
+def send_subscription_changed_notification_task(organization_id, old_plan, new_plan):
+    """Send the plan change notification outside the webhook handler"""
+    from apps.notifications.notifications import send_subscription_changed_notification
+    
+    org = Organization.objects.get(id=organization_id)
+    send_subscription_changed_notification(org, old_plan, new_plan)
+    return f"Plan change notification processed for org {organization_id}"
+
+
+@shared_task
+def send_cancellation_notification_task(organization_id):
+    """Send the cancellation notification outside the webhook handler"""
+    from apps.notifications.notifications import send_cancellation_notification
+    
+    org = Organization.objects.get(id=organization_id)
+    send_cancellation_notification(org)
+    return f"Cancellation notification processed for org {organization_id}"
+
+
+@shared_task
+def send_payment_success_notification_task(organization_id, amount, invoice_id=None):
+    """Send the payment receipt notification outside the webhook handler"""
+    from apps.notifications.notifications import send_payment_success_notification
+    
+    org = Organization.objects.get(id=organization_id)
+    send_payment_success_notification(org, Decimal(amount), invoice_id=invoice_id)
+    return f"Payment success notification processed for org {organization_id}"
+
+
+@shared_task
+def send_payment_failed_notification_task(organization_id, reason, amount=None):
+    """Send the payment failure notification outside the webhook handler"""
+    from apps.notifications.notifications import send_payment_failed_notification
+    
+    org = Organization.objects.get(id=organization_id)
+    send_payment_failed_notification(org, reason, amount=Decimal(amount) if amount is not None else None)
+    return f"Payment failure notification processed for org {organization_id}"
+
+
+@shared_task
+def send_trial_expiry_reminder_task(organization_id, days_remaining):
+    """Send the trial ending reminder outside the webhook handler"""
+    from apps.notifications.notifications import send_trial_expiry_reminder
+    
+    org = Organization.objects.get(id=organization_id)
+    send_trial_expiry_reminder(org, days_remaining)
+    return f"Trial expiry reminder processed for org {organization_id}"
+
+
+@shared_task
+def rebuild_email_filter_task():
+    """Rebuild the signup email bloom filter (backfills it and drops deleted users)"""
+    from apps.authentication.email_filter import rebuild_email_filter
+    
+    count = rebuild_email_filter(
+        User.objects.values_list('email', flat=True).iterator(chunk_size=5000)
+    )
+    return f"Rebuilt signup email filter with {count} emails"
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def stripe_modify_subscription(self, organization_id, action, modify_kwargs):
+    """
+    Apply a cancel/resume to the organization's Stripe subscription off the
+    request thread. Local state was updated optimistically by the view and is
+    reconciled by the customer.subscription.updated webhook.
+    """
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    
+    try:
+        org = Organization.objects.get(id=organization_id)
+    except Organization.DoesNotExist:
+        logger.error("Organization %s not found for subscription %s", organization_id, action)
+        return f"Organization {organization_id} not found"
+    
+    if not org.stripe_subscription_id:
+        return f"Organization {organization_id} has no Stripe subscription"
+    
+    try:
+        stripe.Subscription.modify(org.stripe_subscription_id, **modify_kwargs)
+    except (stripe.error.APIConnectionError, stripe.error.RateLimitError, stripe.error.APIError) as e:
+        # Transient Stripe failures are worth retrying
+        logger.warning("Retrying subscription %s for org %s: %s", action, organization_id, e)
+        raise self.retry(exc=e)
+    except stripe.error.StripeError as e:
+        logger.error("Stripe rejected subscription %s for org %s: %s", action, organization_id, e)
+        return f"Subscription {action} failed for org {organization_id}"
+    
+    return f"Subscription {action} applied for org {organization_id}"
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def create_stripe_subscription(self, organization_id, user_id, plan_id):
+    """
+    Create the Stripe customer (if needed) and subscription for
+    create_subscription off the request thread. The returned dict is kept in
+    the result backend and read back by subscription_job_status.
+    """
+    # Imported here: the subscription views import this module
+    from apps.subscriptions.models import SubscriptionHistory
+    from apps.subscriptions.plans import PLAN_CONFIG
+    from apps.subscriptions.subscription_views import (
+        PLAN_IS_YEARLY, invalidate_subscription_access, resolve_stripe_price_id
+    )
+    
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    
+    try:
+        org = Organization.objects.defer('metadata').get(id=organization_id)
+        user = User.objects.only('id', 'email').get(id=user_id)
+    except (Organization.DoesNotExist, User.DoesNotExist):
+        logger.error("Organization %s or user %s not found for subscription creation", organization_id, user_id)
+        return {'organization_id': str(organization_id), 'error': 'Organization not found'}
+    
+    plan_config = PLAN_CONFIG[plan_id]
+    
+    try:
+        price_id = resolve_stripe_price_id(plan_id)
+        if not price_id:
+            logger.error("No Stripe price configured for plan %s", plan_id)
+            return {'organization_id': str(organization_id), 'error': 'This plan is not available for purchase yet'}
+        
+        # Create or get Stripe customer. Created without holding a lock; the
+        # conditional UPDATE keeps whichever id was stored first if two jobs race
+        if not org.stripe_customer_id:
+            customer = stripe.Customer.create(
+                email=user.email,
+                name=org.name,
+                metadata={
+                    'organization_id': str(org.id),
+                    'user_id': str(user.id)
+                },
+                idempotency_key=f"customer-{org.id}-{user.id}"
+            )
+            Organization.objects.filter(
+                Q(stripe_customer_id__isnull=True) | Q(stripe_customer_id=''),
+                id=org.id
+            ).update(stripe_customer_id=customer.id, updated_at=timezone.now())
+            invalidate_subscription_access(org.id)
+            org.refresh_from_db(fields=['stripe_customer_id'])
+        
+        previous_subscription_id = org.stripe_subscription_id
+        
+        # Create Stripe subscription outside any lock, since the call can take
+        # seconds. The key is the job id, which stays the same across retries,
+        # so a retry after a lost response can't create a second subscription
+        subscription = stripe.Subscription.create(
+            customer=org.stripe_customer_id,
+            items=[{'price': price_id}],
+            payment_behavior='default_incomplete',
+            payment_settings={'save_default_payment_method': 'on_subscription'},
+            expand=['latest_invoice.payment_intent'],
+            idempotency_key=f"subscription-{self.request.id}"
+        )
+        
+        # Only the id write is serialized on the organization row, so
+        # concurrent jobs can't interleave their subscription and item ids
+        with transaction.atomic():
+            org = Organization.objects.defer('metadata').select_for_update().get(id=organization_id)
+            if org.stripe_subscription_id != previous_subscription_id:
+                # Another job stored its subscription while ours was created;
+                # the latest request wins and the unpaid one expires in Stripe
+                logger.warning(
+                    "Subscription %s for org %s replaces %s, stored by a concurrent job",
+                    subscription.id, organization_id, org.stripe_subscription_id
+                )
+            
+            # Update organization with subscription details
+            org.stripe_subscription_id = subscription.id
+            org.stripe_subscription_item_id = subscription['items']['data'][0].id
+            org.subscription_plan = plan_id
+            org.is_subscription_active = True
+            
+            # Set subscription end date
+            if PLAN_IS_YEARLY[plan_id]:
+                org.subscription_ends_at = timezone.now() + timedelta(days=365)
+            else:
+                org.subscription_ends_at = timezone.now() + timedelta(days=30)
+            
+            org.save(update_fields=[
+                'stripe_subscription_id', 'stripe_subscription_item_id', 'subscription_plan',
+                'is_subscription_active', 'subscription_ends_at', 'updated_at'
+            ])
+            invalidate_subscription_access(org.id)
+            
+            # Log subscription history
+            SubscriptionHistory.objects.create(
+                organization=org,
+                event_type=SubscriptionEventType.CREATED,
+                new_plan=plan_id,
+                new_status=SubscriptionStatus.ACTIVE,
+                amount=plan_config.price_decimal,
+                metadata={
+                    'subscription_id': subscription.id
+                }
+            )
+    except (stripe.error.APIConnectionError, stripe.error.RateLimitError, stripe.error.APIError) as e:
+        # Transient Stripe failures are worth retrying; the idempotency keys
+        # make the retried calls safe
+        logger.warning("Retrying subscription creation for org %s: %s", organization_id, e)
+        raise self.retry(exc=e)
+    except stripe.error.StripeError as e:
+        logger.error("Stripe subscription creation failed: %s", e)
+        return {'organization_id': str(organization_id), 'error': f'Failed to create subscription: {str(e)}'}
+    
+    # Safely access the client_secret from payment_intent
+    client_secret = None
+    if hasattr(subscription, 'latest_invoice') and subscription.latest_invoice:
+        if hasattr(subscription.latest_invoice, 'payment_intent') and subscription.latest_invoice.payment_intent:
+            client_secret = subscription.latest_invoice.payment_intent.client_secret
+    
+    logger.info("Created subscription %s for org %s", subscription.id, org.id)
+    
+    return {
+        'organization_id': str(org.id),
+        'client_secret': client_secret,
+        'subscription_id': subscription.id
+    }
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=60, acks_late=True, reject_on_worker_lost=True)
+def process_stripe_event(self, event_id):
+    """
+    Apply a Stripe webhook event recorded by the stripe_webhook view. The view
+    only verifies and stores the event, so the handler runs here on the
+    billing queue and is retried on failure. The message is acknowledged only
+    once the handler finishes, so an event whose worker dies is redelivered.
+    Only a PENDING or FAILED event is claimed, so a processed event, or one
+    another worker is running, is skipped; requeue_stale_webhook_events picks
+    up events whose retries ran out or whose worker died.
+    """
+    # Imported here: the subscription views import this module
+    from apps.subscriptions.models import ProcessedWebhookEvent, WebhookEventStatus
+    from apps.subscriptions.subscription_views import handle_stripe_event
+    
+    claimed = ProcessedWebhookEvent.objects.filter(
+        event_id=event_id,
+        status__in=[WebhookEventStatus.PENDING, WebhookEventStatus.FAILED]
+    ).update(
+        status=WebhookEventStatus.PROCESSING,
+        attempts=F('attempts') + 1,
+        attempted_at=timezone.now()
+    )
+    if not claimed:
+        current_status = ProcessedWebhookEvent.objects.filter(
+            event_id=event_id
+        ).values_list('status', flat=True).first()
+        if current_status is None:
+            logger.error("Webhook event %s not found", event_id)
+            return f"Webhook event {event_id} not found"
+        return f"Webhook event {event_id} already {current_status}"
+    
+    webhook_event = ProcessedWebhookEvent.objects.only('id', 'metadata').get(event_id=event_id)
+    
+    try:
+        handle_stripe_event(webhook_event.metadata['raw_event'])
+    except Exception as e:
+        logger.error("Error processing webhook event %s: %s", event_id, e, exc_info=True)
+        webhook_event.status = WebhookEventStatus.FAILED
+        webhook_event.error_message = str(e)
+        webhook_event.save(update_fields=['status', 'error_message'])
+        raise self.retry(exc=e)
+    
+    webhook_event.status = WebhookEventStatus.PROCESSED
+    webhook_event.error_message = None
+    webhook_event.save(update_fields=['status', 'error_message'])
+    
+    return f"Webhook event {event_id} processed"
@@ -0,0 +1,118 @@
+"""
+In-memory stand-in for the raw Redis client returned by get_redis_connection,
+covering the commands the Redis-backed helpers use. Values are stored the way
+redis-py returns them (bytes keys and members, int counters).
+"""
+
+
+def _key(key):
+    return key if isinstance(key, bytes) else str(key).encode()
+
+
+class FakeRedis:
+    def __init__(self, scripts=None):
+        self.data = {}
+        # Lua scripts are run by a Python equivalent registered per script body
+        self.scripts = scripts or {}
+        self.locked = set()
+
+    # Bitmaps
+    def setbit(self, key, offset, value):
+        bits = self.data.setdefault(_key(key), set())
+        if value:
+            bits.add(offset)
+        else:
+            bits.discard(offset)
+
+    def getbit(self, key, offset):
+        return int(offset in self.data.get(_key(key), ()))
+
+    # Lists
+    def rpush(self, key, *values):
+        self.data.setdefault(_key(key), []).extend(values)
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.data.setdefault(_key(key), []).insert(0, value)
+
+    def lrange(self, key, start, end):
+        return list(self.data.get(_key(key), [])[start:None if end == -1 else end + 1])
+
+    def ltrim(self, key, start, end):
+        self.data[_key(key)] = self.data.get(_key(key), [])[start:]
+
+    # Hashes
+    def hincrby(self, key, field, amount=1):
+        fields = self.data.setdefault(_key(key), {})
+        fields[_key(field)] = fields.get(_key(field), 0) + amount
+        return fields[_key(field)]
+
+    def hgetall(self, key):
+        return dict(self.data.get(_key(key), {}))
+
+    # Sets
+    def sadd(self, key, *members):
+        self.data.setdefault(_key(key), set()).update(_key(member) for member in members)
+
+    def srem(self, key, *members):
+        self.data.get(_key(key), set()).difference_update(_key(member) for member in members)
+
+    def sscan_iter(self, key, count=None):
+        return iter(list(self.data.get(_key(key), ())))
+
+    # Keys
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(_key(key), None)
+
+    def rename(self, src, dst):
+        self.data[_key(dst)] = self.data.pop(_key(src))
+
+    def exists(self, key):
+        return int(_key(key) in self.data)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def lock(self, name, timeout=None):
+        return FakeLock(self, name)
+
+    def register_script(self, script):
+        python_script = self.scripts[script]
+        return lambda keys=(), args=(): python_script(self, [_key(key) for key in keys], list(args))
+
+
+class FakePipeline:
+    """Queues commands and runs them on execute(), returning their results"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append(lambda: command(*args, **kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        results = [command() for command in self.commands]
+        self.commands = []
+        return results
+
+
+class FakeLock:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def acquire(self, blocking=True):
+        if self.name in self.client.locked:
+            return False
+        self.client.locked.add(self.name)
+        return True
+
+    def release(self):
+        self.client.locked.discard(self.name)
@@ -0,0 +1,99 @@
+from unittest import mock
+import stripe
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from apps.accounts.models import Organization, User
+from apps.common.constants import SubscriptionPlan
+from apps.common.tasks import create_stripe_subscription
+
+
+def stripe_subscription(subscription_id='sub_1'):
+    subscription = mock.MagicMock(id=subscription_id, latest_invoice=None)
+    subscription.__getitem__.side_effect = {'items': {'data': [mock.Mock(id='si_1')]}}.__getitem__
+    return subscription
+
+
+class CreateStripeSubscriptionTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Acme', stripe_customer_id='cus_1')
+        self.user = User.objects.create_user(email='owner@example.com', organization=self.org)
+        patcher = mock.patch(
+            'apps.subscriptions.subscription_views.resolve_stripe_price_id', return_value='price_basic'
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_task(self):
+        return create_stripe_subscription.apply(
+            args=(self.org.id, self.user.id, SubscriptionPlan.BASIC_MONTHLY)
+        )
+
+    @mock.patch('apps.common.tasks.stripe.Subscription.create')
+    def test_retry_reuses_idempotency_key(self, subscription_create):
+        # The first attempt times out after Stripe may already have created it
+        subscription_create.side_effect = [
+            stripe.error.APIConnectionError('timed out'),
+            stripe_subscription(),
+        ]
+
+        with self.assertLogs('apps.common.tasks', level='WARNING'):
+            result = self.run_task()
+
+        self.assertEqual(result.get()['subscription_id'], 'sub_1')
+        keys = [call.kwargs['idempotency_key'] for call in subscription_create.call_args_list]
+        self.assertEqual(len(keys), 2)
+        self.assertEqual(keys[0], keys[1])
+        self.assertEqual(keys[0], f"subscription-{result.id}")
+
+    @mock.patch('apps.common.tasks.stripe.Subscription.create')
+    def test_separate_jobs_use_separate_keys(self, subscription_create):
+        subscription_create.side_effect = [stripe_subscription('sub_1'), stripe_subscription('sub_2')]
+
+        self.run_task()
+        self.run_task()
+
+        keys = [call.kwargs['idempotency_key'] for call in subscription_create.call_args_list]
+        self.assertNotEqual(keys[0], keys[1])
+
+    @mock.patch('apps.common.tasks.stripe.Subscription.create')
+    def test_subscription_is_stored_on_organization(self, subscription_create):
+        subscription_create.return_value = stripe_subscription()
+
+        self.run_task()
+
+        self.org.refresh_from_db()
+        self.assertEqual(self.org.stripe_subscription_id, 'sub_1')
+        self.assertEqual(self.org.stripe_subscription_item_id, 'si_1')
+        self.assertEqual(self.org.subscription_plan, SubscriptionPlan.BASIC_MONTHLY)
+
+    @mock.patch('apps.common.tasks.stripe.Subscription.create')
+    def test_stripe_is_called_without_row_lock(self, subscription_create):
+        locks_during_call = []
+        with CaptureQueriesContext(connection) as queries:
+            def create(**kwargs):
+                locks_during_call.extend(
+                    query['sql'] for query in queries.captured_queries if 'FOR UPDATE' in query['sql']
+                )
+                return stripe_subscription()
+            subscription_create.side_effect = create
+
+            self.run_task()
+
+        self.assertEqual(locks_during_call, [])
+        self.assertTrue(any('FOR UPDATE' in query['sql'] for query in queries.captured_queries))
+
+    @mock.patch('apps.common.tasks.stripe.Subscription.create')
+    def test_concurrent_job_subscription_is_replaced(self, subscription_create):
+        def create(**kwargs):
+            # Another job stores its subscription while this one is in Stripe
+            Organization.objects.filter(id=self.org.id).update(stripe_subscription_id='sub_other')
+            return stripe_subscription()
+        subscription_create.side_effect = create
+
+        with self.assertLogs('apps.common.tasks', level='WARNING') as logs:
+            self.run_task()
+
+        self.assertIn('sub_other', logs.output[0])
+        self.org.refresh_from_db()
+        self.assertEqual(self.org.stripe_subscription_id, 'sub_1')
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.common.tasks import process_stripe_event, requeue_stale_webhook_events
+from apps.subscriptions.models import ProcessedWebhookEvent, WebhookEventStatus
+
+
+def webhook_event(event_id='evt_1', **fields):
+    return ProcessedWebhookEvent.objects.create(
+        event_id=event_id,
+        event_type='invoice.payment_succeeded',
+        metadata={'raw_event': {'id': event_id}},
+        **fields
+    )
+
+
+@mock.patch('apps.subscriptions.subscription_views.handle_stripe_event')
+class ProcessStripeEventTests(TestCase):
+    def test_pending_event_is_applied(self, handle_stripe_event):
+        webhook_event()
+
+        process_stripe_event.apply(args=('evt_1',))
+
+        handle_stripe_event.assert_called_once_with({'id': 'evt_1'})
+        event = ProcessedWebhookEvent.objects.get(event_id='evt_1')
+        self.assertEqual(event.status, WebhookEventStatus.PROCESSED)
+        self.assertEqual(event.attempts, 1)
+        self.assertIsNotNone(event.attempted_at)
+
+    def test_event_claimed_by_another_worker_is_skipped(self, handle_stripe_event):
+        webhook_event(status=WebhookEventStatus.PROCESSING)
+
+        result = process_stripe_event.apply(args=('evt_1',))
+
+        handle_stripe_event.assert_not_called()
+        self.assertEqual(result.get(), 'Webhook event evt_1 already processing')
+
+    def test_processed_event_is_skipped(self, handle_stripe_event):
+        webhook_event(status=WebhookEventStatus.PROCESSED)
+
+        process_stripe_event.apply(args=('evt_1',))
+
+        handle_stripe_event.assert_not_called()
+
+    def test_failed_event_is_left_failed_after_retries(self, handle_stripe_event):
+        webhook_event()
+        handle_stripe_event.side_effect = ValueError('boom')
+
+        with self.assertLogs('apps.common.tasks', level='ERROR'):
+            process_stripe_event.apply(args=('evt_1',))
+
+        event = ProcessedWebhookEvent.objects.get(event_id='evt_1')
+        self.assertEqual(event.status, WebhookEventStatus.FAILED)
+        self.assertEqual(event.error_message, 'boom')
+        self.assertEqual(event.attempts, process_stripe_event.max_retries + 1)
+
+
+@override_settings(WEBHOOK_EVENT_STALE_MINUTES=15, WEBHOOK_EVENT_MAX_ATTEMPTS=3)
+@mock.patch('apps.common.tasks.process_stripe_event.delay')
+class RequeueStaleWebhookEventsTests(TestCase):
+    def stale_event(self, event_id, **fields):
+        webhook_event(event_id, **fields)
+        long_ago = timezone.now() - timedelta(hours=1)
+        ProcessedWebhookEvent.objects.filter(event_id=event_id).update(processed_at=long_ago)
+
+    def requeued(self, delay):
+        return sorted(call.args[0] for call in delay.call_args_list)
+
+    def test_stale_pending_and_failed_events_are_requeued(self, delay):
+        self.stale_event('evt_pending')
+        self.stale_event(
+            'evt_failed', status=WebhookEventStatus.FAILED, attempts=1,
+            attempted_at=timezone.now() - timedelta(hours=1)
+        )
+
+        requeue_stale_webhook_events()
+
+        self.assertEqual(self.requeued(delay), ['evt_failed', 'evt_pending'])
+
+    def test_recent_events_are_left_to_their_own_retries(self, delay):
+        webhook_event('evt_new')
+        self.stale_event(
+            'evt_retrying', status=WebhookEventStatus.FAILED, attempts=1, attempted_at=timezone.now()
+        )
+
+        requeue_stale_webhook_events()
+
+        delay.assert_not_called()
+
+    def test_event_abandoned_in_processing_is_requeued(self, delay):
+        self.stale_event(
+            'evt_1', status=WebhookEventStatus.PROCESSING, attempts=1,
+            attempted_at=timezone.now() - timedelta(hours=1)
+        )
+
+        requeue_stale_webhook_events()
+
+        self.assertEqual(self.requeued(delay), ['evt_1'])
+        self.assertEqual(ProcessedWebhookEvent.objects.get(event_id='evt_1').status, WebhookEventStatus.FAILED)
+
+    def test_event_out_of_attempts_is_reported_not_requeued(self, delay):
+        self.stale_event(
+            'evt_1', status=WebhookEventStatus.FAILED, attempts=3,
+            attempted_at=timezone.now() - timedelta(hours=1)
+        )
+
+        with self.assertLogs('apps.common.tasks', level='ERROR'):
+            requeue_stale_webhook_events()
+
+        delay.assert_not_called()
@@ -0,0 +1,44 @@
+import io
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase, override_settings
+from apps.accounts.models import User
+from apps.authentication import email_filter
+from apps.common.redis import BUFFER_REDIS_ALIAS, get_redis
+from apps.common.tests.fake_redis import FakeRedis
+
+REDIS_CACHE = {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}
+LOCAL_CACHE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+
+class GetRedisTests(SimpleTestCase):
+    @override_settings(CACHES={'default': LOCAL_CACHE})
+    def test_non_redis_or_missing_alias_returns_none(self):
+        self.assertIsNone(get_redis())
+        self.assertIsNone(get_redis(BUFFER_REDIS_ALIAS))
+
+    @override_settings(CACHES={'default': REDIS_CACHE})
+    def test_falls_back_to_next_configured_alias(self):
+        self.assertIs(get_redis(BUFFER_REDIS_ALIAS, 'default'), get_redis())
+
+
+class BuildEmailFilterCommandTests(TestCase):
+    def build(self):
+        stdout = io.StringIO()
+        call_command('build_email_filter', stdout=stdout)
+        return stdout.getvalue()
+
+    def test_builds_filter_from_user_table(self):
+        User.objects.create_user(email='jane@example.com')
+        redis = FakeRedis()
+
+        with mock.patch.object(email_filter, 'get_filter_redis', return_value=redis):
+            output = self.build()
+
+            self.assertIn('1 emails', output)
+            self.assertTrue(email_filter.email_maybe_registered('jane@example.com'))
+            self.assertFalse(email_filter.email_maybe_registered('new@example.com'))
+
+    def test_without_redis_filter_is_left_unused(self):
+        with mock.patch.object(email_filter, 'get_filter_redis', return_value=None):
+            self.assertIn('No Redis configured', self.build())
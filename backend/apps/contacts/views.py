@@ -167,7 +167,12 @@ class ContactViewSet(BaseOrganizationViewSet):
     def bulk_update(self, request):
         """Bulk update contacts"""
         contact_ids = request.data.get('contact_ids', [])
-        update_data = request.data.get('data', {})
+        # A queryset update skips the organization counter signals, so it
+        # must not move contacts between organizations
+        update_data = {
+            field: value for field, value in request.data.get('data', {}).items()
+            if field not in ContactSerializer.Meta.read_only_fields and field != 'organization_id'
+        }
         
         contacts = Contact.objects.filter(
             id__in=contact_ids,
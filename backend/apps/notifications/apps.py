@@ -5,3 +5,6 @@ class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.notifications'
     label = 'notifications'
+
+    def ready(self):
+        from apps.notifications import signals  # noqa: F401
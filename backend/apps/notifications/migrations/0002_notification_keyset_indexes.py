@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscriptionnotification",
+            index=models.Index(
+                fields=["organization", "-created_at", "-id"],
+                name="subnotif_org_keyset_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="subscriptionnotification",
+            index=models.Index(
+                condition=models.Q(("is_read", False)),
+                fields=["organization", "-created_at", "-id"],
+                name="subnotif_org_unread_keyset_idx",
+            ),
+        ),
+    ]
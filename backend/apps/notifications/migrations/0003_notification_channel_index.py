@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0002_notification_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscriptionnotification",
+            index=models.Index(
+                fields=["organization", "channel", "-created_at", "-id"],
+                name="subnotif_org_channel_idx",
+            ),
+        ),
+    ]
@@ -55,6 +55,14 @@ class SubscriptionNotification(models.Model):
             models.Index(fields=['status', 'channel']),
             models.Index(fields=['user', 'is_read', '-created_at']),
             models.Index(fields=['organization', 'is_read']),
+            models.Index(fields=['organization', '-created_at', '-id'], name='subnotif_org_keyset_idx'),
+            models.Index(
+                fields=['organization', '-created_at', '-id'],
+                name='subnotif_org_unread_keyset_idx',
+                condition=models.Q(is_read=False)
+            ),
+            # Channel-filtered listing and its counts
+            models.Index(fields=['organization', 'channel', '-created_at', '-id'], name='subnotif_org_channel_idx'),
         ]
 
     def __str__(self):
@@ -66,3 +74,4 @@ class SubscriptionNotification(models.Model):
             self.is_read = True
             self.read_at = timezone.now()
             self.save(update_fields=['is_read', 'read_at', 'updated_at'])
+            Organization.adjust_counter(self.organization_id, 'unread_notifications_count', -1)
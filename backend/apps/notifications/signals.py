@@ -0,0 +1,17 @@
+from django.dispatch import receiver
+from apps.accounts.models import Organization
+from django.db.models.signals import post_save, post_delete
+from apps.notifications.models import SubscriptionNotification
+
+
+@receiver(post_save, sender=SubscriptionNotification)
+def count_new_unread_notification(sender, instance, created, **kwargs):
+    """Keep Organization.unread_notifications_count in step with new notifications"""
+    if created and not instance.is_read:
+        Organization.adjust_counter(instance.organization_id, 'unread_notifications_count', 1)
+
+
+@receiver(post_delete, sender=SubscriptionNotification)
+def uncount_deleted_unread_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        Organization.adjust_counter(instance.organization_id, 'unread_notifications_count', -1)
@@ -5,3 +5,12 @@ class SubscriptionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.subscriptions'
     label = 'subscriptions'
+
+    def ready(self):
+        import stripe
+        from django.conf import settings
+        from apps.subscriptions import signals  # noqa: F401
+        
+        # Let the Stripe client retry dropped connections and 5xx responses.
+        # Retried POSTs reuse one idempotency key, so a create can't apply twice
+        stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
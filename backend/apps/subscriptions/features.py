@@ -0,0 +1,57 @@
+"""
+Shared cache of PlanFeatures rows. Plan features change only through the
+admin, but feature and usage checks run on every request, so each plan's row
+is kept in the Django cache as a plain dict and handed out as an immutable
+snapshot. The cache is shared by every web and Celery worker, and saving or
+deleting a PlanFeatures row drops it (see apps.subscriptions.signals).
+"""
+from collections import namedtuple
+from django.core.cache import cache
+from apps.common.constants import SubscriptionPlan
+
+PLAN_FEATURE_FIELDS = (
+    'plan',
+    'price_cents',
+    'contacts_limit',
+    'campaigns_limit',
+    'emails_per_month',
+    'has_email_campaigns',
+    'has_basic_analytics',
+    'has_advanced_analytics',
+    'has_ab_testing',
+    'has_automation',
+    'has_custom_templates',
+    'has_white_labeling',
+    'has_api_access',
+    'has_priority_support',
+)
+
+PlanFeaturesSnapshot = namedtuple('PlanFeaturesSnapshot', PLAN_FEATURE_FIELDS)
+
+
+# Backstop for a change the signal didn't see (e.g. a queryset update)
+PLAN_FEATURES_CACHE_TIMEOUT = 3600
+
+
+def plan_features_cache_key(plan):
+    # Bump the version when PLAN_FEATURE_FIELDS changes
+    return f"plan_features:v1:{plan}"
+
+
+def get_plan_features(plan):
+    """Return a PlanFeaturesSnapshot for the plan, or None if it has no row"""
+    from apps.subscriptions.models import PlanFeatures
+    
+    cache_key = plan_features_cache_key(plan)
+    values = cache.get(cache_key)
+    if values is None:
+        values = PlanFeatures.objects.filter(plan=plan).values(*PLAN_FEATURE_FIELDS).first()
+        # A plan without a row is cached as {} so it isn't queried every time
+        values = values or {}
+        cache.set(cache_key, values, PLAN_FEATURES_CACHE_TIMEOUT)
+    return PlanFeaturesSnapshot(**values) if values else None
+
+
+def clear_plan_features_cache():
+    """Drop every plan's cached features; a saved row may have changed its plan"""
+    cache.delete_many([plan_features_cache_key(plan) for plan in SubscriptionPlan.values])
@@ -0,0 +1,74 @@
+"""
+Drain for SubscriptionHistory rows that earlier releases queued in Redis.
+
+The webhook handlers used to push their audit rows onto a Redis list for a
+periodic bulk insert. That list lived on the cache server, where a flush or an
+eviction silently lost the rows, so the handlers now write them in their own
+transaction. flush_subscription_history inserts whatever is still queued.
+
+A row that was also written directly is skipped by the unique stripe_event_id.
+"""
+import json
+import logging
+from django.db import InterfaceError, OperationalError
+from apps.common.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+HISTORY_PENDING_KEY = 'subhistory:pending'
+HISTORY_FLUSH_BATCH_SIZE = 1000
+# Failures worth putting the batch back for; anything else is a bad row
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError)
+
+
+def _insert_history_entries(entries):
+    """Bulk insert queued entries, skipping stripe_event_ids already recorded"""
+    from apps.subscriptions.models import SubscriptionHistory
+
+    SubscriptionHistory.objects.bulk_create(
+        [SubscriptionHistory(**json.loads(entry)) for entry in entries],
+        batch_size=HISTORY_FLUSH_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def flush_subscription_history():
+    """Insert queued history rows in batches. Returns the number of entries taken."""
+    from django.db import transaction
+
+    client = get_redis()
+    if client is None:
+        return 0
+
+    written = 0
+    while True:
+        pipe = client.pipeline(transaction=True)
+        pipe.lrange(HISTORY_PENDING_KEY, 0, HISTORY_FLUSH_BATCH_SIZE - 1)
+        pipe.ltrim(HISTORY_PENDING_KEY, HISTORY_FLUSH_BATCH_SIZE, -1)
+        entries, _ = pipe.execute()
+        if not entries:
+            return written
+
+        try:
+            with transaction.atomic():
+                _insert_history_entries(entries)
+        except TRANSIENT_DB_ERRORS:
+            # Put the batch back for the next run
+            client.lpush(HISTORY_PENDING_KEY, *reversed(entries))
+            raise
+        except Exception:
+            # A row that can't be written (its organization was deleted, a
+            # malformed entry) fails the whole batch; retry one at a time so
+            # only that row is dropped instead of blocking the queue
+            logger.exception("History batch failed, inserting entries individually")
+            for index, entry in enumerate(entries):
+                try:
+                    with transaction.atomic():
+                        _insert_history_entries([entry])
+                except TRANSIENT_DB_ERRORS:
+                    client.lpush(HISTORY_PENDING_KEY, *reversed(entries[index:]))
+                    raise
+                except Exception:
+                    logger.exception("Dropping subscription history entry: %s", entry)
+
+        written += len(entries)
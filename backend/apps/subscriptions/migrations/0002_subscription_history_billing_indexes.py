@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscriptionhistory",
+            index=models.Index(
+                fields=["organization", "event_type", "-created_at"],
+                name="subhist_org_evt_dt_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="subscriptionhistory",
+            index=models.Index(
+                condition=models.Q(
+                    (
+                        "event_type__in",
+                        ["payment_succeeded", "payment_failed", "renewed"],
+                    )
+                ),
+                fields=["organization", "-created_at"],
+                name="subhist_org_payments_idx",
+            ),
+        ),
+    ]
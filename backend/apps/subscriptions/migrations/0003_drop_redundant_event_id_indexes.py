@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:46
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # Both tables are written on every webhook; drop without locking them
+    atomic = False
+
+    dependencies = [
+        ("subscriptions", "0002_subscription_history_billing_indexes"),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name="processedwebhookevent",
+            name="processed_w_event_i_c57493_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="subscriptionhistory",
+            name="subscriptio_stripe__673d52_idx",
+        ),
+    ]
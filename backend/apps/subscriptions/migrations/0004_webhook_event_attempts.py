@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0003_drop_redundant_event_id_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processedwebhookevent",
+            name="attempted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="processedwebhookevent",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -11,6 +11,12 @@ class WebhookEventStatus(models.TextChoices):
     FAILED = 'failed', 'Failed'
 
 
+class LiteManager(models.Manager):
+    """Manager that leaves the metadata JSON out of fetched rows"""
+    def get_queryset(self):
+        return super().get_queryset().defer('metadata')
+
+
 class SubscriptionHistory(models.Model):
     id = models.CharField(max_length=36, primary_key=True, default=uuid.uuid4, editable=False)
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='subscription_history')
@@ -32,15 +38,29 @@ class SubscriptionHistory(models.Model):
     metadata = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = models.Manager()
+    # For reads that don't display the Stripe metadata
+    lite = LiteManager()
+
     class Meta:
         db_table = 'subscription_history'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['organization', 'event_type']),
             models.Index(fields=['event_type']),
-            models.Index(fields=['stripe_event_id']),
             models.Index(fields=['invoice_id']),
             models.Index(fields=['-created_at']),
+            models.Index(fields=['organization', 'event_type', '-created_at'], name='subhist_org_evt_dt_idx'),
+            # Billing history only ever reads payment rows, newest first
+            models.Index(
+                fields=['organization', '-created_at'],
+                name='subhist_org_payments_idx',
+                condition=models.Q(event_type__in=[
+                    SubscriptionEventType.PAYMENT_SUCCEEDED,
+                    SubscriptionEventType.PAYMENT_FAILED,
+                    SubscriptionEventType.RENEWED
+                ])
+            ),
         ]
 
     def __str__(self):
@@ -56,11 +76,14 @@ class ProcessedWebhookEvent(models.Model):
     processed_at = models.DateTimeField(auto_now_add=True)
     error_message = models.TextField(null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
+    # Set each time process_stripe_event claims the event
+    attempts = models.PositiveIntegerField(default=0)
+    attempted_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         db_table = 'processed_webhook_events'
+        # event_id is looked up through its unique constraint's index
         indexes = [
-            models.Index(fields=['event_id']),
             models.Index(fields=['processed_at']),
             models.Index(fields=['status']),
         ]
@@ -0,0 +1,103 @@
+"""
+Static subscription plan definitions. Kept free of model and view imports so
+both Organization (for its plan-derived limits) and the subscription views can
+use them.
+"""
+from decimal import Decimal
+from typing import Optional
+from dataclasses import dataclass, field
+from django.conf import settings
+from apps.common.constants import SubscriptionPlan
+
+
+@dataclass(slots=True, frozen=True)
+class PlanConfig:
+    """Pricing, limits and features of a subscription plan"""
+    name: str
+    price: int
+    stripe_price_id: Optional[str]
+    contacts_limit: int
+    campaigns_limit: int
+    features: tuple
+    is_yearly: bool = False
+    # Decimal price for history rows and Stripe amount in cents, derived once;
+    # the cents come from the Decimal so a fractional price can't drift
+    price_decimal: Decimal = field(init=False)
+    unit_amount_cents: int = field(init=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'price_decimal', Decimal(str(self.price)))
+        object.__setattr__(self, 'unit_amount_cents', int(self.price_decimal * 100))
+
+
+# Plan configuration with pricing and features
+PLAN_CONFIG = {
+    SubscriptionPlan.FREE_TRIAL: PlanConfig(
+        name='Free Trial',
+        price=0,
+        stripe_price_id=None,
+        contacts_limit=1000,
+        campaigns_limit=10,
+        features=('Email campaigns', 'Basic analytics', '1000 contacts', '10 campaigns')
+    ),
+    SubscriptionPlan.BASIC_MONTHLY: PlanConfig(
+        name='Basic Monthly',
+        price=29,
+        stripe_price_id=settings.STRIPE_PRICE_BASIC_MONTHLY,
+        contacts_limit=5000,
+        campaigns_limit=50,
+        features=('Email campaigns', 'Basic analytics', '5000 contacts', '50 campaigns', 'A/B testing')
+    ),
+    SubscriptionPlan.BASIC_YEARLY: PlanConfig(
+        name='Basic Yearly', 
+        price=290,  # 10 months price
+        stripe_price_id=settings.STRIPE_PRICE_BASIC_YEARLY,
+        contacts_limit=5000,
+        campaigns_limit=50,
+        features=('Email campaigns', 'Basic analytics', '5000 contacts', '50 campaigns', 'A/B testing', '2 months free'),
+        is_yearly=True
+    ),
+    SubscriptionPlan.PRO_MONTHLY: PlanConfig(
+        name='Pro Monthly',
+        price=79,
+        stripe_price_id=settings.STRIPE_PRICE_PRO_MONTHLY,
+        contacts_limit=25000,
+        campaigns_limit=200,
+        features=('All Basic features', 'Advanced analytics', '25000 contacts', '200 campaigns', 'Automation', 'Custom templates')
+    ),
+    SubscriptionPlan.PRO_YEARLY: PlanConfig(
+        name='Pro Yearly',
+        price=790,  # 10 months price
+        stripe_price_id=settings.STRIPE_PRICE_PRO_YEARLY,
+        contacts_limit=25000,
+        campaigns_limit=200,
+        features=('All Basic features', 'Advanced analytics', '25000 contacts', '200 campaigns', 'Automation', 'Custom templates', '2 months free'),
+        is_yearly=True
+    ),
+    SubscriptionPlan.PREMIUM_MONTHLY: PlanConfig(
+        name='Premium Monthly',
+        price=149,
+        stripe_price_id=settings.STRIPE_PRICE_PREMIUM_MONTHLY,
+        contacts_limit=100000,
+        campaigns_limit=1000,
+        features=('All Pro features', 'Priority support', '100000 contacts', '1000 campaigns', 'White labeling', 'API access')
+    ),
+    SubscriptionPlan.PREMIUM_YEARLY: PlanConfig(
+        name='Premium Yearly',
+        price=1490,  # 10 months price
+        stripe_price_id=settings.STRIPE_PRICE_PREMIUM_YEARLY,
+        contacts_limit=100000,
+        campaigns_limit=1000,
+        features=('All Pro features', 'Priority support', '100000 contacts', '1000 campaigns', 'White labeling', 'API access', '2 months free'),
+        is_yearly=True
+    )
+}
+
+# Stripe lookup key of the recurring Price provisioned for a paid plan by
+# the sync_stripe_prices command
+def stripe_price_lookup_key(plan_key):
+    return f"engagex_{plan_key}"
+
+
+# Basic plans get the smaller template and domain allowances
+BASIC_PLANS = frozenset({SubscriptionPlan.BASIC_MONTHLY, SubscriptionPlan.BASIC_YEARLY})
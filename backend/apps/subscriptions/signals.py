@@ -0,0 +1,52 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+from apps.domains.models import Domain
+from apps.contacts.models import Contact
+from apps.campaigns.models import Campaign
+from apps.accounts.models import Organization
+from apps.templates.models import EmailTemplate
+from apps.subscriptions.models import PlanFeatures
+from apps.subscriptions.features import clear_plan_features_cache
+
+# Organization counter field for each counted resource model
+ORGANIZATION_COUNTER_MODELS = {
+    'cached_contacts_count': Contact,
+    'cached_campaigns_count': Campaign,
+    'cached_templates_count': EmailTemplate,
+    'cached_domains_count': Domain,
+}
+
+
+@receiver(post_save, sender=PlanFeatures)
+@receiver(post_delete, sender=PlanFeatures)
+def drop_plan_features_cache(sender, **kwargs):
+    """Drop cached plan feature snapshots when a plan row changes"""
+    clear_plan_features_cache()
+
+
+@receiver(post_save, sender=Organization)
+def clear_subscription_cache(sender, instance, **kwargs):
+    """Drop the cached subscription state when the organization row is saved"""
+    from apps.subscriptions.subscription_views import invalidate_subscription_access
+    invalidate_subscription_access(instance.id)
+
+
+def connect_counter_signals(counter_field, model):
+    """
+    Count each model row created or deleted on its organization. With these
+    receivers connected, queryset deletes also send post_delete per row;
+    bulk_create and queryset updates do not, and must adjust the counter
+    themselves.
+    """
+    @receiver(post_save, sender=model, weak=False, dispatch_uid=f'{counter_field}_created')
+    def increment_counter(sender, instance, created, **kwargs):
+        if created:
+            Organization.adjust_counter(instance.organization_id, counter_field, 1)
+    
+    @receiver(post_delete, sender=model, weak=False, dispatch_uid=f'{counter_field}_deleted')
+    def decrement_counter(sender, instance, **kwargs):
+        Organization.adjust_counter(instance.organization_id, counter_field, -1)
+
+
+for counter_field, model in ORGANIZATION_COUNTER_MODELS.items():
+    connect_counter_signals(counter_field, model)
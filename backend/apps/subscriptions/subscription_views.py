@@ -1,337 +1,491 @@
+import uuid
+import json
+import heapq
+import hashlib
 import stripe
 import logging
+import itertools
 from decimal import Decimal
+from functools import lru_cache
+from types import MappingProxyType
+from contextlib import contextmanager
 from datetime import datetime
-from django.db.models import F
+from datetime import timezone as dt_timezone
 from datetime import timedelta
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Now
 from rest_framework import status
 from django.utils import timezone
 from django.http import JsonResponse
+from django.utils.http import parse_etags
+from django.utils.dateparse import parse_datetime
+from django.core.cache import cache
 from rest_framework.response import Response
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.decorators import api_view, permission_classes
+from django.views.decorators.cache import cache_page, cache_control
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from apps.accounts.models import Organization
+from apps.common.tasks import (
+    process_stripe_event, stripe_modify_subscription, create_stripe_subscription,
+    send_subscription_changed_notification_task,
+    send_cancellation_notification_task, send_payment_success_notification_task,
+    send_payment_failed_notification_task, send_trial_expiry_reminder_task
+)
 from apps.notifications.models import SubscriptionNotification
 from apps.common.constants import (SubscriptionPlan, SubscriptionEventType, SubscriptionStatus)
-from apps.subscriptions.models import (SubscriptionHistory, PlanFeatures, UsageTracking, ProcessedWebhookEvent, WebhookEventStatus)
+from apps.subscriptions.plans import BASIC_PLANS, PLAN_CONFIG, stripe_price_lookup_key
+from apps.subscriptions.features import get_plan_features
+from apps.subscriptions.usage_buffer import buffer_usage_increment, get_buffered_usage
+from apps.subscriptions.models import (SubscriptionHistory, UsageTracking, ProcessedWebhookEvent, WebhookEventStatus)
 
 logger = logging.getLogger(__name__)
 
+# Stripe timestamps are UTC epochs; bound once rather than looked up per event
+UTC = dt_timezone.utc
+
 # Initialize Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
-# Webhook events are now tracked in the database using ProcessedWebhookEvent model
-
-# Plan configuration with pricing and features
-PLAN_CONFIG = {
-    SubscriptionPlan.FREE_TRIAL: {
-        'name': 'Free Trial',
-        'price': 0,
-        'stripe_price_id': None,
-        'contacts_limit': 1000,
-        'campaigns_limit': 10,
-        'features': ['Email campaigns', 'Basic analytics', '1000 contacts', '10 campaigns']
-    },
-    SubscriptionPlan.BASIC_MONTHLY: {
-        'name': 'Basic Monthly',
-        'price': 29,
-        'stripe_price_id': settings.STRIPE_PRICE_BASIC_MONTHLY,
-        'contacts_limit': 5000,
-        'campaigns_limit': 50,
-        'features': ['Email campaigns', 'Basic analytics', '5000 contacts', '50 campaigns', 'A/B testing']
-    },
-    SubscriptionPlan.BASIC_YEARLY: {
-        'name': 'Basic Yearly', 
-        'price': 290,  # 10 months price
-        'stripe_price_id': settings.STRIPE_PRICE_BASIC_YEARLY,
-        'contacts_limit': 5000,
-        'campaigns_limit': 50,
-        'features': ['Email campaigns', 'Basic analytics', '5000 contacts', '50 campaigns', 'A/B testing', '2 months free']
-    },
-    SubscriptionPlan.PRO_MONTHLY: {
-        'name': 'Pro Monthly',
-        'price': 79,
-        'stripe_price_id': settings.STRIPE_PRICE_PRO_MONTHLY,
-        'contacts_limit': 25000,
-        'campaigns_limit': 200,
-        'features': ['All Basic features', 'Advanced analytics', '25000 contacts', '200 campaigns', 'Automation', 'Custom templates']
-    },
-    SubscriptionPlan.PRO_YEARLY: {
-        'name': 'Pro Yearly',
-        'price': 790,  # 10 months price
-        'stripe_price_id': settings.STRIPE_PRICE_PRO_YEARLY,
-        'contacts_limit': 25000,
-        'campaigns_limit': 200,
-        'features': ['All Basic features', 'Advanced analytics', '25000 contacts', '200 campaigns', 'Automation', 'Custom templates', '2 months free']
-    },
-    SubscriptionPlan.PREMIUM_MONTHLY: {
-        'name': 'Premium Monthly',
-        'price': 149,
-        'stripe_price_id': settings.STRIPE_PRICE_PREMIUM_MONTHLY,
-        'contacts_limit': 100000,
-        'campaigns_limit': 1000,
-        'features': ['All Pro features', 'Priority support', '100000 contacts', '1000 campaigns', 'White labeling', 'API access']
-    },
-    SubscriptionPlan.PREMIUM_YEARLY: {
-        'name': 'Premium Yearly',
-        'price': 1490,  # 10 months price
-        'stripe_price_id': settings.STRIPE_PRICE_PREMIUM_YEARLY,
-        'contacts_limit': 100000,
-        'campaigns_limit': 1000,
-        'features': ['All Pro features', 'Priority support', '100000 contacts', '1000 campaigns', 'White labeling', 'API access', '2 months free']
+# Webhook events are now tracked in the database using ProcessedWebhookEvent model,
+# with a short-lived cache key in front to drop redeliveries without a DB round-trip
+WEBHOOK_EVENT_DEDUP_TIMEOUT = 86400
+
+
+# Lookup tables derived from PLAN_CONFIG once at import
+PRICE_ID_TO_PLAN = {
+    config.stripe_price_id: plan_key
+    for plan_key, config in PLAN_CONFIG.items()
+    if config.stripe_price_id
+}
+# Prices provisioned by sync_stripe_prices are matched by lookup key instead
+LOOKUP_KEY_TO_PLAN = {
+    stripe_price_lookup_key(plan_key): plan_key
+    for plan_key in PLAN_CONFIG
+    if plan_key != SubscriptionPlan.FREE_TRIAL
+}
+PLAN_IS_YEARLY = {plan_key: config.is_yearly for plan_key, config in PLAN_CONFIG.items()}
+PLAN_BILLING_INTERVAL = {
+    plan_key: 'year' if is_yearly else 'month'
+    for plan_key, is_yearly in PLAN_IS_YEARLY.items()
+}
+
+
+# Payload of the public get_subscription_plans endpoint, built once at import
+PUBLIC_PLANS_PAYLOAD = tuple(
+    {
+        'id': plan_key,
+        'name': config.name,
+        'price': config.price,
+        'stripe_price_id': config.stripe_price_id,
+        'contacts_limit': config.contacts_limit,
+        'campaigns_limit': config.campaigns_limit,
+        'features': config.features,
+        'is_yearly': PLAN_IS_YEARLY[plan_key]
+    }
+    for plan_key, config in PLAN_CONFIG.items()
+    if plan_key != SubscriptionPlan.FREE_TRIAL
+)
+
+# Plan-invariant part of the get_plans_detailed payload, built once at import
+PLAN_BASE_DETAILS = tuple(
+    {
+        'id': plan_key,
+        'name': config.name,
+        'price': config.price,
+        'stripe_price_id': config.stripe_price_id,
+        'contacts_limit': config.contacts_limit,
+        'campaigns_limit': config.campaigns_limit,
+        'features': config.features,
+        'is_yearly': PLAN_IS_YEARLY[plan_key],
+        'billing_period': 'yearly' if PLAN_IS_YEARLY[plan_key] else 'monthly',
+        'savings': '2 months free' if PLAN_IS_YEARLY[plan_key] else None
     }
+    for plan_key, config in PLAN_CONFIG.items()
+)
+
+# Plan name and features for get_current_subscription, with the fallback for
+# a plan value missing from PLAN_CONFIG
+PLAN_SUMMARY = {
+    plan_key: {'plan_name': config.name, 'features': config.features}
+    for plan_key, config in PLAN_CONFIG.items()
+}
+UNKNOWN_PLAN_SUMMARY = {'plan_name': 'Unknown', 'features': ()}
+
+
+@lru_cache(maxsize=None)
+def get_plan_comparison(current_plan, target_plan):
+    """
+    Limit and price differences of target_plan relative to current_plan, as a
+    read-only mapping since every caller shares the cached result
+    """
+    current_config = PLAN_CONFIG.get(current_plan)
+    target_config = PLAN_CONFIG[target_plan]
+    if current_config is None:
+        return MappingProxyType({
+            'contacts_diff': target_config.contacts_limit,
+            'campaigns_diff': target_config.campaigns_limit,
+            'price_diff': target_config.price
+        })
+    return MappingProxyType({
+        'contacts_diff': target_config.contacts_limit - current_config.contacts_limit,
+        'campaigns_diff': target_config.campaigns_limit - current_config.campaigns_limit,
+        'price_diff': target_config.price - current_config.price
+    })
+
+
+# Stripe subscription statuses we track; anything else (incomplete, unpaid,
+# paused...) is treated as active as before
+STRIPE_STATUS_MAP = {
+    'active': SubscriptionStatus.ACTIVE,
+    'past_due': SubscriptionStatus.PAST_DUE,
+    'canceled': SubscriptionStatus.CANCELED,
+    'trialing': SubscriptionStatus.TRIALING,
 }
 
-def get_plan_from_price_id(price_id):
-    """Get plan key from Stripe price ID"""
-    for plan_key, config in PLAN_CONFIG.items():
-        if config.get('stripe_price_id') == price_id:
-            return plan_key
-    return None
 
+# Organization columns behind subscription_effective_state, for views that load
+# only what they report instead of the whole row
+SUBSCRIPTION_STATE_FIELDS = (
+    'id', 'subscription_plan', 'subscription_status', 'trial_ends_at',
+    'subscription_ends_at', 'is_subscription_active'
+)
+
+# Organization fields behind get_current_subscription, cached as a plain dict
+SUBSCRIPTION_ORG_FIELDS = SUBSCRIPTION_STATE_FIELDS + (
+    'updated_at', 'current_period_end', 'cancel_at_period_end',
+    'stripe_customer_id', 'stripe_subscription_id'
+)
 
+
+def get_plan_from_price_id(price_id, lookup_key=None):
+    """Get plan key from Stripe price ID, falling back to the price's lookup key"""
+    return PRICE_ID_TO_PLAN.get(price_id) or LOOKUP_KEY_TO_PLAN.get(lookup_key)
+
+
+STRIPE_PRICE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def resolve_stripe_price_id(plan_id):
+    """
+    Stripe Price for a paid plan: the configured STRIPE_PRICE_* id, otherwise
+    the price sync_stripe_prices provisioned under the plan's lookup key.
+    Returns None when neither exists.
+    """
+    price_id = PLAN_CONFIG[plan_id].stripe_price_id
+    if price_id:
+        return price_id
+    
+    lookup_key = stripe_price_lookup_key(plan_id)
+    cache_key = f"stripe_price:{lookup_key}"
+    price_id = cache.get(cache_key)
+    if price_id is None:
+        prices = stripe.Price.list(lookup_keys=[lookup_key], active=True, limit=1)
+        if not prices.data:
+            return None
+        price_id = prices.data[0].id
+        cache.set(cache_key, price_id, STRIPE_PRICE_CACHE_TIMEOUT)
+    return price_id
+
+
+# Public plan listing is identical for every caller. The cache key prefix is
+# derived from PLAN_CONFIG so a deploy that changes plans starts a fresh entry.
+PLANS_CACHE_TIMEOUT = 60 * 60
+PLANS_CACHE_KEY_PREFIX = 'plans-' + hashlib.md5(repr(PLAN_CONFIG).encode('utf-8')).hexdigest()
+
+
+@cache_page(PLANS_CACHE_TIMEOUT, key_prefix=PLANS_CACHE_KEY_PREFIX)
+@cache_control(public=True, max_age=PLANS_CACHE_TIMEOUT)
 @api_view(['GET'])
+@authentication_classes([])
 @permission_classes([AllowAny])
 def get_subscription_plans(request):
     """Get available subscription plans with pricing and features"""
-    plans = []
-    for plan_key, config in PLAN_CONFIG.items():
-        if plan_key != SubscriptionPlan.FREE_TRIAL:
-            plans.append({
-                'id': plan_key,
-                'name': config['name'],
-                'price': config['price'],
-                'stripe_price_id': config.get('stripe_price_id'),
-                'contacts_limit': config['contacts_limit'],
-                'campaigns_limit': config['campaigns_limit'],
-                'features': config['features'],
-                'is_yearly': 'yearly' in plan_key.lower()
-            })
-    
-    return Response({'plans': plans})
+    return Response({'plans': PUBLIC_PLANS_PAYLOAD})
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_plans_detailed(request):
     """Get detailed subscription plans with all features and pricing"""
-    try:
-        user = request.user
-        current_plan = None
-        if user.organization:
-            current_plan = user.organization.subscription_plan
-        
-        plans = []
-        for plan_key, config in PLAN_CONFIG.items():
-            plan_detail = {
-                'id': plan_key,
-                'name': config['name'],
-                'price': config['price'],
-                'stripe_price_id': config.get('stripe_price_id'),
-                'contacts_limit': config['contacts_limit'],
-                'campaigns_limit': config['campaigns_limit'],
-                'features': config['features'],
-                'is_yearly': 'yearly' in plan_key.lower(),
-                'is_current': plan_key == current_plan,
-                'billing_period': 'yearly' if 'yearly' in plan_key.lower() else 'monthly',
-                'savings': '2 months free' if 'yearly' in plan_key.lower() else None
-            }
-            
-            # Add comparison to current plan
-            if current_plan and plan_key != current_plan:
-                current_config = PLAN_CONFIG.get(current_plan, {})
-                plan_detail['comparison'] = {
-                    'contacts_diff': config['contacts_limit'] - current_config.get('contacts_limit', 0),
-                    'campaigns_diff': config['campaigns_limit'] - current_config.get('campaigns_limit', 0),
-                    'price_diff': config['price'] - current_config.get('price', 0)
-                }
-            
-            plans.append(plan_detail)
+    user = request.user
+    current_plan = None
+    if user.organization:
+        current_plan = user.organization.subscription_plan
+    
+    plans = []
+    for base_detail in PLAN_BASE_DETAILS:
+        plan_key = base_detail['id']
+        plan_detail = {**base_detail, 'is_current': plan_key == current_plan}
         
-        return Response({
-            'plans': plans,
-            'current_plan': current_plan
-        })
+        # Add comparison to current plan
+        if current_plan and plan_key != current_plan:
+            plan_detail['comparison'] = get_plan_comparison(current_plan, plan_key)
         
-    except Exception as e:
-        logger.error(f"Error getting detailed plans: {str(e)}")
-        return Response({
-            'error': f'Error retrieving plans: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        plans.append(plan_detail)
+    
+    return Response({
+        'plans': plans,
+        'current_plan': current_plan
+    })
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_current_subscription(request):
     """Get current user's subscription details"""
-    try:
-        user = request.user
-        if not user.organization:
-            return Response({
-                'error': 'User not associated with organization'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        org = user.organization
-        plan_config = PLAN_CONFIG.get(org.subscription_plan, {})
-        
-        # Check if trial or subscription expired
-        is_expired = False
-        if org.subscription_plan == SubscriptionPlan.FREE_TRIAL and org.trial_ends_at:
-            # Ensure timezone-aware comparison
-            trial_ends = org.trial_ends_at if timezone.is_aware(org.trial_ends_at) else timezone.make_aware(org.trial_ends_at)
-            is_expired = timezone.now() > trial_ends
-        elif org.subscription_ends_at:
-            # Ensure timezone-aware comparison
-            subscription_ends = org.subscription_ends_at if timezone.is_aware(org.subscription_ends_at) else timezone.make_aware(org.subscription_ends_at)
-            is_expired = timezone.now() > subscription_ends
-        
+    user = request.user
+    if not user.organization_id:
         return Response({
-            'subscription': {
-                'plan': org.subscription_plan,
-                'plan_name': plan_config.get('name', 'Unknown'),
-                'is_trial': org.subscription_plan == SubscriptionPlan.FREE_TRIAL,
-                'trial_ends_at': org.trial_ends_at.isoformat() if org.trial_ends_at else None,
-                'subscription_ends_at': org.subscription_ends_at.isoformat() if org.subscription_ends_at else None,
-                'current_period_end': org.current_period_end.isoformat() if org.current_period_end else None,
-                'cancel_at_period_end': org.cancel_at_period_end,
-                'is_active': org.is_subscription_active and not is_expired,
-                'is_expired': is_expired,
-                'contacts_limit': org.contacts_limit,
-                'campaigns_limit': org.campaigns_limit,
-                'features': plan_config.get('features', []),
-                'stripe_customer_id': org.stripe_customer_id,
-                'stripe_subscription_id': org.stripe_subscription_id
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # The expiry state is derived per request, so only the row's fields are
+    # cached, as plain values rather than a pickled model instance
+    cache_key = subscription_org_cache_key(user.organization_id)
+    org_values = cache.get(cache_key)
+    if org_values is None:
+        org_values = Organization.objects.filter(
+            pk=user.organization_id
+        ).values(*SUBSCRIPTION_ORG_FIELDS).get()
+        cache.set(cache_key, org_values, SUBSCRIPTION_ORG_CACHE_TIMEOUT)
+    # Unsaved instance over those fields, for the plan and expiry properties
+    org = Organization(**org_values)
+    plan_summary = PLAN_SUMMARY.get(org.subscription_plan, UNKNOWN_PLAN_SUMMARY)
+    
+    # Check if trial or subscription expired
+    state = org.subscription_effective_state
+    is_expired = state['is_expired']
+    
+    # The payload only changes with the org row (updated_at is auto_now) or
+    # when the trial/subscription crosses its end date, so polls can 304
+    etag = '"%s"' % hashlib.md5(
+        f"{org.id}:{org.updated_at.timestamp()}:{is_expired}".encode('utf-8')
+    ).hexdigest()
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    response = Response({
+        'subscription': {
+            'plan': org.subscription_plan,
+            'plan_name': plan_summary['plan_name'],
+            'is_trial': org.subscription_plan == SubscriptionPlan.FREE_TRIAL,
+            'trial_ends_at': org.trial_ends_at.isoformat() if org.trial_ends_at else None,
+            'subscription_ends_at': org.subscription_ends_at.isoformat() if org.subscription_ends_at else None,
+            'current_period_end': org.current_period_end.isoformat() if org.current_period_end else None,
+            'cancel_at_period_end': org.cancel_at_period_end,
+            'is_active': state['is_active'],
+            'is_expired': is_expired,
+            'contacts_limit': org.contacts_limit,
+            'campaigns_limit': org.campaigns_limit,
+            'features': plan_summary['features'],
+            'stripe_customer_id': org.stripe_customer_id,
+            'stripe_subscription_id': org.stripe_subscription_id
+        }
+    })
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+STRIPE_INVOICES_CACHE_TIMEOUT = 120
+STRIPE_INVOICES_MAX_FETCH = 100  # Stripe's per-request list limit
+STRIPE_INVOICES_FETCH_BUFFER = 5
+
+
+def stripe_invoices_cache_key(customer_id):
+    # Versioned so entries cached with naive local dates are never merged
+    # against the aware UTC dates built now
+    return f"stripe_invoices:v2:{customer_id}"
+
+
+def build_stripe_billing_item(invoice):
+    """Billing item for an expanded Stripe invoice"""
+    payment_intent = invoice.payment_intent
+    charge = invoice.charge
+    payment_method_details = None
+    if payment_intent and hasattr(payment_intent, 'payment_method_details'):
+        payment_method_details = payment_intent.payment_method_details
+    elif charge and hasattr(charge, 'payment_method_details'):
+        payment_method_details = charge.payment_method_details
+    
+    lines = invoice.lines.data
+    billing_item = {
+        'id': invoice.id,
+        'date': datetime.fromtimestamp(invoice.created, UTC).isoformat(),
+        'amount': invoice.amount_paid / 100,  # Convert from cents to dollars
+        'status': 'succeeded' if invoice.paid else 'failed',
+        'description': invoice.description or (lines[0].description if lines else 'Subscription payment'),
+        'invoice_url': invoice.hosted_invoice_url,
+        'invoice_pdf': invoice.invoice_pdf,
+        'payment_method': None
+    }
+    
+    # Extract payment method info
+    if payment_method_details:
+        if hasattr(payment_method_details, 'card'):
+            card = payment_method_details.card
+            billing_item['payment_method'] = {
+                'brand': card.brand,
+                'last4': card.last4
             }
-        })
-        
-    except Exception as e:
-        logger.error(f"Error retrieving subscription: {str(e)}")
-        return Response({
-            'error': f'Error retrieving subscription: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        elif hasattr(payment_method_details, 'type'):
+            billing_item['payment_method'] = {
+                'brand': payment_method_details.type,
+                'last4': '****'
+            }
+    
+    return billing_item
+
+
+def get_stripe_billing_items(customer_id, max_items):
+    """
+    Newest `max_items` billing items built from the customer's Stripe invoices,
+    plus whether Stripe holds older ones. Cached briefly so paging through
+    billing history doesn't repeat the Stripe round-trip; the webhook drops the
+    entry on invoice/subscription events.
+    """
+    cache_key = stripe_invoices_cache_key(customer_id)
+    cached = cache.get(cache_key)
+    if cached is not None and (len(cached['items']) >= max_items or not cached['has_more']):
+        return cached['items'], cached['has_more']
+    
+    # Only fetch as many invoices as the requested page can use; the
+    # payment_intent/charge expansions are paid per invoice returned
+    stripe_invoices = stripe.Invoice.list(
+        customer=customer_id,
+        limit=min(max_items, STRIPE_INVOICES_MAX_FETCH),
+        expand=['data.payment_intent', 'data.charge']
+    )
+    
+    billing_items = [build_stripe_billing_item(invoice) for invoice in stripe_invoices.data]
+    
+    cache.set(cache_key, {
+        'items': billing_items,
+        'has_more': stripe_invoices.has_more
+    }, STRIPE_INVOICES_CACHE_TIMEOUT)
+    return billing_items, stripe_invoices.has_more
+
+
+def build_local_billing_item(history_item):
+    """Billing item for a SubscriptionHistory payment row (a .values() dict)"""
+    billing_item = {
+        'id': history_item['invoice_id'] or str(history_item['id']),
+        'date': history_item['created_at'].isoformat(),
+        'amount': float(history_item['amount']) if history_item['amount'] else 0,
+        'status': 'succeeded' if history_item['event_type'] == SubscriptionEventType.PAYMENT_SUCCEEDED else 'failed',
+        'description': f"{history_item['new_plan'].replace('_', ' ').title() if history_item['new_plan'] else 'Subscription payment'}",
+        'invoice_url': history_item['invoice_pdf_url'],
+        'invoice_pdf': history_item['invoice_pdf_url'],
+        'payment_method': None
+    }
+    
+    if history_item['payment_method_brand'] and history_item['payment_method_last4']:
+        billing_item['payment_method'] = {
+            'brand': history_item['payment_method_brand'],
+            'last4': history_item['payment_method_last4']
+        }
+    
+    return billing_item
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_billing_history(request):
     """Get billing history from both Stripe and local SubscriptionHistory"""
-    try:
-        user = request.user
-        if not user.organization:
-            return Response({
-                'error': 'User not associated with organization'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        org = user.organization
-        page = int(request.GET.get('page', 1))
-        limit = int(request.GET.get('limit', 10))
-        
-        billing_items = []
-        
-        # Fetch from Stripe if customer ID exists
-        if org.stripe_customer_id:
-            try:
-                # Fetch invoices from Stripe
-                stripe_invoices = stripe.Invoice.list(
-                    customer=org.stripe_customer_id,
-                    limit=100,  # Get more to ensure we have enough data
-                    expand=['data.payment_intent', 'data.charge']
-                )
-                
-                for invoice in stripe_invoices.data:
-                    payment_method_details = None
-                    if invoice.payment_intent and hasattr(invoice.payment_intent, 'payment_method_details'):
-                        payment_method_details = invoice.payment_intent.payment_method_details
-                    elif invoice.charge and hasattr(invoice.charge, 'payment_method_details'):
-                        payment_method_details = invoice.charge.payment_method_details
-                    
-                    billing_item = {
-                        'id': invoice.id,
-                        'date': datetime.fromtimestamp(invoice.created).isoformat(),
-                        'amount': invoice.amount_paid / 100,  # Convert from cents to dollars
-                        'status': 'succeeded' if invoice.paid else 'failed',
-                        'description': invoice.description or f"{invoice.lines.data[0].description if invoice.lines.data else 'Subscription payment'}",
-                        'invoice_url': invoice.hosted_invoice_url,
-                        'invoice_pdf': invoice.invoice_pdf,
-                        'payment_method': None
-                    }
-                    
-                    # Extract payment method info
-                    if payment_method_details:
-                        if hasattr(payment_method_details, 'card'):
-                            billing_item['payment_method'] = {
-                                'brand': payment_method_details.card.brand,
-                                'last4': payment_method_details.card.last4
-                            }
-                        elif hasattr(payment_method_details, 'type'):
-                            billing_item['payment_method'] = {
-                                'brand': payment_method_details.type,
-                                'last4': '****'
-                            }
-                    
-                    billing_items.append(billing_item)
-                    
-            except Exception as stripe_error:
-                logger.warning(f"Error fetching Stripe invoices: {str(stripe_error)}")
-        
-        # Fetch from local SubscriptionHistory
-        local_history = SubscriptionHistory.objects.filter(
-            organization=org,
-            event_type__in=[
-                SubscriptionEventType.PAYMENT_SUCCEEDED,
-                SubscriptionEventType.PAYMENT_FAILED,
-                SubscriptionEventType.RENEWED
-            ]
-        ).order_by('-created_at')
-        
-        # Add local history items that aren't already in Stripe results
-        stripe_invoice_ids = {item['id'] for item in billing_items}
-        
-        for history_item in local_history:
-            if history_item.invoice_id and history_item.invoice_id not in stripe_invoice_ids:
-                billing_item = {
-                    'id': history_item.invoice_id or str(history_item.id),
-                    'date': history_item.created_at.isoformat(),
-                    'amount': float(history_item.amount) if history_item.amount else 0,
-                    'status': 'succeeded' if history_item.event_type == SubscriptionEventType.PAYMENT_SUCCEEDED else 'failed',
-                    'description': f"{history_item.new_plan.replace('_', ' ').title() if history_item.new_plan else 'Subscription payment'}",
-                    'invoice_url': history_item.invoice_pdf_url,
-                    'invoice_pdf': history_item.invoice_pdf_url,
-                    'payment_method': None
-                }
-                
-                if history_item.payment_method_brand and history_item.payment_method_last4:
-                    billing_item['payment_method'] = {
-                        'brand': history_item.payment_method_brand,
-                        'last4': history_item.payment_method_last4
-                    }
-                
-                billing_items.append(billing_item)
-        
-        # Sort by date (newest first)
-        billing_items.sort(key=lambda x: x['date'], reverse=True)
-        
-        # Apply pagination
-        start = (page - 1) * limit
-        end = start + limit
-        paginated_items = billing_items[start:end]
-        
+    user = request.user
+    if not user.organization:
+        return Response({
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    org = user.organization
+    page = int(request.GET.get('page', 1))
+    limit = int(request.GET.get('limit', 10))
+
+    # Orgs that were never billed (most trial orgs) have nothing to merge
+    if not org.stripe_customer_id and not SubscriptionHistory.lite.filter(organization=org).exists():
         return Response({
-            'items': paginated_items,
-            'total': len(billing_items),
+            'items': [],
+            'total': 0,
             'page': page,
             'limit': limit,
-            'has_more': end < len(billing_items)
+            'has_more': False
         })
-        
-    except Exception as e:
-        logger.error(f"Error retrieving billing history: {str(e)}")
-        return Response({
-            'error': f'Error retrieving billing history: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Pagination window over the merged (Stripe + local) list
+    start = (page - 1) * limit
+    end = start + limit
+    
+    billing_items = []
+    stripe_has_more = False
+    
+    # Fetch from Stripe if customer ID exists
+    if org.stripe_customer_id:
+        try:
+            stripe_items, stripe_has_more = get_stripe_billing_items(
+                org.stripe_customer_id,
+                end + STRIPE_INVOICES_FETCH_BUFFER
+            )
+            billing_items = stripe_items
+        except Exception as stripe_error:
+            logger.warning("Error fetching Stripe invoices: %s", stripe_error)
+    
+    # Fetch local SubscriptionHistory items that aren't already in Stripe results.
+    # The webhook writes payment rows with the organization update, so a
+    # payment is listed as soon as its event is processed
+    stripe_count = len(billing_items)
+    stripe_invoice_ids = {item['id'] for item in billing_items}
+    local_history = SubscriptionHistory.lite.filter(
+        organization=org,
+        event_type__in=[
+            SubscriptionEventType.PAYMENT_SUCCEEDED,
+            SubscriptionEventType.PAYMENT_FAILED,
+            SubscriptionEventType.RENEWED
+        ],
+        invoice_id__isnull=False
+    ).exclude(
+        invoice_id=''
+    ).exclude(
+        invoice_id__in=stripe_invoice_ids
+    ).values(
+        'id', 'invoice_id', 'created_at', 'amount', 'event_type', 'new_plan',
+        'invoice_pdf_url', 'payment_method_brand', 'payment_method_last4'
+    ).order_by('-created_at')
+    
+    # When Stripe was cut short, local rows older than the oldest fetched
+    # invoice rank below the page window and may duplicate unfetched invoices
+    if stripe_has_more and billing_items:
+        oldest_fetched = datetime.fromisoformat(billing_items[-1]['date'])
+        local_history = local_history.filter(created_at__gte=oldest_fetched)
+    
+    local_total = local_history.count()
+    
+    # Both streams are already newest-first, so merge them lazily and
+    # build only the local items that reach the requested page. Dates are
+    # compared as aware datetimes, not strings, since the two streams'
+    # ISO-8601 forms differ (e.g. microseconds)
+    local_items = (
+        build_local_billing_item(history_item)
+        for history_item in local_history[:end].iterator(chunk_size=50)
+    )
+    merged_items = heapq.merge(billing_items, local_items, key=lambda x: datetime.fromisoformat(x['date']), reverse=True)
+    paginated_items = list(itertools.islice(merged_items, start, end))
+    total = stripe_count + local_total
+    
+    return Response({
+        'items': paginated_items,
+        'total': total,
+        'page': page,
+        'limit': limit,
+        'has_more': end < total or stripe_has_more
+    })
 
 
 @api_view(['POST'])
@@ -346,8 +500,8 @@ def create_checkout_session(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         plan_id = request.data.get('plan_id')
-        success_url = request.data.get('success_url', f"{request.build_absolute_uri('/')}/subscription/success")
-        cancel_url = request.data.get('cancel_url', f"{request.build_absolute_uri('/')}/subscription")
+        success_url = request.data.get('success_url', f"{settings.FRONTEND_URL}/subscription/success")
+        cancel_url = request.data.get('cancel_url', f"{settings.FRONTEND_URL}/subscription")
         
         if not plan_id or plan_id not in PLAN_CONFIG:
             return Response({
@@ -359,8 +513,14 @@ def create_checkout_session(request):
                 'error': 'Cannot create checkout session for free trial'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        price_id = resolve_stripe_price_id(plan_id)
+        if not price_id:
+            logger.error("No Stripe price configured for plan %s", plan_id)
+            return Response({
+                'error': 'This plan is not available for purchase yet'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
         org = user.organization
-        plan_config = PLAN_CONFIG[plan_id]
         
         # Create or get Stripe customer
         if not org.stripe_customer_id:
@@ -370,30 +530,23 @@ def create_checkout_session(request):
                 metadata={
                     'organization_id': str(org.id),
                     'user_id': str(user.id)
-                }
+                },
+                idempotency_key=f"customer-{org.id}-{user.id}"
             )
             org.stripe_customer_id = customer.id
-            org.save()
+            org.save(update_fields=['stripe_customer_id', 'updated_at'])
+        
+        # A client retrying the same checkout resends its Idempotency-Key and
+        # gets the original session back; without one every call is a new
+        # session (unused ones expire)
+        client_key = request.headers.get('Idempotency-Key')
         
         # Create checkout session
         checkout_session = stripe.checkout.Session.create(
             customer=org.stripe_customer_id,
             payment_method_types=['card'],
             line_items=[{
-                'price': plan_config['stripe_price_id'],
-                'quantity': 1,
-            }] if plan_config.get('stripe_price_id') else [{
-                'price_data': {
-                    'currency': 'usd',
-                    'product_data': {
-                        'name': plan_config['name'],
-                        'description': ', '.join(plan_config['features'][:3])
-                    },
-                    'unit_amount': int(plan_config['price'] * 100),
-                    'recurring': {
-                        'interval': 'year' if 'yearly' in plan_id.lower() else 'month',
-                    },
-                },
+                'price': price_id,
                 'quantity': 1,
             }],
             mode='subscription',
@@ -404,21 +557,22 @@ def create_checkout_session(request):
                 'plan_id': plan_id,
                 'organization_id': str(org.id),
                 'user_id': str(user.id)
-            }
+            },
+            idempotency_key=f"checkout-{org.id}-{client_key}" if client_key else None
         )
         
-        logger.info(f"Created checkout session {checkout_session.id} for org {org.id}")
+        logger.info("Created checkout session %s for org %s", checkout_session.id, org.id)
         
         return Response({
             'checkout_url': checkout_session.url,
             'session_id': checkout_session.id
         })
         
-    except Exception as e:
-        logger.error(f"Error creating checkout session: {str(e)}")
+    except stripe.error.StripeError as e:
+        logger.error("Stripe error: %s", e)
         return Response({
-            'error': f'Error creating checkout session: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'error': f'Stripe error: {str(e)}'
+        }, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['POST'])
@@ -453,11 +607,19 @@ def manage_subscription(request):
                     'error': 'Invalid new plan selected'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            new_config = PLAN_CONFIG[new_plan_id]
-            old_plan = org.subscription_plan
+            price_id = resolve_stripe_price_id(new_plan_id)
+            if not price_id:
+                logger.error("No Stripe price configured for plan %s", new_plan_id)
+                return Response({
+                    'error': 'This plan is not available for purchase yet'
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
-            # Get current subscription
-            subscription = stripe.Subscription.retrieve(org.stripe_subscription_id)
+            # The subscription item id is stored on the org; only a missing id
+            # requires a retrieve
+            item_id = org.stripe_subscription_item_id
+            if not item_id:
+                subscription = stripe.Subscription.retrieve(org.stripe_subscription_id)
+                item_id = subscription['items']['data'][0].id
             
             # Update subscription with new price
             updated_subscription = stripe.Subscription.modify(
@@ -465,39 +627,36 @@ def manage_subscription(request):
                 cancel_at_period_end=False,
                 proration_behavior='create_prorations' if immediate else 'none',
                 items=[{
-                    'id': subscription['items']['data'][0].id,
-                    'price': new_config['stripe_price_id'] if new_config.get('stripe_price_id') else None,
-                    'price_data': {
-                        'currency': 'usd',
-                        'product': subscription['items']['data'][0]['price']['product'],
-                        'unit_amount': int(new_config['price'] * 100),
-                        'recurring': {
-                            'interval': 'year' if 'yearly' in new_plan_id.lower() else 'month',
-                        },
-                    } if not new_config.get('stripe_price_id') else None,
+                    'id': item_id,
+                    'price': price_id,
                 }]
             )
             
-            # Update organization
-            org.subscription_plan = new_plan_id
-            org.contacts_limit = new_config['contacts_limit']
-            org.campaigns_limit = new_config['campaigns_limit']
-            org.stripe_price_id = new_config.get('stripe_price_id')
-            org.save()
-            
-            # Log subscription history
-            SubscriptionHistory.objects.create(
-                organization=org,
-                event_type=SubscriptionEventType.PLAN_CHANGED,
-                old_plan=old_plan,
-                new_plan=new_plan_id,
-                metadata={
-                    'action': action,
-                    'immediate': immediate
-                }
-            )
+            with transaction.atomic():
+                # Lock the row so a concurrent webhook can't interleave with
+                # the org update and the history row
+                org = Organization.objects.select_for_update().get(pk=org.pk)
+                old_plan = org.subscription_plan
+                org.subscription_plan = new_plan_id
+                org.stripe_subscription_item_id = item_id
+                org.save(update_fields=[
+                    'subscription_plan', 'stripe_subscription_item_id', 'updated_at'
+                ])
+                invalidate_subscription_access(org.id)
+                
+                # Log subscription history
+                SubscriptionHistory.objects.create(
+                    organization=org,
+                    event_type=SubscriptionEventType.PLAN_CHANGED,
+                    old_plan=old_plan,
+                    new_plan=new_plan_id,
+                    metadata={
+                        'action': action,
+                        'immediate': immediate
+                    }
+                )
             
-            logger.info(f"Subscription {action}d for org {org.id} from {old_plan} to {new_plan_id}")
+            logger.info("Subscription %sd for org %s from %s to %s", action, org.id, old_plan, new_plan_id)
             
             return Response({
                 'message': f'Subscription {action}d successfully',
@@ -506,35 +665,43 @@ def manage_subscription(request):
             })
         
         elif action == 'cancel':
-            # Cancel subscription
-            stripe.Subscription.modify(
-                org.stripe_subscription_id,
-                cancel_at_period_end=not immediate,
-                cancel_at=int(timezone.now().timestamp()) if immediate else None
-            )
-            
-            org.cancel_at_period_end = True
+            # Cancel subscription: update locally now, call Stripe from a worker
+            # and let the customer.subscription.updated webhook reconcile
+            modify_kwargs = {'cancel_at_period_end': not immediate}
             if immediate:
-                org.is_subscription_active = False
-                org.subscription_ends_at = timezone.now()
-            org.save()
+                modify_kwargs['cancel_at'] = int(timezone.now().timestamp())
             
-            # Log subscription history
-            SubscriptionHistory.objects.create(
-                organization=org,
-                event_type=SubscriptionEventType.CANCELED,
-                old_plan=org.subscription_plan,
-                metadata={
-                    'immediate': immediate
-                }
-            )
+            with transaction.atomic():
+                org = Organization.objects.select_for_update().get(pk=org.pk)
+                org.cancel_at_period_end = True
+                if immediate:
+                    org.is_subscription_active = False
+                    org.subscription_ends_at = timezone.now()
+                org.save(update_fields=[
+                    'cancel_at_period_end', 'is_subscription_active',
+                    'subscription_ends_at', 'updated_at'
+                ])
+                invalidate_subscription_access(org.id)
+                
+                # Log subscription history
+                SubscriptionHistory.objects.create(
+                    organization=org,
+                    event_type=SubscriptionEventType.CANCELED,
+                    old_plan=org.subscription_plan,
+                    metadata={
+                        'immediate': immediate
+                    }
+                )
             
-            logger.info(f"Subscription canceled for org {org.id}")
+            task = stripe_modify_subscription.delay(org.id, action, modify_kwargs)
+            
+            logger.info("Subscription cancellation queued for org %s", org.id)
             
             return Response({
                 'message': 'Subscription canceled successfully' if immediate else 'Subscription will be canceled at the end of the billing period',
-                'cancel_at_period_end': not immediate
-            })
+                'cancel_at_period_end': not immediate,
+                'task_id': task.id
+            }, status=status.HTTP_202_ACCEPTED)
         
         elif action == 'resume':
             # Resume canceled subscription
@@ -543,40 +710,36 @@ def manage_subscription(request):
                     'error': 'Subscription is not scheduled for cancellation'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            stripe.Subscription.modify(
-                org.stripe_subscription_id,
-                cancel_at_period_end=False
-            )
-            
-            org.cancel_at_period_end = False
-            org.save()
+            with transaction.atomic():
+                org = Organization.objects.select_for_update().get(pk=org.pk)
+                org.cancel_at_period_end = False
+                org.save(update_fields=['cancel_at_period_end', 'updated_at'])
+                invalidate_subscription_access(org.id)
+                
+                # Log subscription history
+                SubscriptionHistory.objects.create(
+                    organization=org,
+                    event_type=SubscriptionEventType.UPDATED,
+                    new_plan=org.subscription_plan,
+                    metadata={
+                        'action': 'resumed'
+                    }
+                )
             
-            # Log subscription history
-            SubscriptionHistory.objects.create(
-                organization=org,
-                event_type=SubscriptionEventType.UPDATED,
-                new_plan=org.subscription_plan,
-                metadata={
-                    'action': 'resumed'
-                }
-            )
+            task = stripe_modify_subscription.delay(org.id, action, {'cancel_at_period_end': False})
             
-            logger.info(f"Subscription resumed for org {org.id}")
+            logger.info("Subscription resume queued for org %s", org.id)
             
             return Response({
-                'message': 'Subscription resumed successfully'
-            })
+                'message': 'Subscription resumed successfully',
+                'task_id': task.id
+            }, status=status.HTTP_202_ACCEPTED)
         
     except stripe.error.StripeError as e:
-        logger.error(f"Stripe error: {str(e)}")
+        logger.error("Stripe error: %s", e)
         return Response({
             'error': f'Stripe error: {str(e)}'
         }, status=status.HTTP_400_BAD_REQUEST)
-    except Exception as e:
-        logger.error(f"Error managing subscription: {str(e)}")
-        return Response({
-            'error': f'Error managing subscription: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['POST'])
@@ -596,7 +759,7 @@ def create_billing_portal_session(request):
                 'error': 'No Stripe customer found'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        return_url = request.data.get('return_url', f"{request.build_absolute_uri('/')}/subscription")
+        return_url = request.data.get('return_url', f"{settings.FRONTEND_URL}/subscription")
         
         # Create billing portal session
         portal_session = stripe.billing_portal.Session.create(
@@ -604,162 +767,120 @@ def create_billing_portal_session(request):
             return_url=return_url,
         )
         
-        logger.info(f"Created billing portal session for org {org.id}")
+        logger.info("Created billing portal session for org %s", org.id)
         
         return Response({
             'portal_url': portal_session.url
         })
         
     except stripe.error.StripeError as e:
-        logger.error(f"Stripe error: {str(e)}")
+        logger.error("Stripe error: %s", e)
         return Response({
             'error': f'Stripe error: {str(e)}'
         }, status=status.HTTP_400_BAD_REQUEST)
-    except Exception as e:
-        logger.error(f"Error creating billing portal: {str(e)}")
-        return Response({
-            'error': f'Error creating billing portal: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_subscription(request):
     """Create or update Stripe subscription"""
-    try:
-        user = request.user
-        if not user.organization:
-            return Response({
-                'error': 'User not associated with organization'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        plan_id = request.data.get('plan_id')
-        if not plan_id or plan_id not in PLAN_CONFIG:
-            return Response({
-                'error': 'Invalid plan selected'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        if plan_id == SubscriptionPlan.FREE_TRIAL:
-            return Response({
-                'error': 'Cannot create subscription for free trial'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        org = user.organization
-        plan_config = PLAN_CONFIG[plan_id]
-        
-        # Create or get Stripe customer
-        if not org.stripe_customer_id:
-            customer = stripe.Customer.create(
-                email=user.email,
-                name=org.name,
-                metadata={
-                    'organization_id': str(org.id),
-                    'user_id': str(user.id)
-                }
-            )
-            org.stripe_customer_id = customer.id
-            org.save()
-        
-        # Create Stripe subscription
-        try:
-            subscription = stripe.Subscription.create(
-                customer=org.stripe_customer_id,
-                items=[{
-                    'price': plan_config['stripe_price_id'] if plan_config.get('stripe_price_id') else None,
-                    'price_data': {
-                        'currency': 'usd',
-                        'product_data': {
-                            'name': plan_config['name'],
-                        },
-                        'unit_amount': plan_config['price'] * 100,  # Convert to cents
-                        'recurring': {
-                            'interval': 'year' if 'yearly' in plan_id else 'month',
-                        },
-                    } if not plan_config.get('stripe_price_id') else None
-                }],
-                payment_behavior='default_incomplete',
-                payment_settings={'save_default_payment_method': 'on_subscription'},
-                expand=['latest_invoice.payment_intent'],
-            )
-        except Exception as stripe_error:
-            logger.error(f"Stripe subscription creation failed: {str(stripe_error)}")
-            return Response({
-                'error': f'Failed to create subscription: {str(stripe_error)}'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Update organization with subscription details
-        org.stripe_subscription_id = subscription.id
-        org.subscription_plan = plan_id
-        org.contacts_limit = plan_config['contacts_limit']
-        org.campaigns_limit = plan_config['campaigns_limit']
-        org.is_subscription_active = True
-        org.stripe_price_id = plan_config.get('stripe_price_id')
-        
-        # Set subscription end date
-        if 'yearly' in plan_id:
-            org.subscription_ends_at = timezone.now() + timedelta(days=365)
-        else:
-            org.subscription_ends_at = timezone.now() + timedelta(days=30)
-        
-        org.save()
-        
-        # Log subscription history
-        SubscriptionHistory.objects.create(
-            organization=org,
-            event_type=SubscriptionEventType.CREATED,
-            new_plan=plan_id,
-            new_status=SubscriptionStatus.ACTIVE,
-            amount=Decimal(plan_config['price']),
-            metadata={
-                'subscription_id': subscription.id
-            }
-        )
-        
-        # Safely access the client_secret from payment_intent
-        client_secret = None
-        if hasattr(subscription, 'latest_invoice') and subscription.latest_invoice:
-            if hasattr(subscription.latest_invoice, 'payment_intent') and subscription.latest_invoice.payment_intent:
-                client_secret = subscription.latest_invoice.payment_intent.client_secret
-        
-        logger.info(f"Created subscription {subscription.id} for org {org.id}")
-        
+    user = request.user
+    if not user.organization_id:
         return Response({
-            'client_secret': client_secret,
-            'subscription_id': subscription.id
-        })
-        
-    except Exception as e:
-        logger.error(f"Error creating subscription: {str(e)}")
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    plan_id = request.data.get('plan_id')
+    if not plan_id or plan_id not in PLAN_CONFIG:
         return Response({
-            'error': f'Error creating subscription: {str(e)}'
+            'error': 'Invalid plan selected'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if plan_id == SubscriptionPlan.FREE_TRIAL:
+        return Response({
+            'error': 'Cannot create subscription for free trial'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # The Stripe calls take several hundred milliseconds, so they run on
+    # the billing queue; the client polls subscription_job_status
+    task = create_stripe_subscription.delay(user.organization_id, user.id, plan_id)
+    
+    # Tasks run eagerly in development, where the result is already here
+    if task.ready():
+        return subscription_job_response(task, user.organization_id)
+    
+    logger.info("Subscription creation queued for org %s", user.organization_id)
+    
+    return Response({
+        'job_id': task.id,
+        'status': 'pending'
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def subscription_job_response(result, organization_id):
+    """Response for a create_stripe_subscription result, as seen by the given organization"""
+    if result.failed():
+        return Response({
+            'status': 'failed',
+            'error': 'Error creating subscription'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if not result.successful():
+        return Response({'status': 'pending'})
+    
+    # Unknown ids also read as pending, so only the owning organization sees the result
+    payload = result.result
+    if payload.get('organization_id') != str(organization_id):
+        return Response({'status': 'pending'})
+    
+    if payload.get('error'):
+        return Response({
+            'status': 'failed',
+            'error': payload['error']
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'status': 'succeeded',
+        'client_secret': payload['client_secret'],
+        'subscription_id': payload['subscription_id']
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def subscription_job_status(request, job_id):
+    """Result of a create_subscription job"""
+    user = request.user
+    if not user.organization_id:
+        return Response({
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return subscription_job_response(create_stripe_subscription.AsyncResult(job_id), user.organization_id)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def cancel_subscription(request):
     """Cancel current subscription"""
-    try:
-        user = request.user
-        if not user.organization:
-            return Response({
-                'error': 'User not associated with organization'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        org = user.organization
-        if not org.stripe_subscription_id:
-            return Response({
-                'error': 'No active subscription found'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Cancel Stripe subscription
-        stripe.Subscription.modify(
-            org.stripe_subscription_id,
-            cancel_at_period_end=True
-        )
-        
+    user = request.user
+    if not user.organization:
+        return Response({
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    org = user.organization
+    if not org.stripe_subscription_id:
+        return Response({
+            'error': 'No active subscription found'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Update locally now, call Stripe from a worker and let the
+    # customer.subscription.updated webhook reconcile
+    with transaction.atomic():
+        org = Organization.objects.select_for_update().get(pk=org.pk)
         org.cancel_at_period_end = True
-        org.save()
+        org.save(update_fields=['cancel_at_period_end', 'updated_at'])
+        invalidate_subscription_access(org.id)
         
         # Log subscription history
         SubscriptionHistory.objects.create(
@@ -770,30 +891,22 @@ def cancel_subscription(request):
                 'cancel_at_period_end': True
             }
         )
-        
-        logger.info(f"Subscription scheduled for cancellation for org {org.id}")
-        
-        return Response({
-            'message': 'Subscription will be canceled at the end of the billing period'
-        })
-        
-    except stripe.error.StripeError as e:
-        logger.error(f"Stripe error: {str(e)}")
-        return Response({
-            'error': f'Stripe error: {str(e)}'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    except Exception as e:
-        logger.error(f"Error canceling subscription: {str(e)}")
-        return Response({
-            'error': f'Error canceling subscription: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    task = stripe_modify_subscription.delay(org.id, 'cancel', {'cancel_at_period_end': True})
+    
+    logger.info("Subscription cancellation queued for org %s", org.id)
+    
+    return Response({
+        'message': 'Subscription will be canceled at the end of the billing period',
+        'task_id': task.id
+    }, status=status.HTTP_202_ACCEPTED)
 
 
 @csrf_exempt  # Webhook must be exempt from CSRF protection
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def stripe_webhook(request):
-    """Handle Stripe webhook events with comprehensive event processing"""
+    """Verify, deduplicate and queue Stripe webhook events for processing"""
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     
@@ -811,30 +924,28 @@ def stripe_webhook(request):
             )
         # In debug mode, log warning but allow processing (for development/testing)
         logger.warning("Processing webhook without signature verification (DEBUG mode)")
-        try:
-            import json
-            event = json.loads(payload.decode('utf-8'))
-        except Exception as e:
-            logger.error(f"Invalid webhook payload: {str(e)}")
-            return JsonResponse({'error': 'Invalid payload'}, status=400)
     else:
         # Verify webhook signature
         try:
-            event = stripe.Webhook.construct_event(
-                payload=payload,
-                sig_header=sig_header,
-                secret=webhook_secret
-            )
+            stripe.WebhookSignature.verify_header(payload.decode('utf-8'), sig_header, webhook_secret)
         except ValueError as e:
-            logger.error(f"Invalid webhook payload: {str(e)}")
+            logger.error("Invalid webhook payload: %s", e)
             return JsonResponse({'error': 'Invalid payload'}, status=400)
         except stripe.error.SignatureVerificationError as e:
-            logger.error(f"Invalid webhook signature: {str(e)}")
+            logger.error("Invalid webhook signature: %s", e)
             return JsonResponse({'error': 'Invalid signature'}, status=400)
         except Exception as e:
-            logger.error(f"Unexpected error verifying webhook: {str(e)}")
+            logger.error("Unexpected error verifying webhook: %s", e)
             return JsonResponse({'error': 'Verification failed'}, status=400)
     
+    # Parse the body once into a plain dict. construct_event would also build
+    # a StripeObject tree, only for it to be serialized into the event record.
+    try:
+        event = json.loads(payload)
+    except ValueError as e:
+        logger.error("Invalid webhook payload: %s", e)
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+    
     # Get event ID and type
     event_id = event.get('id')
     event_type = event.get('type')
@@ -843,361 +954,471 @@ def stripe_webhook(request):
         logger.error("Webhook event missing ID")
         return JsonResponse({'error': 'Event ID required'}, status=400)
     
-    # Use database-backed idempotency with ProcessedWebhookEvent
-    with transaction.atomic():
-        # Check if we've already processed this event
-        try:
-            webhook_event = ProcessedWebhookEvent.objects.select_for_update(nowait=True).get(
-                event_id=event_id
-            )
-            # Event already processed
-            logger.info(f"Duplicate webhook event {event_id} (status: {webhook_event.status}) - skipping")
-            return JsonResponse({
-                'status': 'duplicate',
-                'processed_at': webhook_event.processed_at.isoformat()
-            })
-        except ProcessedWebhookEvent.DoesNotExist:
-            # Create new event record with PROCESSING status
-            webhook_event = ProcessedWebhookEvent.objects.create(
+    # cache.add is an atomic SET NX EX on Redis, so only one worker gets past
+    # this for a given event; the database record below stays the durable log
+    dedup_key = f"stripe_evt:{event_id}"
+    if not cache.add(dedup_key, 1, timeout=WEBHOOK_EVENT_DEDUP_TIMEOUT):
+        logger.info("Duplicate webhook event %s - skipping", event_id)
+        return JsonResponse({'status': 'duplicate'})
+    
+    # Durable idempotency: get_or_create is a single insert on the unique
+    # event_id, and a concurrent duplicate insert falls back to the get
+    try:
+        with transaction.atomic():
+            webhook_event, created = ProcessedWebhookEvent.objects.get_or_create(
                 event_id=event_id,
-                event_type=event_type,
-                status=WebhookEventStatus.PROCESSING,
-                metadata={'raw_event': event}
+                defaults={
+                    'event_type': event_type,
+                    'status': WebhookEventStatus.PENDING,
+                    'metadata': {'raw_event': event},
+                }
             )
-        except Exception as e:
-            # Handle race condition - another process may be processing this event
-            logger.warning(f"Event {event_id} is being processed by another worker")
-            return JsonResponse({'status': 'processing'})
+            if created:
+                # The task picks the event up once the record is committed
+                transaction.on_commit(lambda: process_stripe_event.delay(event_id))
+    except Exception:
+        # The event wasn't recorded; release the key so Stripe's retry of this
+        # 500 is processed instead of being answered as a duplicate
+        cache.delete(dedup_key)
+        raise
     
-    # Process different event types
-    event_object = event['data']['object']
+    if not created:
+        logger.info("Duplicate webhook event %s (status: %s) - skipping", event_id, webhook_event.status)
+        return JsonResponse({
+            'status': 'duplicate',
+            'processed_at': webhook_event.processed_at.isoformat()
+        })
     
-    logger.info(f"Processing webhook event: {event_type} - {event_id}")
+    logger.info("Queued webhook event: %s - %s", event_type, event_id)
+    
+    # Acknowledge right away; process_stripe_event applies the event from the
+    # recorded payload on the billing queue
+    return JsonResponse({'status': 'queued'})
+
+
+def webhook_organizations():
+    """
+    Organizations as the webhook handlers load them. The metadata blob is never
+    read there, and deferring it also keeps org.save() from rewriting it.
+    """
+    return Organization.objects.defer('metadata')
+
+
+@contextmanager
+def locked_webhook_organization(**lookup):
+    """
+    Lock the organization row for a webhook branch, so concurrent events for
+    the same organization apply their read-modify-write one at a time. History
+    rows are written in the same transaction.
+    """
+    with transaction.atomic():
+        yield webhook_organizations().select_for_update().get(**lookup)
+
+
+# Fields of the Stripe subscription or invoice kept on history rows. The full
+# payload stays in the ProcessedWebhookEvent row for the event.
+HISTORY_METADATA_KEYS = (
+    'id', 'status', 'current_period_end', 'cancel_at_period_end',
+    'amount_paid', 'amount_due', 'currency'
+)
+
+
+def history_metadata(stripe_object):
+    """The curated subset of a Stripe object stored in SubscriptionHistory.metadata"""
+    return {key: stripe_object[key] for key in HISTORY_METADATA_KEYS if key in stripe_object}
+
+
+def record_webhook_history(**fields):
+    """
+    Write a history row in the current transaction, so it commits or rolls
+    back with the organization update. The unique stripe_event_id makes a
+    redelivered event's row a no-op.
+    """
+    SubscriptionHistory.objects.bulk_create([SubscriptionHistory(**fields)], ignore_conflicts=True)
+
+
+# Payment events overwrite fields without reading them first, so each is applied
+# as one UPDATE that returns the organization id for the history row.
+PAYMENT_SUCCEEDED_SQL = """
+    UPDATE organizations
+    SET is_subscription_active = TRUE,
+        subscription_status = %s,
+        stripe_payment_method_id = COALESCE(%s, stripe_payment_method_id),
+        updated_at = %s
+    WHERE stripe_subscription_id = %s
+    RETURNING id
+"""
+
+PAYMENT_FAILED_SQL = """
+    UPDATE organizations
+    SET subscription_status = %s,
+        subscription_ends_at = CASE
+            WHEN subscription_ends_at IS NULL OR subscription_ends_at > %s THEN %s
+            ELSE subscription_ends_at
+        END,
+        updated_at = %s
+    WHERE stripe_subscription_id = %s
+    RETURNING id
+"""
+
+
+def update_webhook_organization(sql, params):
+    """
+    Run a payment UPDATE; returns the organization id, or None if none matched.
+    Raw SQL sends no post_save, so the cached subscription state is dropped here.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    if not row:
+        return None
+    invalidate_subscription_access(row[0])
+    return row[0]
+
+
+def handle_subscription_created(event_id, subscription):
+    """Record a newly created Stripe subscription on the organization"""
+    customer_id = subscription['customer']
     
-    # Wrap all processing in try-except for proper error handling
     try:
-        if event_type == 'customer.subscription.created':
-            # New subscription created
-            subscription = event_object
-            customer_id = subscription['customer']
-            
-            try:
-                org = Organization.objects.get(stripe_customer_id=customer_id)
-                
-                # Determine plan from price ID
-                price_id = subscription['items']['data'][0]['price']['id']
-                new_plan = get_plan_from_price_id(price_id)
-                
-                if new_plan:
-                    plan_config = PLAN_CONFIG[new_plan]
-                    org.stripe_subscription_id = subscription['id']
-                    org.subscription_plan = new_plan
-                    org.subscription_status = SubscriptionStatus.ACTIVE
-                    org.contacts_limit = plan_config['contacts_limit']
-                    org.campaigns_limit = plan_config['campaigns_limit']
-                    org.is_subscription_active = True
-                    org.stripe_price_id = price_id
-                    org.current_period_end = timezone.datetime.fromtimestamp(
-                        subscription['current_period_end'],
-                        tz=timezone.utc
-                    )
-                    org.save()
-                    
-                    # Log subscription history
-                    SubscriptionHistory.objects.create(
-                        organization=org,
-                        event_type=SubscriptionEventType.CREATED,
-                        stripe_event_id=event_id,
-                        new_plan=new_plan,
-                        new_status=SubscriptionStatus.ACTIVE,
-                        metadata=subscription
-                    )
-                    
-                    logger.info(f"Subscription created for org {org.id}")
-                    
-            except Organization.DoesNotExist:
-                logger.error(f"Organization not found for customer {customer_id}")
-        
-        elif event_type == 'customer.subscription.updated':
-            # Subscription updated (upgrade/downgrade/renewal)
-            subscription = event_object
-            subscription_id = subscription['id']
-            
-            try:
-                org = Organization.objects.get(stripe_subscription_id=subscription_id)
-                old_plan = org.subscription_plan
-                old_status = org.subscription_status
-                
-                # Determine new plan from price ID
-                price_id = subscription['items']['data'][0]['price']['id']
-                new_plan = get_plan_from_price_id(price_id)
-                
-                if new_plan and new_plan != old_plan:
-                    plan_config = PLAN_CONFIG[new_plan]
-                    org.subscription_plan = new_plan
-                    org.contacts_limit = plan_config['contacts_limit']
-                    org.campaigns_limit = plan_config['campaigns_limit']
-                    org.stripe_price_id = price_id
-                
-                # Update subscription status
-                org.subscription_status = subscription['status'].upper() if subscription['status'] in ['active', 'past_due', 'canceled', 'trialing'] else SubscriptionStatus.ACTIVE
-                org.current_period_end = timezone.datetime.fromtimestamp(
-                    subscription['current_period_end'],
-                    tz=timezone.utc
-                )
-                org.cancel_at_period_end = subscription.get('cancel_at_period_end', False)
-                org.save()
-                
-                # Log subscription history
-                SubscriptionHistory.objects.create(
-                    organization=org,
-                    event_type=SubscriptionEventType.UPDATED if new_plan == old_plan else SubscriptionEventType.PLAN_CHANGED,
-                    stripe_event_id=event_id,
-                    old_plan=old_plan,
-                    new_plan=new_plan or old_plan,
-                    old_status=old_status,
-                    new_status=org.subscription_status,
-                    metadata=subscription
-                )
-                
-                logger.info(f"Subscription updated for org {org.id}")
-                
-                # Send notification if plan changed
-                if new_plan and new_plan != old_plan:
-                    from .notifications import send_subscription_changed_notification
-                    send_subscription_changed_notification(org, old_plan, new_plan)
-                
-            except Organization.DoesNotExist:
-                logger.error(f"Organization not found for subscription {subscription_id}")
-        
-        elif event_type == 'customer.subscription.deleted':
-            # Subscription canceled
-            subscription = event_object
-            subscription_id = subscription['id']
-            
-            try:
-                org = Organization.objects.get(stripe_subscription_id=subscription_id)
-                old_plan = org.subscription_plan
-                
-                org.is_subscription_active = False
-                org.subscription_status = SubscriptionStatus.CANCELED
-                org.subscription_plan = SubscriptionPlan.FREE_TRIAL
-                org.trial_ends_at = timezone.now() + timedelta(days=14)  # Reset to trial
-                org.contacts_limit = 1000
-                org.campaigns_limit = 10
-                org.cancel_at_period_end = False
-                org.save()
+        with locked_webhook_organization(stripe_customer_id=customer_id) as org:
+            # Determine plan from price ID
+            price = subscription['items']['data'][0]['price']
+            new_plan = get_plan_from_price_id(price['id'], price.get('lookup_key'))
+            
+            if new_plan:
+                org.stripe_subscription_id = subscription['id']
+                org.stripe_subscription_item_id = subscription['items']['data'][0]['id']
+                org.subscription_plan = new_plan
+                org.subscription_status = SubscriptionStatus.ACTIVE
+                org.is_subscription_active = True
+                org.current_period_end = datetime.fromtimestamp(subscription['current_period_end'], UTC)
+                org.save(update_fields=[
+                    'stripe_subscription_id', 'stripe_subscription_item_id',
+                    'subscription_plan', 'subscription_status',
+                    'is_subscription_active', 'current_period_end', 'updated_at'
+                ])
+                invalidate_subscription_access(org.id)
                 
                 # Log subscription history
-                SubscriptionHistory.objects.create(
-                    organization=org,
-                    event_type=SubscriptionEventType.CANCELED,
+                record_webhook_history(
+                    organization_id=org.id,
+                    event_type=SubscriptionEventType.CREATED,
                     stripe_event_id=event_id,
-                    old_plan=old_plan,
-                    new_plan=SubscriptionPlan.FREE_TRIAL,
-                    old_status=SubscriptionStatus.ACTIVE,
-                    new_status=SubscriptionStatus.CANCELED,
-                    metadata=subscription
+                    new_plan=new_plan,
+                    new_status=SubscriptionStatus.ACTIVE,
+                    metadata=history_metadata(subscription)
                 )
                 
-                logger.info(f"Subscription canceled for org {org.id}")
-                
-                # Send cancellation notification
-                from .notifications import send_cancellation_notification
-                send_cancellation_notification(org)
-                
-            except Organization.DoesNotExist:
-                logger.error(f"Organization not found for subscription {subscription_id}")
-        
-        elif event_type == 'invoice.payment_succeeded':
-            # Payment succeeded
-            invoice = event_object
-            subscription_id = invoice.get('subscription')
+                logger.info("Subscription created for org %s", org.id)
             
-            if subscription_id:
-                try:
-                    org = Organization.objects.get(stripe_subscription_id=subscription_id)
-                    org.is_subscription_active = True
-                    org.subscription_status = SubscriptionStatus.ACTIVE
-                    
-                    # Update payment method if present
-                    if invoice.get('payment_intent'):
-                        payment_intent = stripe.PaymentIntent.retrieve(invoice['payment_intent'])
-                        if payment_intent.get('payment_method'):
-                            org.stripe_payment_method_id = payment_intent['payment_method']
-                    
-                    org.save()
-                    
-                    # Log subscription history with invoice details
-                    history_entry = SubscriptionHistory.objects.create(
-                        organization=org,
-                        event_type=SubscriptionEventType.PAYMENT_SUCCEEDED,
-                        stripe_event_id=event_id,
-                        amount=Decimal(invoice['amount_paid']) / 100,
-                        currency=invoice.get('currency', 'USD').upper(),
-                        invoice_id=invoice['id'],
-                        invoice_pdf_url=invoice.get('invoice_pdf'),
-                        receipt_number=invoice.get('receipt_number') or invoice.get('number'),
-                        payment_method=invoice.get('payment_method_types', ['card'])[0] if invoice.get('payment_method_types') else 'card',
-                        metadata=invoice
-                    )
-                    
-                    # Try to get payment method details
-                    if invoice.get('payment_intent'):
-                        try:
-                            payment_intent = stripe.PaymentIntent.retrieve(
-                                invoice['payment_intent'], 
-                                expand=['payment_method']
-                            )
-                            if payment_intent.payment_method and hasattr(payment_intent.payment_method, 'card'):
-                                card = payment_intent.payment_method.card
-                                history_entry.payment_method_brand = card.brand
-                                history_entry.payment_method_last4 = card.last4
-                                history_entry.save()
-                        except Exception as e:
-                            logger.warning(f"Could not retrieve payment method details: {str(e)}")
-                    
-                    logger.info(f"Payment succeeded for org {org.id}")
-                    
-                    # Send payment success notification
-                    from .notifications import send_payment_success_notification
-                    send_payment_success_notification(
-                        organization=org,
-                        amount=Decimal(invoice['amount_paid']) / 100,
-                        invoice_id=invoice['id']
-                    )
-                    
-                except Organization.DoesNotExist:
-                    logger.error(f"Organization not found for subscription {subscription_id}")
-        
-        elif event_type == 'invoice.payment_failed':
-            # Payment failed
-            invoice = event_object
-            subscription_id = invoice.get('subscription')
+    except Organization.DoesNotExist:
+        logger.error("Organization not found for customer %s", customer_id)
+
+
+def handle_subscription_updated(event_id, subscription):
+    """Sync plan, status and period end after an upgrade, downgrade or renewal"""
+    subscription_id = subscription['id']
+    
+    try:
+        with locked_webhook_organization(stripe_subscription_id=subscription_id) as org:
+            old_plan = org.subscription_plan
+            old_status = org.subscription_status
+            
+            # Determine new plan from price ID
+            price = subscription['items']['data'][0]['price']
+            new_plan = get_plan_from_price_id(price['id'], price.get('lookup_key'))
+            
+            if new_plan and new_plan != old_plan:
+                org.subscription_plan = new_plan
             
-            if subscription_id:
-                try:
-                    org = Organization.objects.get(stripe_subscription_id=subscription_id)
-                    
-                    # Update status to past due
-                    org.subscription_status = SubscriptionStatus.PAST_DUE
-                    
-                    # Give grace period before deactivating (3 days)
-                    if not org.subscription_ends_at or org.subscription_ends_at > timezone.now():
-                        org.subscription_ends_at = timezone.now() + timedelta(days=3)
-                    
-                    org.save()
-                    
-                    # Log subscription history
-                    SubscriptionHistory.objects.create(
-                        organization=org,
-                        event_type=SubscriptionEventType.PAYMENT_FAILED,
-                        stripe_event_id=event_id,
-                        amount=Decimal(invoice['amount_due']) / 100,
-                        currency=invoice.get('currency', 'USD').upper(),
-                        invoice_id=invoice['id'],
-                        failure_reason=invoice.get('failure_message', 'Unknown'),
-                        metadata=invoice
-                    )
-                    
-                    logger.warning(f"Payment failed for org {org.id}")
-                    
-                    # Send payment failure notification
-                    from .notifications import send_payment_failed_notification
-                    send_payment_failed_notification(
-                        organization=org,
-                        reason=invoice.get('failure_message', 'Payment could not be processed'),
-                        amount=Decimal(invoice['amount_due']) / 100
-                    )
-                    
-                except Organization.DoesNotExist:
-                    logger.error(f"Organization not found for subscription {subscription_id}")
+            # Update subscription status
+            org.subscription_status = STRIPE_STATUS_MAP.get(subscription['status'], SubscriptionStatus.ACTIVE)
+            org.current_period_end = datetime.fromtimestamp(subscription['current_period_end'], UTC)
+            org.cancel_at_period_end = subscription.get('cancel_at_period_end', False)
+            org.save(update_fields=[
+                'subscription_plan', 'subscription_status', 'current_period_end',
+                'cancel_at_period_end', 'updated_at'
+            ])
+            invalidate_subscription_access(org.id)
+            
+            # Log subscription history
+            record_webhook_history(
+                organization_id=org.id,
+                event_type=SubscriptionEventType.UPDATED if new_plan == old_plan else SubscriptionEventType.PLAN_CHANGED,
+                stripe_event_id=event_id,
+                old_plan=old_plan,
+                new_plan=new_plan or old_plan,
+                old_status=old_status,
+                new_status=org.subscription_status,
+                metadata=history_metadata(subscription)
+            )
         
-        elif event_type == 'customer.subscription.trial_will_end':
-            # Trial ending soon (3 days before)
-            subscription = event_object
-            subscription_id = subscription['id']
+        logger.info("Subscription updated for org %s", org.id)
+        
+        # Send notification if plan changed
+        if new_plan and new_plan != old_plan:
+            send_subscription_changed_notification_task.delay(org.id, old_plan, new_plan)
+        
+    except Organization.DoesNotExist:
+        logger.error("Organization not found for subscription %s", subscription_id)
+
+
+def handle_subscription_deleted(event_id, subscription):
+    """Drop a canceled subscription back to the free trial"""
+    subscription_id = subscription['id']
+    
+    try:
+        with locked_webhook_organization(stripe_subscription_id=subscription_id) as org:
+            old_plan = org.subscription_plan
+            
+            org.is_subscription_active = False
+            org.subscription_status = SubscriptionStatus.CANCELED
+            org.subscription_plan = SubscriptionPlan.FREE_TRIAL
+            org.trial_ends_at = timezone.now() + timedelta(days=14)  # Reset to trial
+            org.cancel_at_period_end = False
+            org.save(update_fields=[
+                'is_subscription_active', 'subscription_status', 'subscription_plan',
+                'trial_ends_at', 'cancel_at_period_end', 'updated_at'
+            ])
+            invalidate_subscription_access(org.id)
             
+            # Log subscription history
+            record_webhook_history(
+                organization_id=org.id,
+                event_type=SubscriptionEventType.CANCELED,
+                stripe_event_id=event_id,
+                old_plan=old_plan,
+                new_plan=SubscriptionPlan.FREE_TRIAL,
+                old_status=SubscriptionStatus.ACTIVE,
+                new_status=SubscriptionStatus.CANCELED,
+                metadata=history_metadata(subscription)
+            )
+        
+        logger.info("Subscription canceled for org %s", org.id)
+        
+        # Send cancellation notification
+        send_cancellation_notification_task.delay(org.id)
+        
+    except Organization.DoesNotExist:
+        logger.error("Organization not found for subscription %s", subscription_id)
+
+
+def handle_payment_succeeded(event_id, invoice):
+    """Reactivate the subscription and record the payment"""
+    subscription_id = invoice.get('subscription')
+    
+    if subscription_id:
+        # One retrieve with the payment method expanded gives both its
+        # id for the org and the card details for the history entry
+        payment_method = None
+        if invoice.get('payment_intent'):
             try:
-                org = Organization.objects.get(stripe_subscription_id=subscription_id)
-                
-                # Log notification
-                SubscriptionHistory.objects.create(
-                    organization=org,
-                    event_type=SubscriptionEventType.TRIAL_ENDED,
-                    stripe_event_id=event_id,
-                    metadata=subscription
+                payment_intent = stripe.PaymentIntent.retrieve(
+                    invoice['payment_intent'],
+                    expand=['payment_method']
                 )
-                
-                logger.info(f"Trial ending soon for org {org.id}")
-                
-                # Send trial ending notification
-                from .notifications import send_trial_expiry_reminder
-                trial_end = subscription.get('trial_end')
-                if trial_end:
-                    days_remaining = (datetime.fromtimestamp(trial_end) - datetime.now()).days
-                    send_trial_expiry_reminder(org, days_remaining)
-                
-            except Organization.DoesNotExist:
-                logger.error(f"Organization not found for subscription {subscription_id}")
+                payment_method = payment_intent.get('payment_method')
+            except stripe.error.StripeError as e:
+                logger.warning("Could not retrieve payment method details: %s", e)
+        
+        card = payment_method.get('card') if payment_method else None
+        now = timezone.now()
+        with transaction.atomic():
+            org_id = update_webhook_organization(PAYMENT_SUCCEEDED_SQL, [
+                SubscriptionStatus.ACTIVE,
+                payment_method['id'] if payment_method else None,
+                now,
+                subscription_id
+            ])
+            if org_id is None:
+                logger.error("Organization not found for subscription %s", subscription_id)
+                return
+            
+            # Log subscription history with invoice details
+            record_webhook_history(
+                organization_id=org_id,
+                event_type=SubscriptionEventType.PAYMENT_SUCCEEDED,
+                stripe_event_id=event_id,
+                amount=Decimal(invoice['amount_paid']) / 100,
+                currency=invoice.get('currency', 'USD').upper(),
+                invoice_id=invoice['id'],
+                invoice_pdf_url=invoice.get('invoice_pdf'),
+                receipt_number=invoice.get('receipt_number') or invoice.get('number'),
+                payment_method=invoice.get('payment_method_types', ['card'])[0] if invoice.get('payment_method_types') else 'card',
+                payment_method_brand=card['brand'] if card else None,
+                payment_method_last4=card['last4'] if card else None,
+                metadata=history_metadata(invoice)
+            )
         
-        else:
-            logger.info(f"Unhandled webhook event type: {event_type}")
+        logger.info("Payment succeeded for org %s", org_id)
         
-        # Mark webhook event as successfully processed
-        webhook_event.status = WebhookEventStatus.PROCESSED
-        webhook_event.save()
+        # Send payment success notification
+        send_payment_success_notification_task.delay(
+            org_id,
+            str(Decimal(invoice['amount_paid']) / 100),
+            invoice_id=invoice['id']
+        )
+
+
+def handle_payment_failed(event_id, invoice):
+    """Mark the subscription past due with a short grace period"""
+    subscription_id = invoice.get('subscription')
+    
+    if subscription_id:
+        # Give grace period before deactivating (3 days), unless the
+        # subscription has already ended
+        now = timezone.now()
+        with transaction.atomic():
+            org_id = update_webhook_organization(PAYMENT_FAILED_SQL, [
+                SubscriptionStatus.PAST_DUE,
+                now,
+                now + timedelta(days=3),
+                now,
+                subscription_id
+            ])
+            if org_id is None:
+                logger.error("Organization not found for subscription %s", subscription_id)
+                return
+            
+            # Log subscription history
+            record_webhook_history(
+                organization_id=org_id,
+                event_type=SubscriptionEventType.PAYMENT_FAILED,
+                stripe_event_id=event_id,
+                amount=Decimal(invoice['amount_due']) / 100,
+                currency=invoice.get('currency', 'USD').upper(),
+                invoice_id=invoice['id'],
+                failure_reason=invoice.get('failure_message', 'Unknown'),
+                metadata=history_metadata(invoice)
+            )
+        
+        logger.warning("Payment failed for org %s", org_id)
         
-        return JsonResponse({'status': 'success'})
+        # Send payment failure notification
+        send_payment_failed_notification_task.delay(
+            org_id,
+            invoice.get('failure_message', 'Payment could not be processed'),
+            amount=str(Decimal(invoice['amount_due']) / 100)
+        )
+
+
+def handle_trial_will_end(event_id, subscription):
+    """Record the upcoming trial end and remind the organization"""
+    subscription_id = subscription['id']
+    
+    try:
+        org = webhook_organizations().get(stripe_subscription_id=subscription_id)
+        
+        # Log notification
+        record_webhook_history(
+            organization_id=org.id,
+            event_type=SubscriptionEventType.TRIAL_ENDED,
+            stripe_event_id=event_id,
+            metadata=history_metadata(subscription)
+        )
         
-    except Exception as e:
-        logger.error(f"Error processing webhook event {event_type}: {str(e)}")
+        logger.info("Trial ending soon for org %s", org.id)
         
-        # Mark webhook event as failed and store error
-        webhook_event.status = WebhookEventStatus.FAILED
-        webhook_event.error_message = str(e)
-        webhook_event.save()
+        # Send trial ending notification
+        trial_end = subscription.get('trial_end')
+        if trial_end:
+            days_remaining = (datetime.fromtimestamp(trial_end, UTC) - datetime.now(UTC)).days
+            send_trial_expiry_reminder_task.delay(org.id, days_remaining)
         
-        # Return 500 to trigger Stripe retry (if configured)
-        return JsonResponse({'error': 'Processing failed'}, status=500)
+    except Organization.DoesNotExist:
+        logger.error("Organization not found for subscription %s", subscription_id)
+
+
+STRIPE_EVENT_HANDLERS = {
+    'customer.subscription.created': handle_subscription_created,
+    'customer.subscription.updated': handle_subscription_updated,
+    'customer.subscription.deleted': handle_subscription_deleted,
+    'invoice.payment_succeeded': handle_payment_succeeded,
+    'invoice.payment_failed': handle_payment_failed,
+    'customer.subscription.trial_will_end': handle_trial_will_end,
+}
+
+
+def handle_stripe_event(event):
+    """
+    Apply a verified Stripe event to local state. Runs in the
+    process_stripe_event task; exceptions propagate so the task can record
+    the failure and retry.
+    """
+    event_id = event['id']
+    event_type = event['type']
+    event_object = event['data']['object']
+    
+    # Invoice and subscription changes invalidate the cached billing history
+    if event_type.startswith(('invoice.', 'customer.subscription.')) and event_object.get('customer'):
+        cache.delete(stripe_invoices_cache_key(event_object['customer']))
+    
+    logger.info("Processing webhook event: %s - %s", event_type, event_id)
+    
+    handler = STRIPE_EVENT_HANDLERS.get(event_type)
+    if handler:
+        handler(event_id, event_object)
+    else:
+        logger.info("Unhandled webhook event type: %s", event_type)
+
+
+# Access decisions and the organization row behind get_current_subscription
+# only change with the subscription, so they are cached and dropped whenever
+# a view, webhook, task or Organization.save() changes it
+SUBSCRIPTION_ACCESS_CACHE_TIMEOUT = 60
+SUBSCRIPTION_ORG_CACHE_TIMEOUT = 900
+
+
+def subscription_access_cache_key(organization_id):
+    return f"subscription_access:{organization_id}"
+
+
+def subscription_org_cache_key(organization_id):
+    # Bump the version when SUBSCRIPTION_ORG_FIELDS changes
+    return f"sub:{organization_id}:v2"
+
+
+def invalidate_subscription_access(organization_id):
+    """Drop the cached subscription state once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete_many([
+        subscription_access_cache_key(organization_id),
+        subscription_org_cache_key(organization_id)
+    ]))
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def check_subscription_access(request):
     """Check if user has access to specific features"""
-    try:
-        user = request.user
-        if not user.organization:
-            return Response({
-                'error': 'User not associated with organization'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        org = user.organization
-        feature = request.data.get('feature')
-        
-        # Check if subscription is active
-        is_expired = False
-        if org.subscription_plan == SubscriptionPlan.FREE_TRIAL and org.trial_ends_at:
-            is_expired = timezone.now() > org.trial_ends_at
-        elif org.subscription_ends_at:
-            is_expired = timezone.now() > org.subscription_ends_at
-        
-        has_access = org.is_subscription_active and not is_expired
-        
-        return Response({
-            'has_access': has_access,
-            'is_expired': is_expired,
-            'subscription_plan': org.subscription_plan,
-            'subscription_status': org.subscription_status,
-            'upgrade_required': not has_access
-        })
-        
-    except Exception as e:
-        logger.error(f"Error checking access: {str(e)}")
+    user = request.user
+    if not user.organization_id:
         return Response({
-            'error': f'Error checking access: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    cache_key = subscription_access_cache_key(user.organization_id)
+    access = cache.get(cache_key)
+    if access is not None:
+        return Response(access)
+    
+    org = Organization.objects.only(*SUBSCRIPTION_STATE_FIELDS).get(pk=user.organization_id)
+    
+    # Check if subscription is active
+    state = org.subscription_effective_state
+    is_expired = state['is_expired']
+    has_access = state['is_active']
+    
+    access = {
+        'has_access': has_access,
+        'is_expired': is_expired,
+        'subscription_plan': org.subscription_plan,
+        'subscription_status': org.subscription_status,
+        'upgrade_required': not has_access
+    }
+    cache.set(cache_key, access, SUBSCRIPTION_ACCESS_CACHE_TIMEOUT)
+    
+    return Response(access)
 
 
 # Helper functions for subscription validation and usage tracking
@@ -1206,21 +1427,11 @@ def check_subscription_active(organization):
     if not organization:
         return False
     
-    now = timezone.now()
-    
     # Check subscription status
     if organization.subscription_status in [SubscriptionStatus.CANCELED, SubscriptionStatus.PAST_DUE]:
         return False
     
-    # Check expiration based on plan type
-    if organization.subscription_plan == SubscriptionPlan.FREE_TRIAL:
-        if organization.trial_ends_at and now > organization.trial_ends_at:
-            return False
-    else:
-        if organization.subscription_ends_at and now > organization.subscription_ends_at:
-            return False
-    
-    return organization.is_subscription_active
+    return organization.subscription_effective_state['is_active']
 
 
 def check_feature_available(organization, feature_name):
@@ -1232,13 +1443,12 @@ def check_feature_available(organization, feature_name):
     if not check_subscription_active(organization):
         return False
     
-    try:
-        plan_features = PlanFeatures.objects.get(plan=organization.subscription_plan)
-        return getattr(plan_features, feature_name, False)
-    except PlanFeatures.DoesNotExist:
+    plan_features = get_plan_features(organization.subscription_plan)
+    if plan_features is None:
         # Default to basic features only
         basic_features = ['has_email_campaigns', 'has_basic_analytics']
         return feature_name in basic_features
+    return getattr(plan_features, feature_name, False)
 
 
 def check_usage_limit(organization, resource_type):
@@ -1246,12 +1456,8 @@ def check_usage_limit(organization, resource_type):
     if not organization:
         return {'allowed': False, 'reason': 'No organization'}
     
-    # Get plan features and limits
-    try:
-        plan_features = PlanFeatures.objects.get(plan=organization.subscription_plan)
-    except PlanFeatures.DoesNotExist:
-        # Use default limits from organization
-        plan_features = None
+    # Get plan features and limits; None falls back to the organization's limits
+    plan_features = get_plan_features(organization.subscription_plan)
     
     # Get current usage
     usage = get_current_usage(organization)
@@ -1259,7 +1465,7 @@ def check_usage_limit(organization, resource_type):
     # Check specific resource limits
     if resource_type == 'campaigns':
         limit = plan_features.campaigns_limit if plan_features else organization.campaigns_limit
-        current = organization.campaigns.count()
+        current = organization.cached_campaigns_count
         return {
             'allowed': current < limit,
             'current': current,
@@ -1269,7 +1475,7 @@ def check_usage_limit(organization, resource_type):
     
     elif resource_type == 'contacts':
         limit = plan_features.contacts_limit if plan_features else organization.contacts_limit
-        current = organization.contacts.count()
+        current = organization.cached_contacts_count
         return {
             'allowed': current < limit,
             'current': current,
@@ -1293,8 +1499,8 @@ def check_usage_limit(organization, resource_type):
             return {'allowed': True, 'current': None, 'limit': None, 'reason': None}
         
         # Basic plans have limited templates
-        limit = 10 if 'basic' in organization.subscription_plan.lower() else 50
-        current = organization.email_templates.count()
+        limit = 10 if organization.subscription_plan in BASIC_PLANS else 50
+        current = organization.cached_templates_count
         return {
             'allowed': current < limit,
             'current': current,
@@ -1308,8 +1514,8 @@ def check_usage_limit(organization, resource_type):
             return {'allowed': True, 'current': None, 'limit': None, 'reason': None}
         
         # Basic plans support limited domains
-        limit = 1 if 'basic' in organization.subscription_plan.lower() else 3
-        current = organization.domains.count()
+        limit = 1 if organization.subscription_plan in BASIC_PLANS else 3
+        current = organization.cached_domains_count
         return {
             'allowed': current < limit,
             'current': current,
@@ -1342,56 +1548,79 @@ def get_current_usage(organization):
             'ab_tests_created': 0,
         }
     )
+    # Increments still waiting in the Redis buffer
+    pending = get_buffered_usage(organization.id, month_start)
     
-    # Get current counts from database
     return {
         'month': month_start.isoformat(),
-        'emails_sent': usage.emails_sent,
-        'campaigns_created': usage.campaigns_created,
-        'contacts_imported': usage.contacts_imported,
-        'templates_created': usage.templates_created,
-        'domains_verified': usage.domains_verified,
-        'api_calls': usage.api_calls,
-        'ab_tests_created': usage.ab_tests_created,
+        'emails_sent': usage.emails_sent + pending.get('emails_sent', 0),
+        'campaigns_created': usage.campaigns_created + pending.get('campaigns_created', 0),
+        'contacts_imported': usage.contacts_imported + pending.get('contacts_imported', 0),
+        'templates_created': usage.templates_created + pending.get('templates_created', 0),
+        'domains_verified': usage.domains_verified + pending.get('domains_verified', 0),
+        'api_calls': usage.api_calls + pending.get('api_calls', 0),
+        'ab_tests_created': usage.ab_tests_created + pending.get('ab_tests_created', 0),
         # Current totals
-        'total_contacts': organization.contacts.count(),
-        'total_campaigns': organization.campaigns.count(),
-        'total_templates': organization.email_templates.count(),
-        'total_domains': organization.domains.count(),
+        'total_contacts': organization.cached_contacts_count,
+        'total_campaigns': organization.cached_campaigns_count,
+        'total_templates': organization.cached_templates_count,
+        'total_domains': organization.cached_domains_count,
     }
 
 
+# Map resource types to UsageTracking fields
+USAGE_FIELD_MAP = {
+    'emails': 'emails_sent',
+    'campaigns': 'campaigns_created',
+    'contacts': 'contacts_imported',
+    'templates': 'templates_created',
+    'domains': 'domains_verified',
+    'api': 'api_calls',
+    'ab_tests': 'ab_tests_created',
+}
+
+# Inserts the month's usage row or, when (organization, month) already exists,
+# adds the inserted counter values to it - one statement instead of a
+# get_or_create followed by an F() update
+USAGE_UPSERT_SQL = """
+    INSERT INTO usage_tracking (id, organization_id, month, {columns}, created_at, updated_at)
+    VALUES (%s, %s, %s, {placeholders}, %s, %s)
+    ON CONFLICT (organization_id, month) DO UPDATE
+    SET {increments}, updated_at = EXCLUDED.updated_at
+""".format(
+    columns=', '.join(USAGE_FIELD_MAP.values()),
+    placeholders=', '.join(['%s'] * len(USAGE_FIELD_MAP)),
+    increments=', '.join(
+        f"{field} = usage_tracking.{field} + EXCLUDED.{field}" for field in USAGE_FIELD_MAP.values()
+    ),
+)
+
+
+def write_usage_counts(organization_id, month_start, counts):
+    """Add {field_name: count} to the organization's usage row for the month"""
+    now = timezone.now()
+    counters = [counts.get(field_name, 0) for field_name in USAGE_FIELD_MAP.values()]
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            USAGE_UPSERT_SQL,
+            [str(uuid.uuid4()), organization_id, month_start, *counters, now, now]
+        )
+
+
 def update_usage_tracking(organization, resource_type, increment=1):
     """Update usage tracking for a specific resource"""
-    if not organization:
+    if not organization or resource_type not in USAGE_FIELD_MAP:
         return
     
     now = timezone.now()
     month_start = datetime(now.year, now.month, 1).date()
+    field_name = USAGE_FIELD_MAP[resource_type]
     
-    # Get or create usage tracking for current month
-    usage, created = UsageTracking.objects.get_or_create(
-        organization=organization,
-        month=month_start
-    )
-    
-    # Map resource types to fields
-    field_map = {
-        'emails': 'emails_sent',
-        'campaigns': 'campaigns_created',
-        'contacts': 'contacts_imported',
-        'templates': 'templates_created',
-        'domains': 'domains_verified',
-        'api': 'api_calls',
-        'ab_tests': 'ab_tests_created',
-    }
-    
-    if resource_type in field_map:
-        field_name = field_map[resource_type]
-        UsageTracking.objects.filter(
-            organization=organization,
-            month=month_start
-        ).update(**{field_name: F(field_name) + increment})
+    # Buffered in Redis and flushed by flush_usage_buffer; written directly
+    # when there is no Redis to buffer in
+    if not buffer_usage_increment(organization.id, month_start, field_name, increment):
+        write_usage_counts(organization.id, month_start, {field_name: increment})
 
 
 def get_subscription_details(organization):
@@ -1414,8 +1643,8 @@ def get_subscription_details(organization):
             days_remaining = (organization.subscription_ends_at - now).days
     
     # Get plan features
-    try:
-        plan_features = PlanFeatures.objects.get(plan=organization.subscription_plan)
+    plan_features = get_plan_features(organization.subscription_plan)
+    if plan_features:
         features = {
             'contacts_limit': plan_features.contacts_limit,
             'campaigns_limit': plan_features.campaigns_limit,
@@ -1428,7 +1657,7 @@ def get_subscription_details(organization):
             'has_custom_templates': plan_features.has_custom_templates,
             'has_priority_support': plan_features.has_priority_support,
         }
-    except PlanFeatures.DoesNotExist:
+    else:
         features = {
             'contacts_limit': organization.contacts_limit,
             'campaigns_limit': organization.campaigns_limit,
@@ -1458,228 +1687,238 @@ def get_subscription_details(organization):
 @permission_classes([IsAuthenticated])
 def get_notifications(request):
     """Get user's notification history"""
-    try:
-        user = request.user
-        if not user.organization:
+    user = request.user
+    if not user.organization:
+        return Response({
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Get query parameters
+    limit = int(request.GET.get('limit', 50))
+    offset = int(request.GET.get('offset', 0))
+    # Keyset cursor from the previous page's next_before/next_before_id
+    before = request.GET.get('before')
+    before_id = request.GET.get('before_id')
+    unread_only = request.GET.get('unread_only', 'false').lower() == 'true'
+    channel = request.GET.get('channel', None)  # 'email', 'in_app', or None for all
+    
+    # Build query
+    query = SubscriptionNotification.objects.filter(
+        organization=user.organization
+    )
+    
+    # Filter by channel if specified
+    if channel:
+        query = query.filter(channel=channel)
+    
+    # Filter by unread if requested
+    if unread_only:
+        query = query.filter(is_read=False)
+    
+    # Get total and unread counts before pagination. The organization keeps
+    # a running unread count, which only covers all channels
+    if channel:
+        counts = query.aggregate(
+            total=Count('id'),
+            unread=Count('id', filter=Q(is_read=False))
+        )
+        total_count = counts['total']
+        unread_count = counts['unread']
+    else:
+        unread_count = user.organization.unread_notifications_count
+        total_count = unread_count if unread_only else query.count()
+    
+    # Apply pagination, fetching only the serialized columns
+    page = query.order_by('-created_at', '-id').values(
+        'id', 'notification_type', 'channel', 'status', 'is_read', 'sent_at',
+        'read_at', 'created_at', 'metadata', 'error_message'
+    )
+    if before:
+        # Keyset pagination walks the (organization, created_at, id) index
+        # instead of scanning and discarding OFFSET rows
+        before_dt = parse_datetime(before)
+        if before_dt is None or not before_id:
             return Response({
-                'error': 'User not associated with organization'
+                'error': 'before must be an ISO datetime and before_id is required with it'
             }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get query parameters
-        limit = int(request.GET.get('limit', 50))
-        offset = int(request.GET.get('offset', 0))
-        unread_only = request.GET.get('unread_only', 'false').lower() == 'true'
-        channel = request.GET.get('channel', None)  # 'email', 'in_app', or None for all
-        
-        # Build query
-        query = SubscriptionNotification.objects.filter(
-            organization=user.organization
+        page = page.filter(
+            Q(created_at__lt=before_dt) | Q(created_at=before_dt, id__lt=before_id)
         )
-        
-        # Filter by channel if specified
-        if channel:
-            query = query.filter(channel=channel)
-        
-        # Filter by unread if requested
-        if unread_only:
-            query = query.filter(is_read=False)
-        
-        # Get total count before pagination
-        total_count = query.count()
-        unread_count = query.filter(is_read=False).count() if not unread_only else total_count
-        
-        # Apply pagination
-        notifications = query.order_by('-created_at')[offset:offset + limit]
-        
-        # Serialize notifications
-        notifications_data = []
-        for notification in notifications:
-            notifications_data.append({
-                'id': str(notification.id),
-                'type': notification.notification_type,
-                'channel': notification.channel,
-                'status': notification.status,
-                'is_read': notification.is_read,
-                'sent_at': notification.sent_at.isoformat() if notification.sent_at else None,
-                'read_at': notification.read_at.isoformat() if notification.read_at else None,
-                'created_at': notification.created_at.isoformat(),
-                'metadata': notification.metadata or {},
-                'error_message': notification.error_message,
-            })
-        
-        return Response({
-            'notifications': notifications_data,
-            'total_count': total_count,
-            'unread_count': unread_count,
-            'limit': limit,
-            'offset': offset,
-            'has_more': (offset + limit) < total_count
-        })
-        
-    except Exception as e:
-        logger.error(f"Error fetching notifications: {str(e)}")
-        return Response({
-            'error': f'Error fetching notifications: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        notifications = list(page[:limit + 1])
+        has_more = len(notifications) > limit
+        notifications = notifications[:limit]
+    else:
+        notifications = list(page[offset:offset + limit])
+        has_more = (offset + limit) < total_count
+    
+    # Serialize notifications
+    notifications_data = [{
+        'id': str(notification['id']),
+        'type': notification['notification_type'],
+        'channel': notification['channel'],
+        'status': notification['status'],
+        'is_read': notification['is_read'],
+        'sent_at': notification['sent_at'].isoformat() if notification['sent_at'] else None,
+        'read_at': notification['read_at'].isoformat() if notification['read_at'] else None,
+        'created_at': notification['created_at'].isoformat(),
+        'metadata': notification['metadata'] or {},
+        'error_message': notification['error_message'],
+    } for notification in notifications]
+    
+    return Response({
+        'notifications': notifications_data,
+        'total_count': total_count,
+        'unread_count': unread_count,
+        'limit': limit,
+        'offset': offset,
+        'has_more': has_more,
+        'next_before': notifications[-1]['created_at'].isoformat() if notifications else None,
+        'next_before_id': str(notifications[-1]['id']) if notifications else None,
+    })
+
+
+NOTIFICATION_UPDATE_BATCH_SIZE = 1000
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_notification_read(request):
     """Mark notification(s) as read"""
-    try:
-        user = request.user
-        if not user.organization:
-            return Response({
-                'error': 'User not associated with organization'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        notification_ids = request.data.get('notification_ids', [])
-        mark_all = request.data.get('mark_all', False)
-        
-        if mark_all:
-            # Mark all unread notifications as read
-            notifications = SubscriptionNotification.objects.filter(
+    user = request.user
+    if not user.organization:
+        return Response({
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    notification_ids = request.data.get('notification_ids', [])
+    mark_all = request.data.get('mark_all', False)
+    
+    if mark_all:
+        # Mark all unread notifications as read; the counter moves by the
+        # update's rowcount in the same transaction
+        with transaction.atomic():
+            updated_count = SubscriptionNotification.objects.filter(
                 organization=user.organization,
                 is_read=False
-            )
-            updated_count = notifications.update(
+            ).update(
                 is_read=True,
-                read_at=timezone.now()
-            )
-            
-            return Response({
-                'success': True,
-                'updated_count': updated_count,
-                'message': f'Marked {updated_count} notifications as read'
-            })
-        
-        elif notification_ids:
-            # Mark specific notifications as read
-            notifications = SubscriptionNotification.objects.filter(
-                id__in=notification_ids,
-                organization=user.organization,
-                is_read=False
+                read_at=Now(),
+                updated_at=Now()
             )
-            
-            updated_count = 0
-            for notification in notifications:
-                notification.mark_as_read()
-                updated_count += 1
-            
-            return Response({
-                'success': True,
-                'updated_count': updated_count,
-                'message': f'Marked {updated_count} notifications as read'
-            })
+            Organization.adjust_counter(user.organization.id, 'unread_notifications_count', -updated_count)
         
-        else:
-            return Response({
-                'error': 'No notification IDs provided'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'success': True,
+            'updated_count': updated_count,
+            'message': f'Marked {updated_count} notifications as read'
+        })
+    
+    elif notification_ids:
+        # Mark specific notifications as read, in batches so a long id
+        # list doesn't become one huge IN clause
+        updated_count = 0
+        ids = iter(notification_ids)
+        with transaction.atomic():
+            for batch in iter(lambda: list(itertools.islice(ids, NOTIFICATION_UPDATE_BATCH_SIZE)), []):
+                updated_count += SubscriptionNotification.objects.filter(
+                    id__in=batch,
+                    organization=user.organization,
+                    is_read=False
+                ).update(
+                    is_read=True,
+                    read_at=Now(),
+                    updated_at=Now()
+                )
+            Organization.adjust_counter(user.organization.id, 'unread_notifications_count', -updated_count)
         
-    except Exception as e:
-        logger.error(f"Error marking notifications as read: {str(e)}")
         return Response({
-            'error': f'Error marking notifications as read: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'success': True,
+            'updated_count': updated_count,
+            'message': f'Marked {updated_count} notifications as read'
+        })
+    
+    else:
+        return Response({
+            'error': 'No notification IDs provided'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Notification preferences an organization can set, with their defaults
+NOTIFICATION_PREFERENCE_DEFAULTS = {
+    'email_trial_reminders': True,
+    'email_payment_notifications': True,
+    'email_subscription_changes': True,
+    'email_usage_alerts': True,
+    'in_app_notifications': True,
+    'webhook_notifications': False,
+    'notification_frequency': 'immediate',  # 'immediate', 'daily_digest', 'weekly_digest'
+}
+NOTIFICATION_PREFERENCE_KEYS = frozenset(NOTIFICATION_PREFERENCE_DEFAULTS)
+# Response for organizations that never saved preferences; never mutated
+DEFAULT_NOTIFICATION_PREFERENCES_PAYLOAD = {'preferences': NOTIFICATION_PREFERENCE_DEFAULTS}
+
+NOTIFICATION_PREFERENCES_MERGE_SQL = """
+    jsonb_set(
+        COALESCE(metadata, '{}'::jsonb),
+        '{notification_preferences}',
+        COALESCE(metadata->'notification_preferences', '{}'::jsonb) || %s::jsonb,
+        true
+    )
+"""
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_notification_preferences(request):
     """Update notification preferences for the organization"""
-    try:
-        user = request.user
-        if not user.organization:
-            return Response({
-                'error': 'User not associated with organization'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get preferences from request
-        preferences = request.data.get('preferences', {})
-        
-        # Valid preference keys
-        valid_keys = [
-            'email_trial_reminders',
-            'email_payment_notifications',
-            'email_subscription_changes',
-            'email_usage_alerts',
-            'in_app_notifications',
-            'webhook_notifications',
-            'notification_frequency',  # 'immediate', 'daily_digest', 'weekly_digest'
-        ]
-        
-        # Filter and validate preferences
-        filtered_prefs = {k: v for k, v in preferences.items() if k in valid_keys}
-        
-        # Store preferences in organization metadata
-        org = user.organization
-        if not hasattr(org, 'metadata') or org.metadata is None:
-            org.metadata = {}
-        
-        # Update notification preferences
-        if 'notification_preferences' not in org.metadata:
-            org.metadata['notification_preferences'] = {}
-        
-        org.metadata['notification_preferences'].update(filtered_prefs)
-        
-        # Save the organization
-        org.save(update_fields=['metadata', 'updated_at'])
-        
-        # Log the preference update
-        logger.info(f"Updated notification preferences for org {org.id}: {filtered_prefs}")
-        
-        return Response({
-            'success': True,
-            'preferences': org.metadata.get('notification_preferences', {}),
-            'message': 'Notification preferences updated successfully'
-        })
-        
-    except Exception as e:
-        logger.error(f"Error updating notification preferences: {str(e)}")
+    user = request.user
+    if not user.organization_id:
         return Response({
-            'error': f'Error updating notification preferences: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Get preferences from request
+    preferences = request.data.get('preferences', {})
+    
+    # Filter and validate preferences
+    filtered_prefs = {k: v for k, v in preferences.items() if k in NOTIFICATION_PREFERENCE_KEYS}
+    
+    # Merge into the organization metadata in the database, so concurrent
+    # updates don't overwrite each other and the blob isn't loaded here
+    organization = Organization.objects.filter(pk=user.organization_id)
+    organization.update(
+        metadata=RawSQL(NOTIFICATION_PREFERENCES_MERGE_SQL, [json.dumps(filtered_prefs)]),
+        updated_at=timezone.now()
+    )
+    preferences = organization.values_list('metadata__notification_preferences', flat=True).first()
+    
+    # Log the preference update
+    logger.info("Updated notification preferences for org %s: %s", user.organization_id, filtered_prefs)
+    
+    return Response({
+        'success': True,
+        'preferences': preferences or {},
+        'message': 'Notification preferences updated successfully'
+    })
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_notification_preferences(request):
     """Get current notification preferences"""
-    try:
-        user = request.user
-        if not user.organization:
-            return Response({
-                'error': 'User not associated with organization'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        org = user.organization
-        
-        # Default preferences
-        default_prefs = {
-            'email_trial_reminders': True,
-            'email_payment_notifications': True,
-            'email_subscription_changes': True,
-            'email_usage_alerts': True,
-            'in_app_notifications': True,
-            'webhook_notifications': False,
-            'notification_frequency': 'immediate',
-        }
-        
-        # Get stored preferences or use defaults
-        if hasattr(org, 'metadata') and org.metadata:
-            stored_prefs = org.metadata.get('notification_preferences', {})
-            preferences = {**default_prefs, **stored_prefs}
-        else:
-            preferences = default_prefs
-        
-        return Response({
-            'preferences': preferences
-        })
-        
-    except Exception as e:
-        logger.error(f"Error fetching notification preferences: {str(e)}")
+    user = request.user
+    if not user.organization:
         return Response({
-            'error': f'Error fetching notification preferences: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            'error': 'User not associated with organization'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    org = user.organization
+    
+    # Get stored preferences or use defaults
+    stored_prefs = (org.metadata or {}).get('notification_preferences')
+    if not stored_prefs:
+        return Response(DEFAULT_NOTIFICATION_PREFERENCES_PAYLOAD)
+    
+    return Response({
+        'preferences': {**NOTIFICATION_PREFERENCE_DEFAULTS, **stored_prefs}
+    })
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.accounts.models import Organization, User
+from apps.common.constants import SubscriptionEventType
+from apps.subscriptions import subscription_views
+from apps.subscriptions.models import SubscriptionHistory
+
+UTC = dt_timezone.utc
+
+
+def stripe_invoice(invoice_id, created):
+    return SimpleNamespace(
+        id=invoice_id,
+        created=int(created.timestamp()),
+        amount_paid=1900,
+        paid=True,
+        description='Basic plan',
+        lines=SimpleNamespace(data=[]),
+        hosted_invoice_url=None,
+        invoice_pdf=None,
+        payment_intent=None,
+        charge=None
+    )
+
+
+# A non-UTC zone makes naive local dates sort differently from UTC ones
+@override_settings(TIME_ZONE='America/New_York')
+@mock.patch.object(subscription_views.stripe.Invoice, 'list')
+class BillingHistoryTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Acme', stripe_customer_id='cus_1')
+        self.user = User.objects.create_user(email='owner@example.com', organization=self.org)
+
+    def local_payment(self, invoice_id, created_at):
+        history = SubscriptionHistory.objects.create(
+            organization=self.org,
+            event_type=SubscriptionEventType.PAYMENT_SUCCEEDED,
+            invoice_id=invoice_id,
+            amount=Decimal('19.00')
+        )
+        # created_at is auto_now_add, so backdate it afterwards
+        SubscriptionHistory.objects.filter(pk=history.pk).update(created_at=created_at)
+
+    def get_history(self):
+        request = APIRequestFactory().get('/api/subscription/billing-history')
+        force_authenticate(request, user=self.user)
+        return subscription_views.get_billing_history(request).data
+
+    def test_stripe_dates_are_aware_utc(self, invoice_list):
+        created = datetime(2026, 3, 1, 10, 0, tzinfo=UTC)
+
+        item = subscription_views.build_stripe_billing_item(stripe_invoice('in_1', created))
+
+        self.assertEqual(datetime.fromisoformat(item['date']), created)
+        self.assertEqual(item['date'], '2026-03-01T10:00:00+00:00')
+
+    def test_streams_merge_in_chronological_order(self, invoice_list):
+        invoice_list.return_value = SimpleNamespace(
+            data=[stripe_invoice('in_stripe', datetime(2026, 3, 1, 10, 0, tzinfo=UTC))],
+            has_more=False
+        )
+        self.local_payment('in_newer', datetime(2026, 3, 1, 12, 0, tzinfo=UTC))
+        self.local_payment('in_older', datetime(2026, 3, 1, 7, 0, tzinfo=UTC))
+
+        data = self.get_history()
+
+        self.assertEqual([item['id'] for item in data['items']], ['in_newer', 'in_stripe', 'in_older'])
+        self.assertEqual(data['total'], 3)
+
+    def test_local_rows_older_than_fetched_invoices_are_cut_off(self, invoice_list):
+        invoice_list.return_value = SimpleNamespace(
+            data=[stripe_invoice('in_stripe', datetime(2026, 3, 1, 10, 0, tzinfo=UTC))],
+            has_more=True
+        )
+        self.local_payment('in_newer', datetime(2026, 3, 1, 12, 0, tzinfo=UTC))
+        self.local_payment('in_older', datetime(2026, 3, 1, 7, 0, tzinfo=UTC))
+
+        data = self.get_history()
+
+        self.assertEqual([item['id'] for item in data['items']], ['in_newer', 'in_stripe'])
+        self.assertTrue(data['has_more'])
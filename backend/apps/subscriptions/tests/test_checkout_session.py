@@ -0,0 +1,54 @@
+from unittest import mock
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.accounts.models import Organization, User
+from apps.common.constants import SubscriptionPlan
+from apps.subscriptions import subscription_views
+
+
+@mock.patch.object(subscription_views, 'resolve_stripe_price_id', return_value='price_basic')
+@mock.patch.object(subscription_views.stripe.checkout.Session, 'create')
+class CreateCheckoutSessionTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Acme', stripe_customer_id='cus_1')
+        self.user = User.objects.create_user(email='owner@example.com', organization=self.org)
+
+    def post_checkout(self, user=None, **headers):
+        request = APIRequestFactory().post(
+            '/api/subscription/create-checkout-session',
+            {'plan_id': SubscriptionPlan.BASIC_MONTHLY},
+            format='json',
+            **headers
+        )
+        force_authenticate(request, user=user or self.user)
+        return subscription_views.create_checkout_session(request)
+
+    def sent_keys(self, session_create):
+        return [call.kwargs['idempotency_key'] for call in session_create.call_args_list]
+
+    def test_client_retry_reuses_idempotency_key(self, session_create, _):
+        session_create.return_value = mock.Mock(id='cs_1', url='https://checkout.stripe.test/cs_1')
+
+        self.post_checkout(HTTP_IDEMPOTENCY_KEY='attempt-1')
+        self.post_checkout(HTTP_IDEMPOTENCY_KEY='attempt-1')
+
+        self.assertEqual(self.sent_keys(session_create), [f"checkout-{self.org.id}-attempt-1"] * 2)
+
+    def test_no_key_without_client_header(self, session_create, _):
+        session_create.return_value = mock.Mock(id='cs_1', url='https://checkout.stripe.test/cs_1')
+
+        response = self.post_checkout()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sent_keys(session_create), [None])
+
+    def test_key_is_scoped_to_organization(self, session_create, _):
+        session_create.return_value = mock.Mock(id='cs_1', url='https://checkout.stripe.test/cs_1')
+        other_org = Organization.objects.create(name='Other', stripe_customer_id='cus_2')
+        other_user = User.objects.create_user(email='other@example.com', organization=other_org)
+
+        self.post_checkout(HTTP_IDEMPOTENCY_KEY='attempt-1')
+        self.post_checkout(user=other_user, HTTP_IDEMPOTENCY_KEY='attempt-1')
+
+        first, second = self.sent_keys(session_create)
+        self.assertNotEqual(first, second)
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from apps.accounts.models import Organization, User
+from apps.common.constants import SubscriptionPlan
+from apps.common.tasks import import_contacts_from_csv, reconcile_organization_counters
+from apps.contacts.models import Contact
+from apps.templates.models import EmailTemplate
+
+
+class OrganizationCounterTests(APITestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(
+            name='Acme',
+            subscription_plan=SubscriptionPlan.FREE_TRIAL,
+            trial_ends_at=timezone.now() + timedelta(days=14)
+        )
+        self.other_org = Organization.objects.create(name='Other')
+        self.user = User.objects.create_user(email='owner@example.com', organization=self.org)
+
+    def counter(self, organization, counter_field='cached_contacts_count'):
+        return Organization.objects.values_list(counter_field, flat=True).get(id=organization.id)
+
+    def add_contacts(self, *emails):
+        return [Contact.objects.create(organization=self.org, email=email) for email in emails]
+
+    def test_create_and_delete_adjust_counter(self):
+        contact, _ = self.add_contacts('a@example.com', 'b@example.com')
+        EmailTemplate.objects.create(organization=self.org, name='Welcome')
+
+        contact.delete()
+
+        self.assertEqual(self.counter(self.org), 1)
+        self.assertEqual(self.counter(self.org, 'cached_templates_count'), 1)
+
+    def test_queryset_delete_settles_counter_per_row(self):
+        self.add_contacts('a@example.com', 'b@example.com', 'c@example.com')
+
+        Contact.objects.filter(organization=self.org, email__in=['a@example.com', 'b@example.com']).delete()
+
+        self.assertEqual(self.counter(self.org), 1)
+
+    def test_csv_import_counts_only_new_contacts(self):
+        self.add_contacts('a@example.com')
+
+        result = import_contacts_from_csv(
+            self.org.id, 'email,first name\na@example.com,Ann\nb@example.com,Bob\nc@example.com,Cy\n', self.user.id
+        )
+
+        self.assertEqual((result['created'], result['updated']), (2, 1))
+        self.assertEqual(self.counter(self.org), 3)
+
+    def test_bulk_update_cannot_move_contacts_between_organizations(self):
+        contact, = self.add_contacts('a@example.com')
+        self.client.force_authenticate(self.user)
+
+        for field in ('organization', 'organization_id'):
+            self.client.post(reverse('contact-bulk-update'), {
+                'contact_ids': [contact.id],
+                'data': {field: self.other_org.id, 'first_name': 'Ann'}
+            }, format='json')
+
+        contact.refresh_from_db()
+        self.assertEqual((contact.organization_id, contact.first_name), (str(self.org.id), 'Ann'))
+        self.assertEqual((self.counter(self.org), self.counter(self.other_org)), (1, 0))
+
+    def test_reconcile_repairs_drift_from_bulk_create(self):
+        Contact.objects.bulk_create([Contact(organization=self.org, email='a@example.com')])
+        self.assertEqual(self.counter(self.org), 0)
+
+        reconcile_organization_counters()
+
+        self.assertEqual(self.counter(self.org), 1)
@@ -0,0 +1,63 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.accounts.models import Organization, User
+from apps.common.constants import SubscriptionPlan, SubscriptionStatus
+from apps.subscriptions import subscription_views
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CurrentSubscriptionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(
+            name='Acme',
+            subscription_plan=SubscriptionPlan.BASIC_MONTHLY,
+            subscription_status=SubscriptionStatus.ACTIVE,
+            is_subscription_active=True,
+            stripe_subscription_id='sub_1'
+        )
+        self.user = User.objects.create_user(email='owner@example.com', organization=self.org)
+
+    def get_subscription(self, **headers):
+        request = APIRequestFactory().get('/api/subscription/current', **headers)
+        force_authenticate(request, user=self.user)
+        return subscription_views.get_current_subscription(request)
+
+    def test_organization_is_cached_as_plain_values(self):
+        self.get_subscription()
+
+        cached = cache.get(subscription_views.subscription_org_cache_key(self.org.id))
+        self.assertIsInstance(cached, dict)
+        self.assertEqual(set(cached), set(subscription_views.SUBSCRIPTION_ORG_FIELDS))
+
+        with self.assertNumQueries(0):
+            response = self.get_subscription()
+
+        self.assertEqual(response.data['subscription']['plan'], SubscriptionPlan.BASIC_MONTHLY)
+        self.assertTrue(response.data['subscription']['is_active'])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.get_subscription()['ETag']
+
+        response = self.get_subscription(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    @mock.patch.object(subscription_views, 'send_payment_failed_notification_task')
+    def test_raw_sql_webhook_update_refreshes_cached_state(self, _):
+        etag = self.get_subscription()['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True), \
+                self.assertLogs('apps.subscriptions.subscription_views', level='WARNING'):
+            subscription_views.handle_payment_failed('evt_1', {
+                'id': 'in_1', 'subscription': 'sub_1', 'amount_due': 1900
+            })
+
+        response = self.get_subscription(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIsNotNone(response.data['subscription']['subscription_ends_at'])
@@ -0,0 +1,81 @@
+import json
+from unittest import mock
+from django.test import TestCase
+from django.db import OperationalError
+from apps.accounts.models import Organization
+from apps.common.tests.fake_redis import FakeRedis
+from apps.subscriptions import history_buffer
+from apps.subscriptions.models import SubscriptionHistory
+from apps.common.constants import SubscriptionEventType
+
+
+class FlushSubscriptionHistoryTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Acme')
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(history_buffer, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def queue(self, event_id, **fields):
+        # Entries as earlier releases queued them
+        self.redis.rpush(history_buffer.HISTORY_PENDING_KEY, json.dumps({
+            'organization_id': str(self.org.id),
+            'event_type': SubscriptionEventType.UPDATED,
+            'stripe_event_id': event_id,
+            **fields
+        }))
+
+    def pending(self):
+        return self.redis.lrange(history_buffer.HISTORY_PENDING_KEY, 0, -1)
+
+    def test_duplicate_event_is_skipped_and_queue_drains(self):
+        self.queue('evt_1')
+        self.queue('evt_2')
+        # Redelivered event queued a second time
+        self.queue('evt_1')
+
+        history_buffer.flush_subscription_history()
+
+        self.assertEqual(
+            sorted(SubscriptionHistory.objects.values_list('stripe_event_id', flat=True)),
+            ['evt_1', 'evt_2']
+        )
+        self.assertEqual(self.pending(), [])
+
+    def test_event_already_in_database_does_not_block_later_rows(self):
+        self.queue('evt_1')
+        history_buffer.flush_subscription_history()
+
+        self.queue('evt_1')
+        self.queue('evt_3')
+        history_buffer.flush_subscription_history()
+
+        self.assertEqual(SubscriptionHistory.objects.filter(stripe_event_id='evt_1').count(), 1)
+        self.assertTrue(SubscriptionHistory.objects.filter(stripe_event_id='evt_3').exists())
+        self.assertEqual(self.pending(), [])
+
+    def test_malformed_entry_is_dropped_and_rest_of_batch_written(self):
+        self.queue('evt_1')
+        self.redis.rpush(history_buffer.HISTORY_PENDING_KEY, json.dumps({'no_such_field': 1}))
+        self.queue('evt_2')
+
+        with self.assertLogs(history_buffer.logger, level='ERROR'):
+            history_buffer.flush_subscription_history()
+
+        self.assertEqual(SubscriptionHistory.objects.count(), 2)
+        self.assertEqual(self.pending(), [])
+
+    def test_transient_error_puts_batch_back(self):
+        self.queue('evt_1')
+        self.queue('evt_2')
+        queued = list(self.pending())
+
+        with mock.patch.object(
+            history_buffer, '_insert_history_entries', side_effect=OperationalError('connection lost')
+        ):
+            with self.assertRaises(OperationalError):
+                history_buffer.flush_subscription_history()
+
+        self.assertEqual(self.pending(), queued)
+        self.assertFalse(SubscriptionHistory.objects.exists())
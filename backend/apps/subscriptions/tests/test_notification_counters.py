@@ -0,0 +1,55 @@
+from unittest import mock
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.accounts.models import Organization, User
+from apps.common.constants import NotificationChannel, NotificationType
+from apps.notifications.models import SubscriptionNotification
+from apps.subscriptions import subscription_views
+
+
+class MarkNotificationReadTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Acme')
+        self.user = User.objects.create_user(email='owner@example.com', organization=self.org)
+        self.notifications = [
+            SubscriptionNotification.objects.create(
+                organization=self.org,
+                notification_type=NotificationType.TRIAL_ENDING,
+                channel=NotificationChannel.IN_APP
+            )
+            for _ in range(3)
+        ]
+
+    def mark_read(self, data):
+        request = APIRequestFactory().post('/api/subscription/mark-notification-read', data, format='json')
+        force_authenticate(request, user=self.user)
+        return subscription_views.mark_notification_read(request)
+
+    def unread_count(self):
+        return Organization.objects.get(id=self.org.id).unread_notifications_count
+
+    def test_mark_all_moves_counter_by_rows_updated(self):
+        self.notifications[0].mark_as_read()
+
+        response = self.mark_read({'mark_all': True})
+
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_mark_all_rolls_back_when_counter_update_fails(self):
+        with mock.patch.object(Organization, 'adjust_counter', side_effect=RuntimeError('db down')), \
+                self.assertLogs('apps.common.exceptions', level='ERROR'):
+            response = self.mark_read({'mark_all': True})
+
+        self.assertEqual(response.status_code, 500)
+
+        self.assertEqual(SubscriptionNotification.objects.filter(is_read=False).count(), 3)
+        self.assertEqual(self.unread_count(), 3)
+
+    def test_mark_selected_moves_counter_by_rows_updated(self):
+        ids = [self.notifications[0].id, self.notifications[1].id, self.notifications[1].id]
+
+        response = self.mark_read({'notification_ids': ids})
+
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(self.unread_count(), 1)
@@ -0,0 +1,56 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.accounts.models import Organization, User
+from apps.common.constants import NotificationChannel, NotificationType
+from apps.notifications.models import SubscriptionNotification
+from apps.subscriptions import subscription_views
+
+
+class NotificationKeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Acme')
+        self.user = User.objects.create_user(email='owner@example.com', organization=self.org)
+        now = timezone.now()
+        # Three notifications share a timestamp, so the id breaks the tie
+        for created_at in [now, now, now, now - timedelta(minutes=1), now - timedelta(minutes=2)]:
+            notification = SubscriptionNotification.objects.create(
+                organization=self.org,
+                notification_type=NotificationType.TRIAL_ENDING,
+                channel=NotificationChannel.IN_APP
+            )
+            SubscriptionNotification.objects.filter(id=notification.id).update(created_at=created_at)
+
+    def get_notifications(self, **params):
+        request = APIRequestFactory().get('/api/subscription/notifications', params)
+        force_authenticate(request, user=self.user)
+        return subscription_views.get_notifications(request)
+
+    def test_cursor_walks_every_notification_once_in_order(self):
+        seen = []
+        params = {'limit': 2}
+        while True:
+            data = self.get_notifications(**params).data
+            seen.extend(notification['id'] for notification in data['notifications'])
+            if not data['has_more']:
+                break
+            params = {'limit': 2, 'before': data['next_before'], 'before_id': data['next_before_id']}
+
+        expected = SubscriptionNotification.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, [str(notification_id) for notification_id in expected])
+
+    def test_cursor_matches_offset_page(self):
+        first = self.get_notifications(limit=2).data
+
+        by_cursor = self.get_notifications(
+            limit=2, before=first['next_before'], before_id=first['next_before_id']
+        ).data
+        by_offset = self.get_notifications(limit=2, offset=2).data
+
+        self.assertEqual(by_cursor['notifications'], by_offset['notifications'])
+
+    def test_cursor_without_id_is_rejected(self):
+        response = self.get_notifications(before=timezone.now().isoformat())
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,27 @@
+import json
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from apps.accounts.models import Organization, User
+from apps.common.constants import SubscriptionPlan
+from apps.subscriptions.subscription_views import get_plan_comparison
+
+
+class PlanComparisonTests(APITestCase):
+    def test_cached_comparison_is_read_only(self):
+        comparison = get_plan_comparison(SubscriptionPlan.BASIC_MONTHLY, SubscriptionPlan.PRO_MONTHLY)
+
+        with self.assertRaises(TypeError):
+            comparison['price_diff'] = 0
+
+    def test_plans_detailed_serializes_comparison(self):
+        org = Organization.objects.create(name='Acme', subscription_plan=SubscriptionPlan.BASIC_MONTHLY)
+        self.client.force_authenticate(User.objects.create_user(email='owner@example.com', organization=org))
+
+        response = self.client.get(reverse('plans_detailed'))
+
+        plans = {plan['id']: plan for plan in json.loads(response.content)['plans']}
+        self.assertEqual(
+            plans[SubscriptionPlan.PRO_MONTHLY]['comparison'],
+            dict(get_plan_comparison(SubscriptionPlan.BASIC_MONTHLY, SubscriptionPlan.PRO_MONTHLY))
+        )
+        self.assertNotIn('comparison', plans[SubscriptionPlan.BASIC_MONTHLY])
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from apps.common.constants import SubscriptionPlan
+from apps.subscriptions.features import get_plan_features, plan_features_cache_key
+from apps.subscriptions.models import PlanFeatures
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PlanFeaturesCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.row = PlanFeatures.objects.create(
+            plan=SubscriptionPlan.BASIC_MONTHLY,
+            price_cents=1900,
+            contacts_limit=1000,
+            campaigns_limit=10,
+            emails_per_month=5000
+        )
+
+    def test_features_are_served_from_shared_cache(self):
+        get_plan_features(SubscriptionPlan.BASIC_MONTHLY)
+
+        with self.assertNumQueries(0):
+            features = get_plan_features(SubscriptionPlan.BASIC_MONTHLY)
+
+        self.assertEqual(features.contacts_limit, 1000)
+        # Cached as a plain dict, not a pickled model or snapshot
+        self.assertIsInstance(cache.get(plan_features_cache_key(SubscriptionPlan.BASIC_MONTHLY)), dict)
+
+    def test_saving_a_row_refreshes_every_reader(self):
+        get_plan_features(SubscriptionPlan.BASIC_MONTHLY)
+
+        self.row.contacts_limit = 2500
+        self.row.save()
+
+        self.assertEqual(get_plan_features(SubscriptionPlan.BASIC_MONTHLY).contacts_limit, 2500)
+
+    def test_missing_plan_is_cached_as_none(self):
+        self.assertIsNone(get_plan_features(SubscriptionPlan.PRO_MONTHLY))
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_plan_features(SubscriptionPlan.PRO_MONTHLY))
+
+    def test_deleting_a_row_drops_its_features(self):
+        get_plan_features(SubscriptionPlan.BASIC_MONTHLY)
+
+        self.row.delete()
+
+        self.assertIsNone(get_plan_features(SubscriptionPlan.BASIC_MONTHLY))
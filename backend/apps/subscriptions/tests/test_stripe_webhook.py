@@ -0,0 +1,78 @@
+import hmac
+import json
+import time
+import hashlib
+from unittest import mock
+from django.db import DatabaseError
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from apps.subscriptions import subscription_views
+from apps.subscriptions.models import ProcessedWebhookEvent
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+@override_settings(
+    STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+)
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(subscription_views, 'process_stripe_event')
+        self.process_stripe_event = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_event(self, event_id='evt_1'):
+        payload = json.dumps({
+            'id': event_id,
+            'type': 'customer.subscription.updated',
+            'data': {'object': {}}
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(
+            WEBHOOK_SECRET.encode('utf-8'),
+            f"{timestamp}.{payload}".encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+        request = APIRequestFactory().post(
+            '/api/subscriptions/webhook/',
+            data=payload,
+            content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return subscription_views.stripe_webhook(request)
+
+    def test_event_is_recorded_and_queued(self):
+        response = self.post_event()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['status'], 'queued')
+        self.assertTrue(ProcessedWebhookEvent.objects.filter(event_id='evt_1').exists())
+        self.process_stripe_event.delay.assert_called_once_with('evt_1')
+
+    def test_redelivery_is_answered_as_duplicate(self):
+        self.post_event()
+
+        response = self.post_event()
+
+        self.assertEqual(json.loads(response.content)['status'], 'duplicate')
+        self.process_stripe_event.delay.assert_called_once_with('evt_1')
+
+    def test_database_failure_releases_dedupe_key_for_retry(self):
+        with mock.patch.object(
+            ProcessedWebhookEvent.objects, 'get_or_create', side_effect=DatabaseError('insert failed')
+        ), self.assertLogs('apps.common.exceptions', level='ERROR'):
+            response = self.post_event()
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIsNone(cache.get('stripe_evt:evt_1'))
+
+        # Stripe's retry is recorded and queued rather than skipped
+        response = self.post_event()
+
+        self.assertEqual(json.loads(response.content)['status'], 'queued')
+        self.assertTrue(ProcessedWebhookEvent.objects.filter(event_id='evt_1').exists())
+        self.process_stripe_event.delay.assert_called_once_with('evt_1')
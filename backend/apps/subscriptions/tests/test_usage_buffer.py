@@ -0,0 +1,95 @@
+from datetime import date
+from unittest import mock
+from django.test import TestCase
+from apps.accounts.models import Organization
+from apps.common.tests.fake_redis import FakeRedis
+from apps.subscriptions import usage_buffer
+from apps.subscriptions.models import UsageTracking
+from apps.subscriptions.subscription_views import update_usage_tracking, write_usage_counts
+
+MONTH = date(2026, 10, 1)
+
+
+def release_flushed(client, keys, args):
+    """Python equivalent of usage_buffer.RELEASE_FLUSHED_SCRIPT"""
+    key, pending_key = keys
+    for field, count in zip(args[::2], args[1::2]):
+        client.hincrby(key, field, -int(count))
+    if any(client.hgetall(key).values()):
+        return 0
+    client.delete(key)
+    client.srem(pending_key, key)
+    return 1
+
+
+class UsageBufferTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Acme')
+        self.redis = FakeRedis(scripts={usage_buffer.RELEASE_FLUSHED_SCRIPT: release_flushed})
+        patcher = mock.patch.object(usage_buffer, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def buffer(self, field_name, increment):
+        return usage_buffer.buffer_usage_increment(self.org.id, MONTH, field_name, increment)
+
+    def usage(self):
+        return UsageTracking.objects.get(organization=self.org, month=MONTH)
+
+    def test_flush_writes_counts_and_empties_buffer(self):
+        self.buffer('emails_sent', 40)
+        self.buffer('emails_sent', 2)
+        self.buffer('campaigns_created', 1)
+
+        flushed = usage_buffer.flush_usage_counts(write_usage_counts)
+
+        self.assertEqual(flushed, 1)
+        self.assertEqual(self.usage().emails_sent, 42)
+        self.assertEqual(self.usage().campaigns_created, 1)
+        self.assertEqual(usage_buffer.get_buffered_usage(self.org.id, MONTH), {})
+        self.assertEqual(self.redis.data.get(usage_buffer.USAGE_PENDING_KEY.encode(), set()), set())
+
+    def test_failed_write_keeps_counts_buffered(self):
+        self.buffer('emails_sent', 5)
+
+        with self.assertLogs(usage_buffer.logger, level='ERROR'):
+            usage_buffer.flush_usage_counts(mock.Mock(side_effect=RuntimeError('db down')))
+
+        self.assertEqual(usage_buffer.get_buffered_usage(self.org.id, MONTH), {'emails_sent': 5})
+
+        # The next flush picks them up
+        usage_buffer.flush_usage_counts(write_usage_counts)
+
+        self.assertEqual(self.usage().emails_sent, 5)
+
+    def test_increment_during_flush_stays_buffered(self):
+        self.buffer('emails_sent', 5)
+
+        def write_then_increment(organization_id, month, counts):
+            write_usage_counts(organization_id, month, counts)
+            self.buffer('emails_sent', 3)
+
+        usage_buffer.flush_usage_counts(write_then_increment)
+
+        self.assertEqual(self.usage().emails_sent, 5)
+        self.assertEqual(usage_buffer.get_buffered_usage(self.org.id, MONTH), {'emails_sent': 3})
+
+        usage_buffer.flush_usage_counts(write_usage_counts)
+
+        self.assertEqual(self.usage().emails_sent, 8)
+
+    def test_concurrent_flush_is_skipped(self):
+        self.buffer('emails_sent', 5)
+        self.redis.lock(usage_buffer.USAGE_FLUSH_LOCK_KEY).acquire()
+        write_counts = mock.Mock()
+
+        self.assertEqual(usage_buffer.flush_usage_counts(write_counts), 0)
+        write_counts.assert_not_called()
+
+    def test_without_buffer_redis_usage_is_written_directly(self):
+        with mock.patch.object(usage_buffer, 'get_redis', return_value=None):
+            update_usage_tracking(self.org, 'emails', 7)
+            update_usage_tracking(self.org, 'emails', 3)
+
+        usage = UsageTracking.objects.get(organization=self.org)
+        self.assertEqual(usage.emails_sent, 10)
@@ -0,0 +1,34 @@
+from datetime import date
+from django.test import TestCase
+from apps.accounts.models import Organization
+from apps.subscriptions.models import UsageTracking
+from apps.subscriptions.subscription_views import write_usage_counts
+
+MONTH = date(2026, 10, 1)
+
+
+class WriteUsageCountsTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Acme')
+
+    def test_first_write_creates_the_month_row(self):
+        write_usage_counts(self.org.id, MONTH, {'emails_sent': 3})
+
+        usage = UsageTracking.objects.get(organization=self.org, month=MONTH)
+        self.assertEqual((usage.emails_sent, usage.campaigns_created), (3, 0))
+
+    def test_later_writes_add_to_existing_counts(self):
+        write_usage_counts(self.org.id, MONTH, {'emails_sent': 3, 'campaigns_created': 1})
+        write_usage_counts(self.org.id, MONTH, {'emails_sent': 4})
+
+        usage = UsageTracking.objects.get(organization=self.org, month=MONTH)
+        self.assertEqual((usage.emails_sent, usage.campaigns_created), (7, 1))
+
+    def test_each_month_gets_its_own_row(self):
+        write_usage_counts(self.org.id, MONTH, {'emails_sent': 3})
+        write_usage_counts(self.org.id, date(2026, 11, 1), {'emails_sent': 5})
+
+        self.assertEqual(
+            list(UsageTracking.objects.filter(organization=self.org).order_by('month').values_list('emails_sent', flat=True)),
+            [3, 5]
+        )
@@ -0,0 +1,68 @@
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase
+from apps.accounts.models import Organization
+from apps.common.constants import SubscriptionEventType, SubscriptionStatus
+from apps.subscriptions import subscription_views
+from apps.subscriptions.models import SubscriptionHistory
+
+
+def invoice(invoice_id='in_1'):
+    return {
+        'id': invoice_id,
+        'customer': 'cus_1',
+        'subscription': 'sub_1',
+        'amount_paid': 1900,
+        'amount_due': 1900,
+        'currency': 'usd',
+        'failure_message': 'Card declined'
+    }
+
+
+@mock.patch.object(subscription_views, 'send_payment_failed_notification_task')
+@mock.patch.object(subscription_views, 'send_payment_success_notification_task')
+class WebhookHistoryTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(
+            name='Acme', stripe_customer_id='cus_1', stripe_subscription_id='sub_1'
+        )
+
+    def test_payment_succeeded_row_is_written_immediately(self, *_):
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription_views.handle_payment_succeeded('evt_1', invoice())
+
+        history = SubscriptionHistory.objects.get(stripe_event_id='evt_1')
+        self.assertEqual(history.event_type, SubscriptionEventType.PAYMENT_SUCCEEDED)
+        self.assertEqual(history.amount, Decimal('19.00'))
+
+    def test_payment_failed_row_is_written_immediately(self, *_):
+        with self.captureOnCommitCallbacks(execute=True), \
+                self.assertLogs('apps.subscriptions.subscription_views', level='WARNING'):
+            subscription_views.handle_payment_failed('evt_1', invoice())
+
+        history = SubscriptionHistory.objects.get(stripe_event_id='evt_1')
+        self.assertEqual(history.event_type, SubscriptionEventType.PAYMENT_FAILED)
+        self.org.refresh_from_db()
+        self.assertEqual(self.org.subscription_status, SubscriptionStatus.PAST_DUE)
+
+    def test_redelivered_payment_is_recorded_once(self, *_):
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription_views.handle_payment_succeeded('evt_1', invoice())
+            subscription_views.handle_payment_succeeded('evt_1', invoice())
+
+        self.assertEqual(SubscriptionHistory.objects.filter(stripe_event_id='evt_1').count(), 1)
+
+    def test_audit_row_is_written_immediately(self, *_):
+        subscription_views.handle_trial_will_end('evt_1', {'id': 'sub_1'})
+
+        history = SubscriptionHistory.objects.get(stripe_event_id='evt_1')
+        self.assertEqual(history.event_type, SubscriptionEventType.TRIAL_ENDED)
+
+    def test_audit_row_rolls_back_with_organization_update(self, *_):
+        with mock.patch.object(
+            SubscriptionHistory.objects, 'bulk_create', side_effect=ValueError('insert failed')
+        ), self.assertRaises(ValueError):
+            subscription_views.handle_subscription_deleted('evt_1', {'id': 'sub_1'})
+
+        self.org.refresh_from_db()
+        self.assertNotEqual(self.org.subscription_status, SubscriptionStatus.CANCELED)
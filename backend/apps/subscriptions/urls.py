@@ -10,6 +10,7 @@ from .subscription_views import (
     manage_subscription,
     create_billing_portal_session,
     create_subscription,
+    subscription_job_status,
     cancel_subscription,
     stripe_webhook,
     check_subscription_access,
@@ -32,6 +33,7 @@ urlpatterns = [
     path('subscription/manage', manage_subscription, name='manage_subscription'),
     path('subscription/billing-portal', create_billing_portal_session, name='create_billing_portal'),
     path('subscription/create', create_subscription, name='create_subscription'),
+    path('subscription/status/<str:job_id>', subscription_job_status, name='subscription_job_status'),
     path('subscription/cancel', cancel_subscription, name='cancel_subscription'),
     path('subscription/check-access', check_subscription_access, name='check_subscription_access'),
     path('subscription/webhook', stripe_webhook, name='stripe_webhook'),
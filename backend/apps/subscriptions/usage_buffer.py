@@ -0,0 +1,122 @@
+"""
+Redis buffer for monthly usage increments.
+
+update_usage_tracking runs inside hot loops (email sends, resource creation),
+so increments are collected in one Redis hash per organization and month and
+written to UsageTracking in batches by the flush_usage_buffer task.
+
+The counts enforce plan limits, so they are buffered only in the non-evicting
+'buffers' Redis (BUFFER_REDIS_URL), never in the cache. A flushed count is
+subtracted from its hash only after the database write, so a failed or
+interrupted flush leaves it buffered for the next run. Without a buffer Redis
+(development) or when it is unreachable, callers write straight to the
+database instead.
+"""
+import logging
+from apps.common.redis import BUFFER_REDIS_ALIAS, get_redis
+
+logger = logging.getLogger(__name__)
+
+USAGE_BUFFER_KEY_PREFIX = 'usage'
+USAGE_PENDING_KEY = 'usage:pending'
+USAGE_FLUSH_BATCH_SIZE = 500
+USAGE_FLUSH_LOCK_KEY = 'usage:flush-lock'
+USAGE_FLUSH_LOCK_TIMEOUT = 300
+
+# Subtracts the flushed counts (ARGV: field, count, ...) from the hash and,
+# once nothing is left in it, drops the hash and its pending registration.
+# Atomic, so an increment landing meanwhile keeps both.
+RELEASE_FLUSHED_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1]))
+end
+for _, value in ipairs(redis.call('HVALS', KEYS[1])) do
+    if tonumber(value) ~= 0 then
+        return 0
+    end
+end
+redis.call('DEL', KEYS[1])
+redis.call('SREM', KEYS[2], KEYS[1])
+return 1
+"""
+
+
+def _buffer_key(organization_id, month_start):
+    return f"{USAGE_BUFFER_KEY_PREFIX}:{organization_id}:{month_start.isoformat()}"
+
+
+def buffer_usage_increment(organization_id, month_start, field_name, increment):
+    """Queue an increment in Redis. Returns False if it must go to the database."""
+    client = get_redis(BUFFER_REDIS_ALIAS)
+    if client is None:
+        return False
+
+    key = _buffer_key(organization_id, month_start)
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.hincrby(key, field_name, increment)
+        pipe.sadd(USAGE_PENDING_KEY, key)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Usage buffer unavailable, writing to database: %s", e)
+        return False
+
+    return True
+
+
+def get_buffered_usage(organization_id, month_start):
+    """Increments not yet flushed to the database, as {field_name: count}"""
+    client = get_redis(BUFFER_REDIS_ALIAS)
+    if client is None:
+        return {}
+
+    try:
+        pending = client.hgetall(_buffer_key(organization_id, month_start))
+    except Exception as e:
+        logger.warning("Could not read usage buffer: %s", e)
+        return {}
+
+    return {field.decode(): int(value) for field, value in pending.items()}
+
+
+def flush_usage_counts(write_counts):
+    """
+    Pass every buffered hash to write_counts(organization_id, month,
+    {field_name: count}) and release the written counts from Redis. Counts
+    whose write raises stay buffered. Returns the number of hashes written.
+    """
+    client = get_redis(BUFFER_REDIS_ALIAS)
+    if client is None:
+        return 0
+
+    # Two flushes would both write the same counts
+    lock = client.lock(USAGE_FLUSH_LOCK_KEY, timeout=USAGE_FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return 0
+
+    release_flushed = client.register_script(RELEASE_FLUSHED_SCRIPT)
+    flushed = 0
+    try:
+        for key in client.sscan_iter(USAGE_PENDING_KEY, count=USAGE_FLUSH_BATCH_SIZE):
+            counts = {
+                field.decode(): int(value)
+                for field, value in client.hgetall(key).items()
+                if int(value)
+            }
+            if counts:
+                _, organization_id, month = key.decode().split(':')
+                try:
+                    write_counts(organization_id, month, counts)
+                except Exception:
+                    logger.exception("Error flushing usage for org %s, keeping it buffered", organization_id)
+                    continue
+                flushed += 1
+
+            release_flushed(
+                keys=[key, USAGE_PENDING_KEY],
+                args=[item for field_count in counts.items() for item in field_count]
+            )
+    finally:
+        lock.release()
+
+    return flushed
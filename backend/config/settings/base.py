@@ -99,11 +99,23 @@ DATABASES = {
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
-# Authentication backends
+# Authentication backends. ModelBackend stays listed so sessions created
+# before the organization-joining backend keep resolving.
 AUTHENTICATION_BACKENDS = [
+    'apps.authentication.backends.OrganizationModelBackend',
     'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Password hashing - Argon2 first (much cheaper than 600k-iteration PBKDF2 at
+# comparable strength); the rest stay so existing hashes keep verifying and
+# are upgraded to Argon2 on next login
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -160,6 +172,7 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'EXCEPTION_HANDLER': 'apps.common.exceptions.api_exception_handler',
 }
 
 # CORS settings - Allow frontend to access backend
@@ -170,6 +183,9 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5000",
 ]
 
+# Base URL of the frontend, used for links in emails and Stripe redirects
+FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:5000').rstrip('/')
+
 # Use regex patterns for wildcard domains
 # CORS_ALLOWED_ORIGIN_REGEXES = [
 #     r"^https://.*\.replit\.dev$",
@@ -226,6 +242,15 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_ENABLE_UTC = True
 
+# Stripe webhooks are acknowledged immediately and processed on their own queue,
+# along with the other Stripe API calls so Stripe backoff doesn't hold up other work
+STRIPE_WEBHOOK_QUEUE_NAME = config('STRIPE_WEBHOOK_QUEUE_NAME', default='billing')
+CELERY_TASK_ROUTES = {
+    'apps.common.tasks.process_stripe_event': {'queue': STRIPE_WEBHOOK_QUEUE_NAME},
+    'apps.common.tasks.create_stripe_subscription': {'queue': STRIPE_WEBHOOK_QUEUE_NAME},
+    'apps.common.tasks.stripe_modify_subscription': {'queue': STRIPE_WEBHOOK_QUEUE_NAME},
+}
+
 # Celery Beat Schedule for periodic tasks
 CELERY_BEAT_SCHEDULE = {
     'verify-domains': {
@@ -236,6 +261,36 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.common.tasks.process_analytics_task',
         'schedule': 600.0,
     },
+    'purge-stale-otps': {
+        'task': 'apps.common.tasks.purge_stale_otps',
+        'schedule': 300.0,
+    },
+    'rebuild-email-filter': {
+        'task': 'apps.common.tasks.rebuild_email_filter_task',
+        'schedule': 86400.0,
+    },
+    'flush-usage-buffer': {
+        'task': 'apps.common.tasks.flush_usage_buffer',
+        'schedule': 60.0,
+    },
+    # Drains history rows queued in Redis by releases before the webhook wrote
+    # them directly; drop once the queue is empty everywhere
+    'flush-subscription-history': {
+        'task': 'apps.common.tasks.flush_subscription_history_task',
+        'schedule': 300.0,
+    },
+    'requeue-stale-webhook-events': {
+        'task': 'apps.common.tasks.requeue_stale_webhook_events',
+        'schedule': 600.0,
+    },
+    'purge-processed-webhook-events': {
+        'task': 'apps.common.tasks.purge_processed_webhook_events',
+        'schedule': 86400.0,
+    },
+    'reconcile-organization-counters': {
+        'task': 'apps.common.tasks.reconcile_organization_counters',
+        'schedule': 86400.0,
+    },
 }
 
 # Email settings (SMTP)
@@ -252,6 +307,15 @@ SENDGRID_API_KEY = config('SENDGRID_API_KEY', default='')
 # Stripe settings
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+STRIPE_MAX_NETWORK_RETRIES = config('STRIPE_MAX_NETWORK_RETRIES', default=2, cast=int)
+
+# Processed webhook events are kept well past Stripe's 3-day retry window
+WEBHOOK_EVENT_RETENTION_DAYS = config('WEBHOOK_EVENT_RETENTION_DAYS', default=30, cast=int)
+
+# Webhook events not applied after this many minutes are re-enqueued, until
+# they have been attempted WEBHOOK_EVENT_MAX_ATTEMPTS times
+WEBHOOK_EVENT_STALE_MINUTES = config('WEBHOOK_EVENT_STALE_MINUTES', default=15, cast=int)
+WEBHOOK_EVENT_MAX_ATTEMPTS = config('WEBHOOK_EVENT_MAX_ATTEMPTS', default=20, cast=int)
 
 # Stripe Price IDs for subscription plans
 STRIPE_PRICE_BASIC_MONTHLY = config('STRIPE_PRICE_BASIC_MONTHLY', default='')
@@ -17,6 +17,20 @@ CACHES = {
     }
 }
 
+# Usage increments are buffered in a Redis of their own, which must run with
+# maxmemory-policy noeviction since evicting a buffer loses counts. Without
+# one they are written straight to the database. The signup email filter is
+# kept there too, so cache evictions don't disable it.
+BUFFER_REDIS_URL = config('BUFFER_REDIS_URL', default='')
+if BUFFER_REDIS_URL:
+    CACHES['buffers'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': BUFFER_REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        }
+    }
+
 # Celery - Normal async execution in production
 # CELERY_TASK_ALWAYS_EAGER is not set, so tasks run asynchronously
 
@@ -28,7 +28,7 @@ MAX_TASKS_PER_CHILD=${CELERY_MAX_TASKS_PER_CHILD:-1000}
 MAX_MEMORY_PER_CHILD=${CELERY_MAX_MEMORY_PER_CHILD:-200000}
 
 # Queues to listen to
-QUEUES=${CELERY_QUEUES:-"celery,email,high_priority,low_priority"}
+QUEUES=${CELERY_QUEUES:-"celery,email,high_priority,low_priority,billing"}
 
 echo "Starting Celery worker with the following configuration:"
 echo "  App: $CELERY_APP"
@@ -223,6 +223,15 @@ function Invoke-Migrations {
         Write-Warning "Migration failed or not needed"
     }
     
+    # Signup availability checks skip the database once this filter exists
+    try {
+        docker compose exec -T backend python manage.py build_email_filter
+        Write-Success "Signup email filter built"
+    }
+    catch {
+        Write-Warning "Signup email filter build failed; it is retried daily"
+    }
+    
     Write-Host ""
 }
 
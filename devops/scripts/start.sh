@@ -168,6 +168,13 @@ run_migrations() {
     else
         print_warning "Migration failed or not needed"
     fi
+    
+    # Signup availability checks skip the database once this filter exists
+    if docker compose exec -T backend python manage.py build_email_filter; then
+        print_success "Signup email filter built"
+    else
+        print_warning "Signup email filter build failed; it is retried daily"
+    fi
     echo ""
 }
 